@@ -1,22 +1,80 @@
-from pl_ci_cd._check import check
-from pl_ci_cd._check_format import FormatCheckError, check_format
-from pl_ci_cd._check_types import TypeCheckError, check_types
-from pl_ci_cd._lint import LintError, lint
-from pl_ci_cd._run_unit_tests_and_coverage import (
-    CoverageOrTestsError,
-    run_unit_tests_and_coverage,
-)
-from pl_ci_cd.ship import ship
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pl_ci_cd._check import check
+    from pl_ci_cd._check_async import check_async
+    from pl_ci_cd._check_format import (
+        FormatCheckError,
+        check_format,
+        check_format_async,
+    )
+    from pl_ci_cd._check_types import TypeCheckError, check_types, check_types_async
+    from pl_ci_cd._lint import LintError, lint, lint_async
+    from pl_ci_cd._run_unit_tests_and_coverage import (
+        CoverageOrTestsError,
+        run_unit_tests_and_coverage,
+        run_unit_tests_and_coverage_async,
+    )
+    from pl_ci_cd._ship import ship
+    from pl_ci_cd._trace import ChildUsage, Span, TraceEvent, Tracer, tracing
+
+# Each export is imported on first access, so that e.g. the `ship` script doesn't load the checks.
+_EXPORTS = {
+    "ChildUsage": "pl_ci_cd._trace",
+    "CoverageOrTestsError": "pl_ci_cd._run_unit_tests_and_coverage",
+    "FormatCheckError": "pl_ci_cd._check_format",
+    "LintError": "pl_ci_cd._lint",
+    "Span": "pl_ci_cd._trace",
+    "TraceEvent": "pl_ci_cd._trace",
+    "Tracer": "pl_ci_cd._trace",
+    "TypeCheckError": "pl_ci_cd._check_types",
+    "check": "pl_ci_cd._check",
+    "check_async": "pl_ci_cd._check_async",
+    "check_format": "pl_ci_cd._check_format",
+    "check_format_async": "pl_ci_cd._check_format",
+    "check_types": "pl_ci_cd._check_types",
+    "check_types_async": "pl_ci_cd._check_types",
+    "lint": "pl_ci_cd._lint",
+    "lint_async": "pl_ci_cd._lint",
+    "run_unit_tests_and_coverage": "pl_ci_cd._run_unit_tests_and_coverage",
+    "run_unit_tests_and_coverage_async": "pl_ci_cd._run_unit_tests_and_coverage",
+    "ship": "pl_ci_cd._ship",
+    "tracing": "pl_ci_cd._trace",
+}
 
 __all__ = [
+    "ChildUsage",
     "CoverageOrTestsError",
     "FormatCheckError",
     "LintError",
+    "Span",
+    "TraceEvent",
+    "Tracer",
     "TypeCheckError",
     "check",
+    "check_async",
     "check_format",
+    "check_format_async",
     "check_types",
+    "check_types_async",
     "lint",
+    "lint_async",
     "run_unit_tests_and_coverage",
+    "run_unit_tests_and_coverage_async",
     "ship",
+    "tracing",
 ]
+
+
+def __getattr__(name: str) -> object:
+    if name not in _EXPORTS:
+        msg = f"module {__name__!r} has no attribute {name!r}"
+        raise AttributeError(msg)
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
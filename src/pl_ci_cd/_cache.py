@@ -0,0 +1,267 @@
+import hashlib
+import importlib.metadata
+import json
+import os
+import time
+import tomllib
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from pl_run_program import run_program
+
+from pl_ci_cd._constants import git_program
+
+CACHE_DIR_NAME = ".pl_ci_cd_cache"
+MAX_ENTRY_AGE_SECONDS = 30 * 24 * 60 * 60
+MAX_ENTRIES = 1000
+
+# A file modified this close to the moment it was hashed may be modified again
+# within the same mtime tick, so its stat is not trusted on the next run (like git's
+# "racily clean" entries).
+_RACY_WINDOW_NS = 2_000_000_000
+
+# The `source` keys of `uv.lock` packages that live on disk rather than in a registry.
+_PATH_SOURCES = ("editable", "directory", "path")
+
+# Files that tools write into the project while running, and so must not be inputs.
+_TOOL_ARTIFACT_PREFIXES = (".coverage",)
+
+
+@dataclass(frozen=True)
+class StageInputs:
+    """
+    What a stage's result depends on.
+
+    `suffixes` selects the project files that are hashed (None means every file).
+    `tools` are package names whose locked versions are part of the key.
+    `named_files` are hashed whatever their suffix, and whether or not git ignores them.
+    With `path_dependencies`, the selected files of locked path dependencies, like sibling packages, are too.
+    """
+
+    stage: str
+    suffixes: frozenset[str] | None
+    tools: tuple[str, ...]
+    named_files: tuple[str, ...] = ()
+    path_dependencies: bool = False
+
+
+@dataclass
+class _FileStat:
+    mtime_ns: int
+    size: int
+    inode: int
+    digest: str
+
+
+class StageCache:
+    """
+    Persistent record of stage passes, keyed by a hash of each stage's inputs.
+
+    File digests are kept in an index and reused while a file's stat is unchanged,
+    so an unchanged project is keyed without reading its files.
+    """
+
+    def __init__(self, project_root: Path) -> None:
+        self._project_root = project_root
+        self._cache_dir = project_root / CACHE_DIR_NAME
+        self._index_path = self._cache_dir / "index.json"
+        self._passes_dir = self._cache_dir / "passes"
+        self._index = self._load_index()
+        self._files: list[str] | None = None
+        self._dependency_files: list[str] | None = None
+        self._locked_packages: list[dict[str, Any]] | None = None
+
+    def refresh(self) -> None:
+        """Forget the file lists and lock, for a cache kept across runs. File digests stay valid by stat."""
+        self._files = None
+        self._dependency_files = None
+        self._locked_packages = None
+
+    def has_passed(self, key: str) -> bool:
+        entry = self._passes_dir / key
+        if not entry.exists():
+            return False
+        entry.touch()
+        return True
+
+    def record_pass(self, key: str, inputs: StageInputs) -> None:
+        """Record that the stage of `inputs` passed with the inputs `key` was taken from, before it ran."""
+        ensure_cache_dir(self._project_root)
+        self._passes_dir.mkdir(exist_ok=True)
+        (self._passes_dir / key).write_text(inputs.stage)
+        self._evict()
+
+    def key(self, inputs: StageInputs) -> str:
+        key = hashlib.sha256()
+        key.update(f"pl-ci-cd {importlib.metadata.version('pl-ci-cd')}\n".encode())
+        key.update(f"stage {inputs.stage}\n".encode())
+        for tool in inputs.tools:
+            key.update(f"tool {tool} {self._locked_version(tool)}\n".encode())
+        files = self._project_files()
+        if inputs.path_dependencies:
+            files = files + self._path_dependency_files()
+        for file in files:
+            if inputs.suffixes is None or Path(file).suffix in inputs.suffixes:
+                key.update(f"file {file} {self._digest(file)}\n".encode())
+        key.update(
+            f"named {digest_named_files(self._project_root, inputs.named_files)}\n".encode()
+        )
+        self._save_index()
+        return key.hexdigest()
+
+    def file_digests(self) -> dict[str, str]:
+        """Digest every project file, as done for keys."""
+        digests = {file: self._digest(file) for file in self._project_files()}
+        self._save_index()
+        return digests
+
+    def _project_files(self) -> list[str]:
+        if self._files is None:
+            self._files = sorted(
+                file
+                for file in list_project_files(self._project_root)
+                if not Path(file).name.startswith(_TOOL_ARTIFACT_PREFIXES)
+                and (self._project_root / file).is_file()
+            )
+        return self._files
+
+    def _path_dependency_files(self) -> list[str]:
+        """Files of the locked path dependencies outside the project, relative to its root."""
+        if self._dependency_files is None:
+            root = self._project_root.resolve()
+            files: set[str] = set()
+            for package in self._lock():
+                source: dict[str, str] = package.get("source", {})
+                for kind in _PATH_SOURCES:
+                    if kind not in source:
+                        continue
+                    dependency = (root / source[kind]).resolve()
+                    if dependency.is_relative_to(root) or not dependency.exists():
+                        continue
+                    found = (
+                        [dependency / file for file in list_project_files(dependency)]
+                        if dependency.is_dir()
+                        else [dependency]
+                    )
+                    files.update(
+                        path.relative_to(root, walk_up=True).as_posix()
+                        for path in found
+                        if path.is_file()
+                    )
+            self._dependency_files = sorted(files)
+        return self._dependency_files
+
+    def _digest(self, file: str) -> str:
+        stat = (self._project_root / file).stat()
+        cached = self._index.get(file)
+        if (
+            cached is not None
+            and cached.mtime_ns == stat.st_mtime_ns
+            and cached.size == stat.st_size
+            and cached.inode == stat.st_ino
+        ):
+            return cached.digest
+        digest = hashlib.sha256((self._project_root / file).read_bytes()).hexdigest()
+        if stat.st_mtime_ns < time.time_ns() - _RACY_WINDOW_NS:
+            self._index[file] = _FileStat(
+                stat.st_mtime_ns, stat.st_size, stat.st_ino, digest
+            )
+        return digest
+
+    def _locked_version(self, package: str) -> str | None:
+        for locked in self._lock():
+            if locked["name"] == package:
+                return locked.get("version", "")
+        return None
+
+    def _lock(self) -> list[dict[str, Any]]:
+        if self._locked_packages is None:
+            lock_file = self._project_root / "uv.lock"
+            packages: list[dict[str, Any]] = (
+                tomllib.loads(lock_file.read_text()).get("package", [])
+                if lock_file.exists()
+                else []
+            )
+            self._locked_packages = packages
+        return self._locked_packages
+
+    def _load_index(self) -> dict[str, _FileStat]:
+        if not self._index_path.exists():
+            return {}
+        try:
+            raw = json.loads(self._index_path.read_text())
+            return {file: _FileStat(*stat) for file, stat in raw.items()}
+        except (ValueError, TypeError):
+            return {}
+
+    def _save_index(self) -> None:
+        ensure_cache_dir(self._project_root)
+        raw = {
+            file: [stat.mtime_ns, stat.size, stat.inode, stat.digest]
+            for file, stat in self._index.items()
+        }
+        # Written aside and moved into place, so an interrupted write can't corrupt it.
+        temporary = self._index_path.with_suffix(
+            f".{os.getpid()}-{uuid.uuid4().hex}.tmp"
+        )
+        temporary.write_text(json.dumps(raw))
+        temporary.replace(self._index_path)
+
+    def _evict(self) -> None:
+        entries = sorted(
+            self._passes_dir.iterdir(), key=lambda entry: entry.stat().st_mtime
+        )
+        oldest_allowed = time.time() - MAX_ENTRY_AGE_SECONDS
+        for index, entry in enumerate(entries):
+            if (
+                len(entries) - index > MAX_ENTRIES
+                or entry.stat().st_mtime < oldest_allowed
+            ):
+                entry.unlink()
+
+
+def ensure_cache_dir(project_root: Path) -> Path:
+    """Create the cache directory, ignored by git, and return it."""
+    cache_dir = project_root / CACHE_DIR_NAME
+    cache_dir.mkdir(exist_ok=True)
+    (cache_dir / ".gitignore").write_text("*\n")
+    return cache_dir
+
+
+def digest_named_files(project_root: Path, names: tuple[str, ...]) -> str:
+    """Hash the named files in `project_root`, distinguishing a missing file from an empty one."""
+    digest = hashlib.sha256()
+    for name in names:
+        path = project_root / name
+        digest.update(f"{name} {path.exists()}\n".encode())
+        if path.exists():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def list_project_files(project_root: Path) -> list[str]:
+    """Tracked and untracked-but-not-ignored files, or every non-hidden file outside git."""
+    result = run_program(
+        git_program(),
+        ["ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+        cwd=project_root,
+    )
+    if result.returncode == 0:
+        return [file for file in result.stdout.split("\0") if file]
+
+    files: list[str] = []
+    for dirpath, dirnames, filenames in os.walk(project_root):
+        dirnames[:] = [
+            name
+            for name in dirnames
+            if not name.startswith(".") and name != "__pycache__"
+        ]
+        relative_dir = Path(dirpath).relative_to(project_root)
+        files.extend(
+            (relative_dir / name).as_posix()
+            for name in filenames
+            if not name.startswith(".")
+        )
+    return files
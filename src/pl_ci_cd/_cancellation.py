@@ -0,0 +1,179 @@
+import asyncio
+import contextlib
+import os
+import signal
+import subprocess
+import threading
+from collections.abc import Callable, Generator
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from pathlib import Path
+from typing import Protocol
+
+from pl_run_program import Program, ProgramResult
+
+from pl_ci_cd._streaming import (
+    stream_process_output,
+    stream_process_output_async,
+    streaming_log_dir,
+)
+from pl_ci_cd._trace import record_exit_code
+
+# Lines longer than this make an asyncio subprocess' `readline` fail, so it is far above any real line.
+_ASYNC_LINE_LIMIT_BYTES = 64 * 1024 * 1024
+
+
+class _Process(Protocol):
+    @property
+    def pid(self) -> int: ...
+
+
+class CancellationScope:
+    """Tracks the programs started inside a scope so they can all be killed at once."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._processes: set[_Process] = set()
+        self.cancelled = False
+
+    def has_running_programs(self) -> bool:
+        with self._lock:
+            return bool(self._processes)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            for process in self._processes:
+                _kill_process_group(process)
+
+    def register(self, process: _Process) -> None:
+        with self._lock:
+            self._processes.add(process)
+            if self.cancelled:
+                _kill_process_group(process)
+
+    def unregister(self, process: _Process) -> None:
+        with self._lock:
+            self._processes.discard(process)
+
+
+_current_scope: ContextVar[CancellationScope | None] = ContextVar(
+    "_current_scope", default=None
+)
+
+
+@contextmanager
+def cancellation_scope(scope: CancellationScope) -> Generator[CancellationScope]:
+    """Register every program started by `run_cancellable_program` in this context with `scope`."""
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def submit_in_context[**P, T](
+    executor: Executor, fn: Callable[P, T], *args: P.args, **kwargs: P.kwargs
+) -> Future[T]:
+    """Submit `fn` to run in a copy of this context, since threads don't inherit its scope and tracers."""
+    return executor.submit(copy_context().run, fn, *args, **kwargs)
+
+
+def run_cancellable_program(
+    program: Program,
+    args: list[str] | None = None,
+    cwd: Path | None = None,
+    env: dict[str, str] | None = None,
+    log_name: str | None = None,
+) -> ProgramResult:
+    """
+    Drop-in replacement for `run_program` whose child is killed when the enclosing scope is cancelled.
+
+    Outside of a `cancellation_scope` this behaves exactly like `run_program`.
+    A killed program returns a negative return code, so callers report it as a failure. Each program runs
+    in a process group of its own, so killing it also kills whatever it started. That group misses the
+    terminal's Ctrl-C, so the program is also killed when anything, Ctrl-C included, interrupts the wait.
+    Inside `streaming_output`, a program given a `log_name` has its output streamed instead of buffered.
+    """
+    process = subprocess.Popen(
+        [program, *(args or [])],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        cwd=cwd,
+        env=env if env is not None else {},
+        start_new_session=True,
+    )
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.register(process)
+    log_dir = streaming_log_dir()
+    try:
+        if log_name is not None and log_dir is not None:
+            stdout, stderr = stream_process_output(
+                process, log_dir / f"{log_name}.log", log_name
+            )
+        else:
+            stdout, stderr = process.communicate()
+    except BaseException:
+        _kill_process_group(process)
+        process.wait()
+        raise
+    finally:
+        if scope is not None:
+            scope.unregister(process)
+    record_exit_code(process.returncode)
+    return ProgramResult(stdout=stdout, stderr=stderr, returncode=process.returncode)
+
+
+async def run_cancellable_program_async(
+    program: Program,
+    args: list[str] | None = None,
+    cwd: Path | None = None,
+    env: dict[str, str] | None = None,
+    log_name: str | None = None,
+) -> ProgramResult:
+    """
+    Awaitable `run_cancellable_program`, on an asyncio subprocess.
+
+    Cancelling the awaiting task kills the program and waits for it to exit before the cancellation propagates.
+    """
+    process = await asyncio.create_subprocess_exec(
+        program,
+        *(args or []),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd,
+        env=env if env is not None else {},
+        limit=_ASYNC_LINE_LIMIT_BYTES,
+        start_new_session=True,
+    )
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.register(process)
+    log_dir = streaming_log_dir()
+    try:
+        if log_name is not None and log_dir is not None:
+            stdout, stderr = await stream_process_output_async(
+                process, log_dir / f"{log_name}.log", log_name
+            )
+        else:
+            stdout_bytes, stderr_bytes = await process.communicate()
+            stdout, stderr = stdout_bytes.decode(), stderr_bytes.decode()
+    except BaseException:
+        _kill_process_group(process)
+        await process.wait()
+        raise
+    finally:
+        if scope is not None:
+            scope.unregister(process)
+    returncode = await process.wait()
+    record_exit_code(returncode)
+    return ProgramResult(stdout=stdout, stderr=stderr, returncode=returncode)
+
+
+def _kill_process_group(process: _Process) -> None:
+    """Kill the process group `process` leads, so its children can't keep its output pipes open."""
+    with contextlib.suppress(ProcessLookupError):
+        os.killpg(process.pid, signal.SIGKILL)
@@ -0,0 +1,63 @@
+import tomllib
+from pathlib import Path
+
+from pl_run_program import run_program, run_simple_program
+
+from pl_ci_cd._constants import git_program
+
+PYTHON_SUFFIXES = frozenset({".py", ".pyi", ".ipynb"})
+_RUFF_ONLY_CONFIG_FILES = frozenset({"ruff.toml", ".ruff.toml"})
+
+
+def changed_python_files(directory: Path, since: str) -> list[Path] | None:
+    """
+    Python files under `directory` that differ from the git ref `since`, including uncommitted and untracked files.
+
+    Returns None when ruff configuration changed, since then every file needs checking.
+    Paths are relative to `directory`.
+    """
+    changed = _diffed_files(directory, since)
+
+    if any(_ruff_config_changed(directory, since, path) for path in changed):
+        return None
+
+    return sorted(
+        path
+        for path in {*changed, *_untracked_files(directory)}
+        if path.suffix in PYTHON_SUFFIXES and (directory / path).is_file()
+    )
+
+
+def changed_files(directory: Path, since: str) -> list[Path]:
+    """Files under `directory` that differ from the git ref `since` (including deleted ones), plus untracked files."""
+    return sorted({*_diffed_files(directory, since), *_untracked_files(directory)})
+
+
+def _diffed_files(directory: Path, since: str) -> list[Path]:
+    return _git_paths(directory, "diff", "--name-only", "--relative", "-z", since)
+
+
+def _untracked_files(directory: Path) -> list[Path]:
+    return _git_paths(directory, "ls-files", "-z", "--others", "--exclude-standard")
+
+
+def _ruff_config_changed(directory: Path, since: str, path: Path) -> bool:
+    if path.name in _RUFF_ONLY_CONFIG_FILES:
+        return True
+    if path.name != "pyproject.toml":
+        return False
+    current = directory / path
+    before = run_program(git_program(), ["show", f"{since}:./{path}"], cwd=directory)
+    if before.returncode != 0 or not current.is_file():
+        # Added or deleted.
+        return True
+    return _ruff_section(before.stdout) != _ruff_section(current.read_text())
+
+
+def _ruff_section(pyproject: str) -> object:
+    return tomllib.loads(pyproject).get("tool", {}).get("ruff")
+
+
+def _git_paths(directory: Path, *args: str) -> list[Path]:
+    output = run_simple_program(git_program(), list(args), cwd=directory)
+    return [Path(path) for path in output.split("\0") if path]
@@ -3,12 +3,39 @@ from pathlib import Path
 from typing import Annotated
 
 import typer
+from pl_user_io.display import display
 from pl_user_io.loading_spinner import loading_spinner
 
+from pl_ci_cd._cache import CACHE_DIR_NAME, StageCache, StageInputs, ensure_cache_dir
+from pl_ci_cd._changed_files import changed_python_files
 from pl_ci_cd._check_format import check_format
 from pl_ci_cd._check_types import check_types
+from pl_ci_cd._daemon import DEFAULT_IDLE_TIMEOUT_SECONDS, hot_state_for, serve
+from pl_ci_cd._fix import FixResult
+from pl_ci_cd._fix import fix as fix_files
 from pl_ci_cd._lint import lint
-from pl_ci_cd._run_unit_tests_and_coverage import run_unit_tests_and_coverage
+from pl_ci_cd._monorepo import check_projects
+from pl_ci_cd._project import ProjectContext, find_project, find_pyproject_root
+from pl_ci_cd._resources import load_resource_config
+from pl_ci_cd._run_unit_tests_and_coverage import (
+    run_failed_tests_first,
+    run_unit_tests_and_coverage,
+)
+from pl_ci_cd._sharded_tests import run_sharded_unit_tests_and_coverage, shard_count
+from pl_ci_cd._stage_history import StageHistory
+from pl_ci_cd._stages import (
+    Stage,
+    prioritize,
+    run_stages_in_order,
+    run_stages_in_parallel,
+)
+from pl_ci_cd._streaming import LOGS_DIR_NAME, TAIL_LINES, streaming_output
+from pl_ci_cd._test_impact import IMPACT_MAP_NAME, run_impacted_unit_tests_and_coverage
+from pl_ci_cd._tool_environment import synced_tool_environment
+from pl_ci_cd._trace import trace_file, traced
+
+_RUFF_INPUTS = frozenset({".py", ".pyi", ".toml"})
+_PYRIGHT_INPUTS = frozenset({".py", ".pyi", ".toml", ".json", ".lock"})
 
 
 def check(
@@ -16,9 +43,89 @@ def check(
     fix: Annotated[
         bool,
         typer.Option(
-            help="Auto-fix issues where possible. Replaces `ruff format --check` with `ruff format` and adds `--fix` to `ruff check`.",
+            help="Auto-fix issues where possible. Runs `ruff check --fix` and then `ruff format`, again on just the rewritten files until they stop changing, and lists the files that were rewritten.",
+        ),
+    ] = False,
+    parallel: Annotated[
+        bool,
+        typer.Option(
+            help="Run the checks concurrently and stop all of them at the first failure. With `--fix`, the formatter and linter still run first, one after the other. Checks start only while their CPU and memory weights fit the budget in `[tool.pl-ci-cd.resources]`.",
+        ),
+    ] = False,
+    cache: Annotated[
+        bool,
+        typer.Option(
+            help=f"Skip checks that already passed for identical inputs (source files, path dependencies, configuration, and tool versions). Results are stored in `{CACHE_DIR_NAME}` in the project root.",
+        ),
+    ] = True,
+    since: Annotated[
+        str | None,
+        typer.Option(
+            help="Only format and lint Python files changed since this git ref, including uncommitted and untracked files. Every file is still checked if ruff's configuration changed.",
+        ),
+    ] = None,
+    presync: Annotated[
+        bool,
+        typer.Option(
+            help="Sync the project environment once up front (skipped if `uv.lock` and `pyproject.toml` are unchanged since the last sync) and run ruff, pyright, and pytest from `.venv/bin` instead of through `uv run`.",
+        ),
+    ] = False,
+    test_impact: Annotated[
+        bool,
+        typer.Option(
+            help=f"Run only the tests affected by changes since tests last passed, using per-test coverage recorded in `{CACHE_DIR_NAME}/{IMPACT_MAP_NAME}`. The 100% coverage gate is checked against the fresh coverage merged with the recorded coverage of untouched files. Every test runs when conftest.py, configuration, dependencies, or untraced files change.",
+        ),
+    ] = False,
+    shard_tests: Annotated[
+        bool,
+        typer.Option(
+            help="Spread the tests across several pytest processes, balanced on the test durations recorded by earlier runs, and combine their coverage before checking it. Each process counts the `tests` weight against the resource budget. Needs pytest 8.2 or later.",
+        ),
+    ] = False,
+    test_workers: Annotated[
+        int | None,
+        typer.Option(
+            help="Number of pytest processes for `--shard-tests`. Defaults to the CPU count.",
+        ),
+    ] = None,
+    trace: Annotated[
+        Path | None,
+        typer.Option(
+            help="Write a Chrome trace-event JSON file of the stages' timing, exit codes, and child-process resource usage, which Perfetto (ui.perfetto.dev) and chrome://tracing open.",
+        ),
+    ] = None,
+    stream: Annotated[
+        bool,
+        typer.Option(
+            help=f"Show the tools' output live while each check runs instead of only when it fails. The full output is written to `{CACHE_DIR_NAME}/{LOGS_DIR_NAME}` and errors include only its last {TAIL_LINES} lines.",
+        ),
+    ] = False,
+    all_projects: Annotated[
+        bool,
+        typer.Option(
+            "--all",
+            help="Check every project (directory with a `pyproject.toml`) under the directory, each in its own process, and summarize the results. With `--since`, only projects containing changed files are checked. The other options apply to each project.",
         ),
     ] = False,
+    project_workers: Annotated[
+        int | None,
+        typer.Option(
+            help="Number of projects `--all` checks at once. Defaults to the CPU count.",
+        ),
+    ] = None,
+    serve_checks: Annotated[
+        bool,
+        typer.Option(
+            "--serve",
+            help="Start a daemon for the project that keeps file digests, the stage cache, and a pyright language server in memory. While it runs, `check` and `commit` in the project are sent to it instead of starting from scratch.",
+        ),
+    ] = False,
+    idle_timeout: Annotated[
+        float,
+        typer.Option(
+            help="Seconds the `--serve` daemon waits for a request before exiting.",
+        ),
+    ] = DEFAULT_IDLE_TIMEOUT_SECONDS,
 ) -> None:
     """
     Run all CI checks: format, lint, type check, and tests with coverage.
@@ -28,35 +135,224 @@ def check(
     \b
     uv --directory <dir> run ruff format --check
     uv --directory <dir> run ruff check
-    uv run pyright <dir>
-    uv run pytest --cov --cov-fail-under=100 -q <dir>
+    uv --directory <dir> run pyright <dir>
+    uv --directory <dir> run pytest --cov --cov-fail-under=100 -q <dir>
+
+    Once they have run a few times, checks that fail often for how long they take run first (after the
+    formatter and linter with `--fix`), and each spinner shows how long its check usually takes.
+    With `--parallel`, they run concurrently and the first failure kills the rest. A check starts only while
+    its CPU and memory weight fits the budget in `[tool.pl-ci-cd.resources]` (default: the detected cores
+    and available memory).
+    A check whose inputs have not changed since it last passed is reported as a cached pass.
+    With `--since <ref>`, only the changed Python files are passed to ruff.
+    With `--presync`, `uv sync` runs at most once and the tools are run directly.
+    With `--test-impact`, pytest also records coverage per test and only the affected tests are run.
+    With `--shard-tests`, pytest runs in several processes and their coverage is combined.
+    With `--trace <file>`, the timing of each stage is written to <file>.
+    With `--stream`, output is shown as it is produced and logged in full.
+    With `--all`, every project under <dir> is checked.
+    With `--serve`, a daemon keeps state in memory and runs later `check` and `commit` calls.
     """
-    if directory is None:
-        directory = Path.cwd()
+    if serve_checks:
+        serve(find_pyproject_root(directory or Path.cwd()), idle_timeout)
+        return
+    if test_impact and shard_tests:
+        msg = "`--test-impact` and `--shard-tests` can't be used together."
+        raise ValueError(msg)
+    with trace_file(trace):
+        if all_projects:
+            check_args = [
+                "--fix" if fix else "--no-fix",
+                "--parallel" if parallel else "--no-parallel",
+                "--cache" if cache else "--no-cache",
+                "--presync" if presync else "--no-presync",
+                "--test-impact" if test_impact else "--no-test-impact",
+                "--shard-tests" if shard_tests else "--no-shard-tests",
+                "--stream" if stream else "--no-stream",
+            ]
+            if since is not None:
+                check_args += ["--since", since]
+            if test_workers is not None:
+                check_args += ["--test-workers", str(test_workers)]
+            with traced("check", "check"):
+                check_projects(
+                    directory or Path.cwd(), check_args, since, project_workers
+                )
+            return
+        run_checks(
+            find_project(directory or Path.cwd()),
+            fix=fix,
+            parallel=parallel,
+            cache=cache,
+            since=since,
+            presync=presync,
+            test_impact=test_impact,
+            shard_tests=shard_tests,
+            test_workers=test_workers,
+            stream=stream,
+        )
 
-    pyproject_root = directory
-    while not (pyproject_root / "pyproject.toml").exists():
-        if pyproject_root.parent == pyproject_root:
-            msg = f"Could not find `pyproject.toml` in {directory} or any parent directories."
-            raise FileNotFoundError(msg)
-        pyproject_root = pyproject_root.parent
 
-    with contextlib.chdir(pyproject_root):
-        with loading_spinner("Formatter"):
-            check_format(pyproject_root, fix)
+@traced("check", "check")
+def run_checks(
+    project: ProjectContext,
+    *,
+    fix: bool = False,
+    parallel: bool = False,
+    cache: bool = True,
+    since: str | None = None,
+    presync: bool = False,
+    test_impact: bool = False,
+    shard_tests: bool = False,
+    test_workers: int | None = None,
+    stream: bool = False,
+) -> None:
+    """Run the checks for `project`, filling in its changed paths and tools. The options are `check`'s."""
+    # Set when running inside a `check --serve` daemon for this project.
+    hot = hot_state_for(project.root)
+    resources = load_resource_config(project.tool_config)
 
-        with loading_spinner("Linter"):
-            lint_result = lint(pyproject_root, fix=fix)
-            if not lint_result.passed:
-                msg = f"Linting failed, aborting commit. Output:\n{lint_result.output}"
-                raise RuntimeError(msg)
+    if since is not None:
+        project.changed_paths = changed_python_files(project.root, since)
+        if project.changed_paths is None:
+            display(f"Ruff configuration changed since {since}, checking every file.")
+        else:
+            display(
+                f"{len(project.changed_paths)} Python file(s) changed since {since}."
+            )
+    # A pass over some of the files says nothing about the rest, so it is not cached.
+    cache_ruff_stages = project.changed_paths is None
 
-        with loading_spinner("Type checks"):
-            check_types(pyproject_root)
+    if presync:
+        with loading_spinner("Environment"), traced("Environment", "check"):
+            project.tools = synced_tool_environment(project.root)
 
-        with loading_spinner("Tests + Coverage"):
-            run_unit_tests_and_coverage(pyproject_root)
+    # With `fix`, the formatter stage applies lint fixes too, and the linter stage reports what they left.
+    fixed: FixResult | None = None
+
+    def _format() -> None:
+        nonlocal fixed
+        if not fix:
+            check_format(project.root, fix, project.changed_paths, project.tools)
+            return
+        fixed = fix_files(project.root, project.changed_paths, project.tools)
+        if fixed.rewritten:
+            display(
+                f"Fixed {len(fixed.rewritten)} file(s): {', '.join(map(str, fixed.rewritten))}"
+            )
+
+    def _lint() -> None:
+        lint_result = (
+            fixed.lint
+            if fixed is not None
+            else lint(
+                project.root,
+                fix=fix,
+                paths=project.changed_paths,
+                tools=project.tools,
+            )
+        )
+        if not lint_result.passed:
+            msg = f"Linting failed, aborting commit. Output:\n{lint_result.output}"
+            raise RuntimeError(msg)
+
+    def _check_types() -> None:
+        if hot is None:
+            check_types(project.root, project.tools)
+        else:
+            check_types(project.root, project.tools, hot.pyright_session)
+
+    def _run_tests() -> None:
+        run_failed_tests_first(project.root, project.tools)
+        if test_impact:
+            run_impacted_unit_tests_and_coverage(project.root, project.tools)
+        elif shard_tests:
+            run_sharded_unit_tests_and_coverage(
+                project.root, project.tools, test_workers
+            )
+        else:
+            run_unit_tests_and_coverage(project.root, project.tools)
+
+    tests_weight = resources.weights["tests"]
+    if shard_tests:
+        # The weight is that of one pytest process, and sharding starts one per worker.
+        tests_weight *= shard_count(test_workers)
+
+    fixers = [
+        Stage(
+            "Formatter",
+            _format,
+            StageInputs("format", _RUFF_INPUTS, ("ruff",))
+            if cache_ruff_stages
+            else None,
+            resources.weights["format"],
+            rewrites_inputs=fix,
+        ),
+        Stage(
+            "Linter",
+            _lint,
+            StageInputs("lint", _RUFF_INPUTS, ("ruff",)) if cache_ruff_stages else None,
+            resources.weights["lint"],
+            rewrites_inputs=fix,
+        ),
+    ]
+    checkers = [
+        Stage(
+            "Type checks",
+            _check_types,
+            StageInputs(
+                "types",
+                _PYRIGHT_INPUTS,
+                ("pyright",),
+                (".python-version",),
+                path_dependencies=True,
+            ),
+            resources.weights["types"],
+        ),
+        Stage(
+            "Tests + Coverage",
+            _run_tests,
+            StageInputs(
+                "tests",
+                None,
+                ("pytest", "pytest-cov", "coverage"),
+                (".python-version",),
+                path_dependencies=True,
+            ),
+            tests_weight,
+        ),
+    ]
+    stage_cache = (
+        (StageCache(project.root) if hot is None else hot.stage_cache)
+        if cache
+        else None
+    )
+
+    # Stages that fail often for their cost go first, so a failing check is reported as soon as possible.
+    history = StageHistory(project.root)
+    if fix:
+        # Fixes rewrite files, so the formatter has to finish before the linter
+        # and both before anything reads the result.
+        sequential, concurrent = fixers, prioritize(checkers, history)
+    else:
+        sequential, concurrent = [], prioritize(fixers + checkers, history)
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(contextlib.chdir(project.root))
+        if stream:
+            stack.enter_context(
+                streaming_output(ensure_cache_dir(project.root) / LOGS_DIR_NAME)
+            )
+        if parallel:
+            run_stages_in_order(sequential, stage_cache, history)
+            run_stages_in_parallel(concurrent, stage_cache, history, resources.budget)
+        else:
+            run_stages_in_order(sequential + concurrent, stage_cache, history)
 
 
 def main() -> None:
     typer.run(check)  # pragma: no cover
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
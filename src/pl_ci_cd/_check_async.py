@@ -0,0 +1,83 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+from pl_ci_cd._check_format import check_format_async
+from pl_ci_cd._check_types import check_types_async
+from pl_ci_cd._fix import fix_async
+from pl_ci_cd._lint import lint_async
+from pl_ci_cd._project import find_pyproject_root
+from pl_ci_cd._run_unit_tests_and_coverage import run_unit_tests_and_coverage_async
+from pl_ci_cd._tool_environment import UV_RUN, ToolEnvironment
+from pl_ci_cd._trace import traced
+
+
+async def check_async(
+    directory: Path | None = None,
+    fix: bool = False,
+    parallel: bool = False,
+    tools: ToolEnvironment = UV_RUN,
+) -> None:
+    """
+    Awaitable `check`: format, lint, type check, and tests with coverage, each run as an asyncio subprocess.
+
+    Unlike `check`, nothing is displayed or cached, and the first failure is raised. With `parallel`, the checks
+    run as tasks of one task group, so the first failure cancels the rest and kills their programs (with `fix`,
+    fixing finishes first). Cancelling the call kills whatever is running.
+    """
+    pyproject_root = find_pyproject_root(directory or Path.cwd())
+
+    async def _format() -> None:
+        await check_format_async(pyproject_root, fix=False, tools=tools)
+
+    async def _lint() -> None:
+        lint_result = await lint_async(pyproject_root, tools=tools)
+        if not lint_result.passed:
+            msg = f"Linting failed. Output:\n{lint_result.output}"
+            raise RuntimeError(msg)
+
+    async def _fix() -> None:
+        fixed = await fix_async(pyproject_root, tools=tools)
+        if not fixed.lint.passed:
+            msg = f"Linting failed. Output:\n{fixed.lint.output}"
+            raise RuntimeError(msg)
+
+    async def _check_types() -> None:
+        await check_types_async(pyproject_root, tools)
+
+    async def _run_tests() -> None:
+        await run_unit_tests_and_coverage_async(pyproject_root, tools)
+
+    fixers: list[tuple[str, Callable[[], Awaitable[None]]]] = (
+        [("Fixer", _fix)] if fix else [("Formatter", _format), ("Linter", _lint)]
+    )
+    checkers: list[tuple[str, Callable[[], Awaitable[None]]]] = [
+        ("Type checks", _check_types),
+        ("Tests + Coverage", _run_tests),
+    ]
+    if not parallel:
+        for label, stage in fixers + checkers:
+            await _traced(label, stage)
+    elif fix:
+        # Fixes rewrite files, so they have to finish before anything reads the result.
+        await _traced(*fixers[0])
+        await _run_concurrently(checkers)
+    else:
+        await _run_concurrently(fixers + checkers)
+
+
+async def _run_concurrently(
+    stages: list[tuple[str, Callable[[], Awaitable[None]]]],
+) -> None:
+    try:
+        async with asyncio.TaskGroup() as group:
+            for label, stage in stages:
+                group.create_task(_traced(label, stage))
+    except ExceptionGroup as errors:
+        # The task group collects failures in the order they happened; the rest were cancelled by the first.
+        raise errors.exceptions[0] from None
+
+
+async def _traced(label: str, stage: Callable[[], Awaitable[None]]) -> None:
+    with traced(label, "check"):
+        await stage()
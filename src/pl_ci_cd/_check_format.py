@@ -1,25 +1,71 @@
 from pathlib import Path
 from types import NoneType
 
-from pl_run_program import run_program, run_simple_program
+from pl_run_program import ProgramResult
 
-from pl_ci_cd._constants import UV_PROGRAM
+from pl_ci_cd._cancellation import (
+    run_cancellable_program,
+    run_cancellable_program_async,
+)
+from pl_ci_cd._tool_environment import (
+    UV_RUN,
+    ToolCommand,
+    ToolEnvironment,
+    ruff_command,
+)
 
 
 class FormatCheckError(Exception):
     pass
 
 
-def check_format(directory: Path, fix: bool) -> NoneType:
-    args = ["--directory", str(directory), "run", "ruff", "format"]
-    if not fix:
-        args.append("--check")
-    if fix:
-        run_simple_program(UV_PROGRAM, args)
-        return
-    result = run_program(UV_PROGRAM, args)
-    if result.returncode != 0:
-        msg = (
-            f"Format check failed. stdout: `{result.stdout}` stderr: `{result.stderr}`"
+def check_format(
+    directory: Path,
+    fix: bool,
+    paths: list[Path] | None = None,
+    tools: ToolEnvironment = UV_RUN,
+) -> NoneType:
+    """Format (or check the formatting of) `paths`, relative to `directory`, or the whole directory if None."""
+    command = _command(directory, fix, paths, tools)
+    if command is not None:
+        result = run_cancellable_program(
+            command.program,
+            command.args,
+            cwd=directory,
+            env=command.env,
+            log_name="ruff-format",
         )
+        _raise_on_failure(result, fix)
+
+
+async def check_format_async(
+    directory: Path,
+    fix: bool,
+    paths: list[Path] | None = None,
+    tools: ToolEnvironment = UV_RUN,
+) -> NoneType:
+    command = _command(directory, fix, paths, tools)
+    if command is not None:
+        result = await run_cancellable_program_async(
+            command.program,
+            command.args,
+            cwd=directory,
+            env=command.env,
+            log_name="ruff-format",
+        )
+        _raise_on_failure(result, fix)
+
+
+def _command(
+    directory: Path, fix: bool, paths: list[Path] | None, tools: ToolEnvironment
+) -> ToolCommand | None:
+    return ruff_command(
+        tools, ["format"] if fix else ["format", "--check"], paths, directory
+    )
+
+
+def _raise_on_failure(result: ProgramResult, fix: bool) -> None:
+    if result.returncode != 0:
+        action = "Formatting" if fix else "Format check"
+        msg = f"{action} failed. stdout: `{result.stdout}` stderr: `{result.stderr}`"
         raise FormatCheckError(msg)
@@ -1,10 +1,16 @@
+import asyncio
 from pathlib import Path
 from types import NoneType
 
 from pl_mocks_and_fakes import MockInUnitTests, MockReason
-from pl_run_program.run_program import run_program
+from pl_run_program import ProgramResult
 
-from pl_ci_cd._constants import UV_PROGRAM
+from pl_ci_cd._cancellation import (
+    run_cancellable_program,
+    run_cancellable_program_async,
+)
+from pl_ci_cd._pyright_session import PyrightSession, TypeDiagnostic
+from pl_ci_cd._tool_environment import UV_RUN, ToolEnvironment
 
 
 class TypeCheckError(Exception):
@@ -12,10 +18,64 @@ class TypeCheckError(Exception):
 
 
 @MockInUnitTests(MockReason.SLOW)
-def check_types(directory: Path) -> NoneType:
-    args = ["run", "pyright", str(directory)]
-    result = run_program(UV_PROGRAM, args)
+def check_types(
+    directory: Path,
+    tools: ToolEnvironment = UV_RUN,
+    session: PyrightSession | None = None,
+) -> NoneType:
+    """
+    Type check `directory` with pyright. Raises if there are any errors.
 
+    Passing a `session` for the same directory asks its long-lived language server instead of starting
+    pyright from scratch, so only files changed since the session's last check are re-analyzed.
+    """
+    if session is not None:
+        _raise_on_errors(session.diagnostics())
+        return
+    command = tools.command("pyright", [str(directory)], directory)
+    result = run_cancellable_program(
+        command.program,
+        command.args,
+        cwd=directory,
+        env=command.env,
+        log_name="pyright",
+    )
+    _raise_on_failure(result)
+
+
+async def check_types_async(
+    directory: Path,
+    tools: ToolEnvironment = UV_RUN,
+    session: PyrightSession | None = None,
+) -> NoneType:
+    if session is not None:
+        # The session's protocol is blocking, so it is asked from a worker thread. Cancelling stops waiting
+        # for the answer and leaves the server up for the next request.
+        _raise_on_errors(await asyncio.to_thread(session.diagnostics))
+        return
+
+    command = tools.command("pyright", [str(directory)], directory)
+    result = await run_cancellable_program_async(
+        command.program,
+        command.args,
+        cwd=directory,
+        env=command.env,
+        log_name="pyright",
+    )
+    _raise_on_failure(result)
+
+
+def _raise_on_errors(diagnostics: list[TypeDiagnostic]) -> None:
+    errors = [
+        diagnostic for diagnostic in diagnostics if diagnostic.severity == "error"
+    ]
+    if errors:
+        listing = "\n".join(str(error) for error in errors)
+        msg = f"Type check failed. {len(errors)} error(s):\n{listing}"
+        raise TypeCheckError(msg)
+
+
+def _raise_on_failure(result: ProgramResult) -> None:
     if result.returncode == 0:
         return
 
@@ -0,0 +1,53 @@
+import fcntl
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+
+# Enough for every tree a busy repository ships in a while, small enough to read on every ship.
+MAX_LEDGER_ENTRIES = 1000
+
+
+class CiLedger:
+    """
+    The git trees that passed CI in one repository, each with a hash of the CI script that passed it.
+
+    Kept in the repository's git directory so every worktree shares it. Only the most recent
+    `MAX_LEDGER_ENTRIES` passes are kept.
+    """
+
+    def __init__(self, git_common_dir: Path, ci_script: Path) -> None:
+        self._path = git_common_dir / "pl-ci-cd" / "ci-ledger.json"
+        self._script_digest = hashlib.sha256(ci_script.read_bytes()).hexdigest()
+
+    def has_passed(self, tree: str) -> bool:
+        return self._key(tree) in self._load()
+
+    def record(self, tree: str) -> None:
+        """Add `tree`, holding the ledger's lock so passes recorded by other `ship`s at the same time are kept."""
+        key = self._key(tree)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with self._path.with_suffix(".lock").open("w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                entries = [entry for entry in self._load() if entry != key]
+                entries.append(key)
+                temporary = self._path.with_suffix(
+                    f".{os.getpid()}-{uuid.uuid4().hex}.tmp"
+                )
+                temporary.write_text(json.dumps(entries[-MAX_LEDGER_ENTRIES:]))
+                temporary.replace(self._path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _key(self, tree: str) -> str:
+        return f"{tree} {self._script_digest}"
+
+    def _load(self) -> list[str]:
+        if not self._path.exists():
+            return []
+        try:
+            return [str(entry) for entry in json.loads(self._path.read_text())]
+        except (ValueError, TypeError):
+            return []
@@ -1,6 +1,15 @@
+from functools import cache
 from pathlib import Path
 
-from pl_run_program import program_at_path
+from pl_run_program import Program, program_at_path
 
-UV_PROGRAM = program_at_path(Path.home() / ".local/bin/uv")
-GIT_PROGRAM = program_at_path(Path("/usr/bin/git"))
+
+# Looked up on first use rather than at import, so importing a module doesn't check for programs it may never run.
+@cache
+def uv_program() -> Program:
+    return program_at_path(Path.home() / ".local/bin/uv")
+
+
+@cache
+def git_program() -> Program:
+    return program_at_path(Path("/usr/bin/git"))
@@ -0,0 +1,211 @@
+import contextlib
+import importlib
+import io
+import json
+import os
+import socket
+import threading
+from collections.abc import Generator
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import click
+import typer
+from pl_user_io.display import display
+
+from pl_ci_cd._cache import StageCache
+from pl_ci_cd._daemon_client import peer_uid, socket_path
+from pl_ci_cd._pyright_session import PyrightSession
+
+DEFAULT_IDLE_TIMEOUT_SECONDS = 600.0
+# How long a client may take to send its request, or to take each piece of output, before it's dropped.
+REQUEST_TIMEOUT_SECONDS = 10.0
+# The CLI commands a daemon runs, by module. Imported on first use, since `check` itself starts the daemon.
+_COMMANDS = {"check": "pl_ci_cd._check", "commit": "pl_ci_cd.commit"}
+
+
+class DaemonError(Exception):
+    pass
+
+
+@dataclass
+class HotState:
+    """What a `check --serve` daemon keeps in memory for its project between requests."""
+
+    project_root: Path
+    stage_cache: StageCache
+    pyright_session: PyrightSession
+
+
+_hot_state: ContextVar[HotState | None] = ContextVar("_hot_state", default=None)
+
+
+@contextlib.contextmanager
+def using_hot_state(state: HotState) -> Generator[HotState]:
+    token = _hot_state.set(state)
+    try:
+        yield state
+    finally:
+        _hot_state.reset(token)
+
+
+def hot_state_for(project_root: Path) -> HotState | None:
+    """Return the daemon's state if this runs inside a daemon serving `project_root`, else None."""
+    state = _hot_state.get()
+    if state is None or state.project_root.resolve() != project_root.resolve():
+        return None
+    return state
+
+
+def serve(
+    project_root: Path, idle_timeout_seconds: float = DEFAULT_IDLE_TIMEOUT_SECONDS
+) -> None:
+    """
+    Serve `check` and `commit` requests for `project_root` on a Unix socket, one at a time.
+
+    File digests, the stage cache, and a pyright language server stay in memory between requests. Each
+    request runs in the client's working directory and environment. Exits after `idle_timeout_seconds`
+    without a request. Connections from other users are refused, and clients that stall are dropped.
+    """
+    try:
+        path = socket_path(project_root)
+    except PermissionError as error:
+        raise DaemonError(str(error)) from None
+    if is_serving(path):
+        msg = f"A daemon is already serving {project_root} on {path}."
+        raise DaemonError(msg)
+    # Left behind by a daemon that was killed.
+    path.unlink(missing_ok=True)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen()
+    server.settimeout(idle_timeout_seconds)
+    state = HotState(
+        project_root, StageCache(project_root), PyrightSession(project_root)
+    )
+    display(f"Serving checks for {project_root} on {path}.")
+    try:
+        with state.pyright_session, using_hot_state(state):
+            while True:
+                try:
+                    connection, _ = server.accept()
+                except TimeoutError:
+                    display(
+                        f"No requests for {idle_timeout_seconds:g}s, shutting down."
+                    )
+                    return
+                with connection:
+                    connection.settimeout(REQUEST_TIMEOUT_SECONDS)
+                    uid = peer_uid(connection)
+                    if uid == os.getuid():
+                        _handle(connection, state)
+                    else:
+                        display(f"Refused a connection from user {uid}.")
+    finally:
+        server.close()
+        path.unlink(missing_ok=True)
+
+
+def is_serving(path: Path) -> bool:
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(str(path))
+    except OSError:
+        return False
+    else:
+        return True
+    finally:
+        connection.close()
+
+
+class _OutputForwarder(io.StringIO):
+    """A text stream that sends everything written to it to the client, from any thread."""
+
+    def __init__(self, connection: socket.socket) -> None:
+        super().__init__()
+        self._connection = connection
+        self._lock = threading.Lock()
+        self._client_gone = False
+
+    def write(self, s: str) -> int:
+        # Rejects bytes like any text stream, which click relies on to tell text streams from binary ones.
+        written = super().write(s)
+        self.seek(0)
+        self.truncate()
+        if s:
+            self.send({"output": s})
+        return written
+
+    def send(self, message: dict[str, Any]) -> None:
+        with self._lock:
+            if self._client_gone:
+                return
+            try:
+                self._connection.sendall((json.dumps(message) + "\n").encode())
+            except OSError:
+                # A client that went away or stopped reading doesn't stop the request. Nothing more is sent,
+                # since a message may have been cut off.
+                self._client_gone = True
+
+
+def _handle(connection: socket.socket, state: HotState) -> None:
+    try:
+        with connection.makefile("r", encoding="utf-8") as stream:
+            line = stream.readline()
+    except TimeoutError:
+        display(
+            f"Dropped a client that sent no request for {REQUEST_TIMEOUT_SECONDS:g}s."
+        )
+        return
+    if not line:
+        # Another daemon checking whether this one is running.
+        return
+    request = json.loads(line)
+    forwarder = _OutputForwarder(connection)
+    # Files may have been added, removed, or locked to new versions since the last request.
+    state.stage_cache.refresh()
+    with (
+        contextlib.redirect_stdout(forwarder),
+        contextlib.redirect_stderr(forwarder),
+        contextlib.chdir(request["cwd"]),
+        _environment(request["env"]),
+    ):
+        exit_code = _run_command(request["command"], request["args"])
+    forwarder.send({"exit_code": exit_code})
+
+
+@contextlib.contextmanager
+def _environment(env: dict[str, str]) -> Generator[None]:
+    """Replace the daemon's environment with `env`, which the programs the request runs inherit."""
+    saved = dict(os.environ)
+    os.environ.clear()
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+
+def _run_command(name: str, args: list[str]) -> int:
+    if name not in _COMMANDS:
+        display(f"Unknown command: {name}")
+        return 2
+    app = typer.Typer(add_completion=False)
+    app.command()(getattr(importlib.import_module(_COMMANDS[name]), name))
+    try:
+        result = typer.main.get_command(app).main(
+            args=args, prog_name=name, standalone_mode=False
+        )
+    except click.ClickException as error:
+        error.show()
+        return error.exit_code
+    except Exception as error:
+        # Reported to the client like the CLI would, instead of ending the daemon.
+        display(f"{type(error).__name__}: {error}")
+        return 1
+    # `--help` and other early exits return their exit code.
+    return result if isinstance(result, int) else 0
@@ -0,0 +1,146 @@
+# Entry points for the `check` and `commit` scripts that forward to a `check --serve` daemon when one is running.
+# Only the standard library is imported here, so a forwarded request doesn't pay for importing the checks.
+
+import contextlib
+import hashlib
+import importlib
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+import tempfile
+from pathlib import Path
+from typing import TextIO
+
+# `struct ucred`: the pid, uid, and gid of a Unix socket's peer.
+_UCRED = "3i"
+
+
+def socket_path(project_root: Path) -> Path:
+    """
+    Where the daemon for `project_root` listens. Kept short, since Unix socket paths are limited to ~100 bytes.
+
+    The socket goes in `$XDG_RUNTIME_DIR`, or else in a directory of the user's own in the temporary
+    directory, so other users can't connect to the daemon or put a socket of theirs in its place. Raises
+    `PermissionError` if that directory is open to anyone else.
+    """
+    digest = hashlib.sha256(str(project_root.resolve()).encode()).hexdigest()[:16]
+    return _private_directory() / f"pl-ci-cd-{digest}.sock"
+
+
+def peer_uid(connection: socket.socket) -> int:
+    """Return the user id of the process at the other end of a Unix socket."""
+    credentials = connection.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize(_UCRED)
+    )
+    _, uid, _ = struct.unpack(_UCRED, credentials)
+    return uid
+
+
+def nearest_pyproject_root(directory: Path) -> Path | None:
+    """Return the nearest directory at or above `directory` that has a `pyproject.toml`, if any."""
+    for candidate in (directory, *directory.parents):
+        if (candidate / "pyproject.toml").exists():
+            return candidate
+    return None
+
+
+def forward(
+    command: str, args: list[str], cwd: Path, output: TextIO | None = None
+) -> int | None:
+    """
+    Run `command` with its CLI `args` in the daemon serving the project at `cwd` (or `--directory`).
+
+    The daemon's output is written to `output` (default: stdout) as it arrives. Returns the command's exit
+    code, or None if no daemon is serving the project.
+    """
+    directory = _directory_arg(args) or cwd
+    root = nearest_pyproject_root(
+        directory if directory.is_absolute() else cwd / directory
+    )
+    if root is None:
+        return None
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(str(socket_path(root)))
+    except OSError:
+        # No daemon, a stale socket left by one that was killed, or a socket directory others can write to.
+        connection.close()
+        return None
+    if peer_uid(connection) != os.getuid():
+        # Not our daemon, so it mustn't see the request or answer it.
+        connection.close()
+        return None
+
+    sink = output or sys.stdout
+    request = {
+        "command": command,
+        "args": args,
+        "cwd": str(cwd),
+        # So the daemon runs git, the tools, and hooks as this process would, with its PATH, GIT_* and more.
+        "env": dict(os.environ),
+    }
+    with (
+        # A daemon that exits, or refuses the request, closes the connection under the client.
+        contextlib.suppress(ConnectionError),
+        connection,
+        connection.makefile("rw", encoding="utf-8") as stream,
+    ):
+        stream.write(json.dumps(request) + "\n")
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "output" in message:
+                sink.write(message["output"])
+                sink.flush()
+            else:
+                return message["exit_code"]
+    sink.write("The check daemon exited before finishing the request.\n")
+    return 1
+
+
+def _private_directory() -> Path:
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        directory = Path(runtime_dir)
+    else:
+        directory = Path(tempfile.gettempdir()) / f"pl-ci-cd-{os.getuid()}"
+        directory.mkdir(mode=0o700, exist_ok=True)
+    status = directory.lstat()
+    if (
+        not stat.S_ISDIR(status.st_mode)
+        or status.st_uid != os.getuid()
+        or status.st_mode & 0o077
+    ):
+        msg = f"{directory} must be a directory only its owner, you, can use."
+        raise PermissionError(msg)
+    return directory
+
+
+def _directory_arg(args: list[str]) -> Path | None:
+    for index, arg in enumerate(args):
+        if arg == "--directory" and index + 1 < len(args):
+            return Path(args[index + 1])
+        if arg.startswith("--directory="):
+            return Path(arg.removeprefix("--directory="))
+    return None
+
+
+def _forward_or_run(command: str, module: str) -> None:
+    args = sys.argv[1:]
+    if "--serve" not in args:
+        exit_code = forward(command, args, Path.cwd())
+        if exit_code is not None:
+            sys.exit(exit_code)
+    # Imported only now, so forwarding stays fast.
+    importlib.import_module(module).main()
+
+
+def check_main() -> None:
+    _forward_or_run("check", "pl_ci_cd._check")
+
+
+def commit_main() -> None:
+    _forward_or_run("commit", "pl_ci_cd.commit")  # pragma: no cover
@@ -0,0 +1,30 @@
+import json
+from pathlib import Path
+
+from pl_ci_cd._cache import CACHE_DIR_NAME, ensure_cache_dir
+
+FAILED_TESTS_NAME = "failed_tests.json"
+
+
+def load_failed_tests(project_root: Path) -> list[str]:
+    """Ids of the tests that failed in the last run, leaving out those whose file is gone."""
+    path = project_root / CACHE_DIR_NAME / FAILED_TESTS_NAME
+    if not path.exists():
+        return []
+    try:
+        raw = json.loads(path.read_text())
+        tests = [str(test) for test in raw]
+    except (ValueError, TypeError):
+        return []
+    return [
+        test for test in tests if (project_root / test.partition("::")[0]).is_file()
+    ]
+
+
+def record_failed_tests(project_root: Path, tests: list[str]) -> None:
+    """Remember the tests that failed in a run, or forget them all if none did."""
+    path = ensure_cache_dir(project_root) / FAILED_TESTS_NAME
+    if tests:
+        path.write_text(json.dumps(sorted(set(tests))))
+    else:
+        path.unlink(missing_ok=True)
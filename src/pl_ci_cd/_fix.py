@@ -0,0 +1,120 @@
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+
+from pl_ci_cd._cache import list_project_files
+from pl_ci_cd._check_format import check_format, check_format_async
+from pl_ci_cd._lint import LintDiagnostic, LintResult, lint, lint_async
+from pl_ci_cd._tool_environment import UV_RUN, ToolEnvironment
+
+# Each pass after the first only sees files the previous one rewrote, so this is only reached if ruff's
+# fixes and formatting keep undoing each other.
+MAX_FIX_PASSES = 5
+_PYTHON_SUFFIXES = (".py", ".pyi")
+
+
+@dataclass
+class FixResult:
+    # Relative to the fixed directory, sorted.
+    rewritten: list[Path]
+    # What is left for `lint` to report once every file is stable.
+    lint: LintResult
+    passes: int
+
+
+class FixError(Exception):
+    pass
+
+
+def fix(
+    directory: Path,
+    paths: list[Path] | None = None,
+    tools: ToolEnvironment = UV_RUN,
+) -> FixResult:
+    """Apply lint fixes and then formatting to `paths`, relative to `directory`, or the whole directory if None."""
+    passes = _Passes(directory, paths)
+    while passes.pending != []:
+        lint_result = lint(directory, fix=True, paths=passes.pending, tools=tools)
+        check_format(directory, fix=True, paths=passes.pending, tools=tools)
+        passes.record(lint_result)
+    return passes.result()
+
+
+async def fix_async(
+    directory: Path,
+    paths: list[Path] | None = None,
+    tools: ToolEnvironment = UV_RUN,
+) -> FixResult:
+    passes = _Passes(directory, paths)
+    while passes.pending != []:
+        lint_result = await lint_async(
+            directory, fix=True, paths=passes.pending, tools=tools
+        )
+        await check_format_async(directory, fix=True, paths=passes.pending, tools=tools)
+        passes.record(lint_result)
+    return passes.result()
+
+
+class _Passes:
+    """What `fix` knows between passes."""
+
+    def __init__(self, directory: Path, paths: list[Path] | None) -> None:
+        self._directory = directory
+        self._original = _digests(directory, paths)
+        self._digests = self._original
+        self._diagnostics: dict[Path, list[LintDiagnostic]] = {}
+        self._warnings: list[str] = []
+        # Lint fixes can leave code unformatted and formatting can make new lint fixes apply, so the files a
+        # pass rewrote are fixed again, until a pass leaves them unchanged and this is empty.
+        self.pending = paths
+        self.count = 0
+
+    def record(self, lint_result: LintResult) -> None:
+        self.count += 1
+        for path in self.pending or ():
+            self._diagnostics.pop(path, None)
+        for diagnostic in lint_result.diagnostics:
+            self._diagnostics.setdefault(diagnostic.path, []).append(diagnostic)
+        self._warnings = lint_result.warnings
+
+        fixed = _digests(self._directory, self.pending)
+        self.pending = [
+            path for path, digest in fixed.items() if self._digests.get(path) != digest
+        ]
+        self._digests = self._digests | fixed
+        if self.pending and self.count == MAX_FIX_PASSES:
+            listing = ", ".join(map(str, self.pending))
+            msg = f"Fixing and formatting didn't settle after {MAX_FIX_PASSES} passes. Still changing: {listing}"
+            raise FixError(msg)
+
+    def result(self) -> FixResult:
+        remaining = sorted(
+            diagnostic for found in self._diagnostics.values() for diagnostic in found
+        )
+        return FixResult(
+            rewritten=sorted(
+                path
+                for path, digest in self._digests.items()
+                if self._original.get(path) != digest
+            ),
+            lint=LintResult(
+                passed=not remaining and not self._warnings,
+                diagnostics=remaining,
+                warnings=self._warnings,
+            ),
+            passes=self.count,
+        )
+
+
+def _digests(directory: Path, paths: list[Path] | None) -> dict[Path, str]:
+    if paths is None:
+        paths = [
+            Path(file)
+            for file in list_project_files(directory)
+            if file.endswith(_PYTHON_SUFFIXES)
+        ]
+    return {
+        path: hashlib.sha256((directory / path).read_bytes()).hexdigest()
+        for path in paths
+        if (directory / path).is_file()
+    }
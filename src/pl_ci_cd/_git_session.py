@@ -0,0 +1,133 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cached_property
+from pathlib import Path
+
+from pl_run_program import run_simple_program
+
+from pl_ci_cd._constants import git_program
+
+_SESSIONS: ContextVar[dict[Path, "GitSession"] | None] = ContextVar(
+    "git_sessions", default=None
+)
+
+
+class GitQueryError(Exception):
+    pass
+
+
+class GitSession:
+    """
+    Git access for one worktree that answers read-only queries without a `git` process per query.
+
+    Revisions are resolved by a single long-lived `git cat-file --batch-check`, which reads refs afresh for
+    every query, and the current branch is read from the worktree's `HEAD` file. Commands that change the
+    repository still run `git` directly.
+    """
+
+    def __init__(self, worktree: Path) -> None:
+        self.worktree = worktree
+        self._batch: subprocess.Popen[str] | None = None
+
+    @cached_property
+    def git_dir(self) -> Path:
+        """The worktree's own git directory, which holds its `HEAD` and index."""
+        return self._directories[0]
+
+    @cached_property
+    def common_dir(self) -> Path:
+        """The git directory shared by every worktree of the repository."""
+        return self._directories[1]
+
+    def run(self, *args: str) -> str:
+        return run_simple_program(
+            git_program(), list(args), cwd=self.worktree, env=dict(os.environ)
+        )
+
+    def resolve(self, revision: str) -> str:
+        """Return the id of the object `revision` names, like `git rev-parse --verify`."""
+        batch = self._batch_process()
+        assert batch.stdin is not None
+        assert batch.stdout is not None
+        batch.stdin.write(f"{revision}\n")
+        batch.stdin.flush()
+        # "<oid> <type> <size>", or "<revision> missing".
+        fields = batch.stdout.readline().split()
+        if len(fields) != 3:
+            msg = f"{revision!r} does not name an object in {self.worktree}."
+            raise GitQueryError(msg)
+        return fields[0]
+
+    def current_branch(self) -> str:
+        """Return the checked-out branch, or "" on a detached `HEAD`, like `git branch --show-current`."""
+        head = (self.git_dir / "HEAD").read_text().strip()
+        prefix = "ref: refs/heads/"
+        return head.removeprefix(prefix) if head.startswith(prefix) else ""
+
+    def working_tree(self) -> str:
+        """
+        Return the id of the tree `git add -A` would stage, committed or not.
+
+        Staging goes to a copy of the index, so the worktree's own index is left alone.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            scratch_index = Path(directory) / "index"
+            shutil.copyfile(self.git_dir / "index", scratch_index)
+            env = {**os.environ, "GIT_INDEX_FILE": str(scratch_index)}
+            run_simple_program(git_program(), ["add", "-A"], cwd=self.worktree, env=env)
+            return run_simple_program(
+                git_program(), ["write-tree"], cwd=self.worktree, env=env
+            ).strip()
+
+    def close(self) -> None:
+        if self._batch is not None:
+            self._batch.communicate()
+            self._batch = None
+
+    @cached_property
+    def _directories(self) -> tuple[Path, Path]:
+        git_dir, common_dir = self.run(
+            "rev-parse", "--absolute-git-dir", "--git-common-dir"
+        ).splitlines()
+        return Path(git_dir), (self.worktree / common_dir).resolve()
+
+    def _batch_process(self) -> "subprocess.Popen[str]":
+        if self._batch is None:
+            self._batch = subprocess.Popen(
+                [git_program(), "cat-file", "--batch-check"],
+                cwd=self.worktree,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+        return self._batch
+
+
+@contextmanager
+def git_sessions() -> Iterator[None]:
+    """Share one `GitSession` per worktree inside the block, and stop their git processes when it ends."""
+    sessions: dict[Path, GitSession] = {}
+    token = _SESSIONS.set(sessions)
+    try:
+        yield
+    finally:
+        _SESSIONS.reset(token)
+        for session in sessions.values():
+            session.close()
+
+
+def git_session(worktree: Path) -> GitSession:
+    """Return the session for `worktree` from the enclosing `git_sessions()`."""
+    sessions = _SESSIONS.get()
+    if sessions is None:
+        msg = "git_session() must be called inside git_sessions()."
+        raise RuntimeError(msg)
+    key = worktree.resolve()
+    if key not in sessions:
+        sessions[key] = GitSession(worktree)
+    return sessions[key]
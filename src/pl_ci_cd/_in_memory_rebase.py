@@ -0,0 +1,126 @@
+import os
+from dataclasses import dataclass
+
+from pl_run_program import run_program, run_simple_program
+
+from pl_ci_cd._constants import git_program
+from pl_ci_cd._git_session import GitSession
+
+# Separates the fields of one commit in `git log` output. Commit messages never contain it in practice.
+_FIELD_SEPARATOR = "\x1f"
+# `git merge-tree --write-tree` exits with this when the merge has conflicts.
+_CONFLICTS = 1
+
+
+@dataclass(frozen=True)
+class _Commit:
+    oid: str
+    author_name: str
+    author_email: str
+    # In git's raw format, "<seconds> <offset>".
+    author_date: str
+    message: str
+
+
+def rebase_in_memory(session: GitSession, onto: str) -> bool:
+    """
+    Rebase the worktree's branch onto `onto` without checking anything out, if that causes no conflicts.
+
+    The branch's commits are replayed with `replay`. Only then is the branch moved, with `git reset --keep`,
+    which rewrites just the files that differ between the old and new tips. Returns False, with nothing
+    changed, if any commit would conflict, so the caller can rebase in the worktree and resolve the
+    conflicts there.
+    """
+    head = session.resolve("HEAD")
+    tip = replay(session, head, onto)
+    if tip is None:
+        return False
+    if tip != head:
+        session.run("reset", "--keep", tip)
+    return True
+
+
+def replay(session: GitSession, commit: str, onto: str) -> str | None:
+    """
+    Replay the commits of `commit` that `onto` lacks on top of `onto`, and return the new tip, or None if any conflicts.
+
+    Each commit is replayed with `git merge-tree --write-tree` and `git commit-tree`, keeping its author and
+    message, so no worktree or branch is touched.
+    """
+    onto_oid = session.resolve(onto)
+    if session.run("merge-base", onto_oid, commit).strip() == onto_oid:
+        return commit
+
+    # The whole branch goes first: if anything conflicts, it most likely does, and ship's branches usually
+    # hold a single commit anyway.
+    head_tree = _merged_tree(session, onto_oid, commit)
+    if head_tree is None:
+        return None
+    commits = _own_commits(session, onto_oid, commit)
+    trees: list[str] = []
+    for own_commit in commits[:-1]:
+        tree = _merged_tree(session, onto_oid, own_commit.oid)
+        if tree is None:
+            return None
+        trees.append(tree)
+    trees.append(head_tree)
+
+    tip = onto_oid
+    for own_commit, tree in zip(commits, trees, strict=True):
+        tip = _commit_tree(session, tree, tip, own_commit)
+    return tip
+
+
+def _own_commits(session: GitSession, onto_oid: str, commit: str) -> list[_Commit]:
+    """Return the commits of `commit` that `onto` lacks, oldest first, leaving out merges as `git rebase` does."""
+    fields = _FIELD_SEPARATOR.join(["%H", "%an", "%ae", "%ad", "%B"])
+    log = session.run(
+        "log",
+        "-z",
+        "--reverse",
+        "--no-merges",
+        "--date=raw",
+        f"--format={fields}",
+        f"{onto_oid}..{commit}",
+    )
+    return [
+        _Commit(*record.split(_FIELD_SEPARATOR, 4))
+        for record in log.split("\0")
+        if record
+    ]
+
+
+def _merged_tree(session: GitSession, onto_oid: str, commit: str) -> str | None:
+    """
+    Merge `commit` into `onto` in memory and return the resulting tree, or None if they conflict.
+
+    The merge base is where the branch left `onto`, so the tree is `onto` plus every change on the branch up
+    to `commit`: what a rebase produces for that commit.
+    """
+    result = run_program(
+        git_program(),
+        ["merge-tree", "--write-tree", "--no-messages", onto_oid, commit],
+        cwd=session.worktree,
+    )
+    if result.returncode == _CONFLICTS:
+        return None
+    if result.returncode != 0:  # pragma: no cover
+        msg = f"git merge-tree failed in {session.worktree}: {result.stderr.strip()}"
+        raise RuntimeError(msg)
+    return result.stdout.split()[0]
+
+
+def _commit_tree(session: GitSession, tree: str, parent: str, commit: _Commit) -> str:
+    env = {
+        **os.environ,
+        "GIT_AUTHOR_NAME": commit.author_name,
+        "GIT_AUTHOR_EMAIL": commit.author_email,
+        "GIT_AUTHOR_DATE": commit.author_date,
+    }
+    return run_simple_program(
+        git_program(),
+        ["commit-tree", tree, "-p", parent, "-F", "-"],
+        stdin=commit.message,
+        cwd=session.worktree,
+        env=env,
+    ).strip()
@@ -0,0 +1,26 @@
+import xml.etree.ElementTree as ET
+from collections.abc import Iterator
+
+
+def junit_test_cases(report: str) -> Iterator[tuple[str, ET.Element]]:
+    """Each test case of a JUnit XML report written with `junit_family=xunit1`, with its pytest test id."""
+    # The report comes from the project's own test run, not from an untrusted source.
+    for case in ET.fromstring(report).iter("testcase"):  # noqa: S314
+        file = case.get("file")
+        if file is None:
+            continue
+        module = file.removesuffix(".py").replace("/", ".")
+        classes = case.get("classname", "").removeprefix(module).strip(".")
+        test_id = "::".join(
+            part for part in (file, *classes.split("."), case.get("name", "")) if part
+        )
+        yield test_id, case
+
+
+def parse_junit_failures(report: str) -> list[str]:
+    """Ids of the tests in a JUnit XML report that failed or errored."""
+    return [
+        test_id
+        for test_id, case in junit_test_cases(report)
+        if case.find("failure") is not None or case.find("error") is not None
+    ]
@@ -1,27 +1,114 @@
+import json
+from collections import Counter
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
-from pl_run_program.run_program import run_program
+from pl_run_program import ProgramResult
 
-from ._constants import UV_PROGRAM
+from ._cancellation import run_cancellable_program, run_cancellable_program_async
+from ._tool_environment import UV_RUN, ToolCommand, ToolEnvironment, ruff_command
+
+_WARNING_PREFIX = "warning: "
+# `output` lists this many diagnostics and counts the rest per rule, so huge outputs stay readable.
+_MAX_LISTED_DIAGNOSTICS = 50
+
+
+@dataclass(frozen=True, order=True)
+class LintDiagnostic:
+    # Relative to the linted directory.
+    path: Path
+    line: int
+    column: int
+    end_line: int
+    end_column: int
+    # None for syntax errors in ruff versions that don't name them.
+    code: str | None
+    message: str
+    # Whether `--fix` would fix it without `--unsafe-fixes`.
+    fixable: bool
+
+    def __str__(self) -> str:
+        fixable = " [*]" if self.fixable else ""
+        return f"{self.path}:{self.line}:{self.column}: {self.code}{fixable} {self.message}"
 
 
 @dataclass
 class LintResult:
     passed: bool
-    output: str
+    # Sorted, without duplicates.
+    diagnostics: list[LintDiagnostic]
+    # Ruff's own warnings, like rules that are selected but have no effect.
+    warnings: list[str]
+
+    @property
+    def output(self) -> str:
+        if not self.diagnostics and not self.warnings:
+            return "All checks passed!"
+        lines = [f"warning: {warning}" for warning in self.warnings]
+        listed = self.diagnostics[:_MAX_LISTED_DIAGNOSTICS]
+        lines += [str(diagnostic) for diagnostic in listed]
+        rest = _counts_by_rule(self.diagnostics[_MAX_LISTED_DIAGNOSTICS:])
+        if rest:
+            counts = ", ".join(f"{code} ({count})" for code, count in rest.items())
+            lines.append(f"... and {sum(rest.values())} more: {counts}")
+        return "\n".join(lines)
+
+    def counts_by_rule(self) -> dict[str | None, int]:
+        """Diagnostics per rule code, most frequent first."""
+        return _counts_by_rule(self.diagnostics)
+
+
+def _counts_by_rule(diagnostics: list[LintDiagnostic]) -> dict[str | None, int]:
+    return dict(Counter(diagnostic.code for diagnostic in diagnostics).most_common())
 
 
 class LintError(Exception):
     pass
 
 
-def lint(directory: Path, fix: bool = False) -> LintResult:
-    args = ["--directory", str(directory), "run", "ruff", "check"]
+def lint(
+    directory: Path,
+    fix: bool = False,
+    paths: list[Path] | None = None,
+    tools: ToolEnvironment = UV_RUN,
+) -> LintResult:
+    """Lint `paths`, relative to `directory`, or the whole directory if None."""
+    command = _command(directory, fix, paths, tools)
+    if command is None:
+        return LintResult(passed=True, diagnostics=[], warnings=[])
+    # Not streamed: the JSON is only useful whole, and ruff finishes quickly anyway.
+    result = run_cancellable_program(
+        command.program, command.args, cwd=directory, env=command.env
+    )
+    return _lint_result(result, directory)
+
+
+async def lint_async(
+    directory: Path,
+    fix: bool = False,
+    paths: list[Path] | None = None,
+    tools: ToolEnvironment = UV_RUN,
+) -> LintResult:
+    command = _command(directory, fix, paths, tools)
+    if command is None:
+        return LintResult(passed=True, diagnostics=[], warnings=[])
+    result = await run_cancellable_program_async(
+        command.program, command.args, cwd=directory, env=command.env
+    )
+    return _lint_result(result, directory)
+
+
+def _command(
+    directory: Path, fix: bool, paths: list[Path] | None, tools: ToolEnvironment
+) -> ToolCommand | None:
+    args = ["check", "--output-format=json"]
     if fix:
         args.append("--fix")
-    result = run_program(UV_PROGRAM, args)
+    return ruff_command(tools, args, paths, directory)
+
 
+def _lint_result(result: ProgramResult, directory: Path) -> LintResult:
     # From https://docs.astral.sh/ruff/linter/#exit-codes:
     # """
     # By default, ruff check exits with the following status codes:
@@ -34,12 +121,40 @@ def lint(directory: Path, fix: bool = False) -> LintResult:
         msg = f"linting failed with an unexpected error. stdout: `{result.stdout}` stderr: `{result.stderr}`"
         raise LintError(msg)
 
-    # As of 2026-01-26, Ruff does not have a separate exit code for warnings or related flag(s).
-    warnings_present = "warning" in result.stderr.lower()
+    try:
+        diagnostics = sorted(
+            {_parse_diagnostic(raw, directory) for raw in json.loads(result.stdout)}
+        )
+    except (ValueError, TypeError, KeyError) as error:
+        msg = f"linting failed with unreadable output. stdout: `{result.stdout}` stderr: `{result.stderr}`"
+        raise LintError(msg) from error
 
-    passed = result.returncode == 0 and not warnings_present
+    # As of 2026-01-26, Ruff does not have a separate exit code for warnings or related flag(s).
+    warnings = [
+        line.removeprefix(_WARNING_PREFIX)
+        for line in result.stderr.splitlines()
+        if line.startswith(_WARNING_PREFIX)
+    ]
 
     return LintResult(
-        passed=passed,
-        output="\n".join([f"stdout: {result.stdout}", f"stderr: {result.stderr}"]),
+        passed=result.returncode == 0 and not warnings,
+        diagnostics=diagnostics,
+        warnings=warnings,
+    )
+
+
+def _parse_diagnostic(raw: dict[str, Any], directory: Path) -> LintDiagnostic:
+    path = Path(raw["filename"])
+    if path.is_relative_to(directory.resolve()):
+        path = path.relative_to(directory.resolve())
+    fix = raw["fix"]
+    return LintDiagnostic(
+        path=path,
+        line=raw["location"]["row"],
+        column=raw["location"]["column"],
+        end_line=raw["end_location"]["row"],
+        end_column=raw["end_location"]["column"],
+        code=raw["code"],
+        message=raw["message"],
+        fixable=fix is not None and fix["applicability"] == "safe",
     )
@@ -0,0 +1,111 @@
+import fcntl
+import json
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+PENDING = "pending"
+SHIPPED = "shipped"
+FAILED = "failed"
+
+
+@dataclass
+class QueueEntry:
+    """A worktree waiting in the merge queue, stored as one JSON file so separate `ship` processes share it."""
+
+    path: Path
+    worktree: Path
+    branch: str
+    # What to ship: the branch as queued, and once a train merges it, the rebased copy that `main` holds.
+    commit: str
+    # The pid of the `ship` that queued the entry and waits for it. Trains reject entries whose owner has
+    # exited, since nothing would take the result back to the worktree.
+    owner: int
+    status: str = PENDING
+    # Why the entry failed, shown to the `ship` that queued it.
+    message: str = ""
+
+    def save(self) -> None:
+        """Write the entry atomically, so a reader never sees half of it."""
+        temporary = self.path.with_suffix(".tmp")
+        temporary.write_text(
+            json.dumps(
+                {
+                    "worktree": str(self.worktree),
+                    "branch": self.branch,
+                    "commit": self.commit,
+                    "owner": self.owner,
+                    "status": self.status,
+                    "message": self.message,
+                }
+            )
+        )
+        temporary.replace(self.path)
+
+
+class MergeQueue:
+    """The ship merge queue of one repository, kept in its git directory so every worktree sees the same queue."""
+
+    def __init__(self, git_common_dir: Path) -> None:
+        self._directory = git_common_dir / "pl-ci-cd" / "merge-queue"
+
+    def enqueue(self, worktree: Path, branch: str, commit: str) -> QueueEntry:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        entry = QueueEntry(
+            self._directory / f"{time.time_ns()}-{os.getpid()}.json",
+            worktree,
+            branch,
+            commit,
+            os.getpid(),
+        )
+        entry.save()
+        return entry
+
+    def pending(self) -> list[QueueEntry]:
+        """Return the entries still waiting for a train, oldest first."""
+        entries = [_load(path) for path in sorted(self._directory.glob("*.json"))]
+        return [entry for entry in entries if entry.status == PENDING]
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Hold the queue's lock, waiting for whichever train is running to finish."""
+        self._directory.mkdir(parents=True, exist_ok=True)
+        with (self._directory / "lock").open("w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def reload(entry: QueueEntry) -> QueueEntry:
+    """Return `entry` as it is now on disk, which another process's train may have decided."""
+    return _load(entry.path)
+
+
+def owner_is_running(entry: QueueEntry) -> bool:
+    """Return whether the `ship` that queued `entry` is still running."""
+    try:
+        os.kill(entry.owner, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # pragma: no cover
+        # The pid belongs to a process of another user, so it is running.
+        return True
+    return True
+
+
+def _load(path: Path) -> QueueEntry:
+    raw = json.loads(path.read_text())
+    return QueueEntry(
+        path,
+        Path(raw["worktree"]),
+        raw["branch"],
+        raw["commit"],
+        raw["owner"],
+        raw["status"],
+        raw["message"],
+    )
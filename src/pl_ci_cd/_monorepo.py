@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+
+from pl_mocks_and_fakes import MockInUnitTests, MockReason
+from pl_run_program import ProgramResult, program_at_path
+from pl_user_io.display import display
+
+from pl_ci_cd._cache import list_project_files
+from pl_ci_cd._cancellation import run_cancellable_program, submit_in_context
+from pl_ci_cd._changed_files import changed_files
+from pl_ci_cd._streaming import TAIL_LINES
+from pl_ci_cd._trace import traced
+
+
+class ProjectChecksError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class ProjectCheck:
+    # Relative to the root, "." for the root itself.
+    project: Path
+    passed: bool
+    seconds: float
+    # The last `TAIL_LINES` lines of `check`'s output.
+    output_tail: str
+
+
+def check_projects(
+    root: Path,
+    check_args: list[str],
+    since: str | None = None,
+    workers: int | None = None,
+) -> list[ProjectCheck]:
+    """
+    Run `check` with `check_args` in every project under `root`, at most `workers` at a time (default: one per CPU).
+
+    A project is a directory with a `pyproject.toml` that git doesn't ignore. With `since`, only projects
+    containing a file changed since that git ref are checked; a file belongs to its innermost project.
+    Each project is checked in its own process. Raises after every project finished if any failed.
+    """
+    projects = discover_projects(root)
+    if since is not None:
+        projects = affected_projects(projects, changed_files(root, since))
+        if not projects:
+            display(f"No projects changed since {since}.")
+            return []
+    if not projects:
+        display(f"No projects found under {root}.")
+        return []
+
+    display(f"Checking {len(projects)} project(s).")
+    results: list[ProjectCheck] = []
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        futures = [
+            submit_in_context(executor, _check_project, root, project, check_args)
+            for project in projects
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            mark = "✓" if result.passed else "✗"
+            display(f"{mark} {result.project} ({result.seconds:.1f}s)")
+            results.append(result)
+
+    results.sort(key=lambda result: result.project)
+    failed = [result for result in results if not result.passed]
+    display(
+        f"Checked {len(results)} project(s): {len(results) - len(failed)} passed, {len(failed)} failed."
+    )
+    if failed:
+        details = "\n\n".join(
+            f"{result.project}:\n{result.output_tail}" for result in failed
+        )
+        msg = f"{len(failed)} of {len(results)} project(s) failed.\n\n{details}"
+        raise ProjectChecksError(msg)
+    return results
+
+
+def discover_projects(root: Path) -> list[Path]:
+    return sorted(
+        Path(file).parent
+        for file in list_project_files(root)
+        if Path(file).name == "pyproject.toml"
+    )
+
+
+def affected_projects(projects: list[Path], changed: list[Path]) -> list[Path]:
+    """Find the projects owning any of the `changed` paths, where a path belongs to its innermost project."""
+    affected: set[Path] = set()
+    for path in changed:
+        owners = [project for project in projects if project in path.parents]
+        if owners:
+            affected.add(max(owners, key=lambda project: len(project.parts)))
+    return sorted(affected)
+
+
+def _check_project(root: Path, project: Path, check_args: list[str]) -> ProjectCheck:
+    start = time.monotonic()
+    with traced(str(project), "check"):
+        result = run_project_check(root / project, check_args)
+    output = "\n".join(part for part in (result.stdout, result.stderr) if part)
+    return ProjectCheck(
+        project=project,
+        passed=result.returncode == 0,
+        seconds=time.monotonic() - start,
+        output_tail="\n".join(output.splitlines()[-TAIL_LINES:]),
+    )
+
+
+@MockInUnitTests(MockReason.SLOW)
+def run_project_check(directory: Path, check_args: list[str]) -> ProgramResult:
+    # A separate process per project, since `check` changes the working directory while it runs.
+    return run_cancellable_program(
+        program_at_path(Path(sys.executable)),
+        ["-m", "pl_ci_cd._check", "--directory", str(directory), *check_args],
+        cwd=directory,
+        env=dict(os.environ),
+    )
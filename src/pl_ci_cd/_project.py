@@ -0,0 +1,64 @@
+import tomllib
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Any
+
+from pl_run_program import run_program
+
+from pl_ci_cd._constants import git_program
+from pl_ci_cd._tool_environment import UV_RUN, ToolEnvironment
+
+
+@dataclass
+class ProjectContext:
+    """
+    What one `check`, `commit`, or `ship` run knows about its project.
+
+    Built once per run and handed to everything that needs it, so `pyproject.toml` is parsed and `git status`
+    run at most once, on first use. The git status is a snapshot from that moment.
+    """
+
+    root: Path
+    tools: ToolEnvironment = UV_RUN
+    # The Python files `check --since` is limited to, relative to the root. None means every file.
+    changed_paths: list[Path] | None = None
+
+    @cached_property
+    def pyproject(self) -> dict[str, Any]:
+        """The parsed `pyproject.toml`, empty if the root has none."""
+        path = self.root / "pyproject.toml"
+        if not path.exists():
+            return {}
+        return tomllib.loads(path.read_text())
+
+    @property
+    def tool_config(self) -> dict[str, Any]:
+        """The `[tool.pl-ci-cd]` table of `pyproject.toml`."""
+        return self.pyproject.get("tool", {}).get("pl-ci-cd", {})
+
+    @cached_property
+    def git_status(self) -> list[str] | None:
+        """`git status --porcelain` entries for the repository containing the root, or None outside one."""
+        result = run_program(
+            git_program(), ["status", "--porcelain", "-z"], cwd=self.root
+        )
+        if result.returncode != 0:
+            return None
+        return [entry for entry in result.stdout.split("\0") if entry]
+
+
+def find_project(directory: Path) -> ProjectContext:
+    """Return the context of the project whose `pyproject.toml` is nearest at or above `directory`."""
+    return ProjectContext(find_pyproject_root(directory))
+
+
+def find_pyproject_root(directory: Path) -> Path:
+    """Return the nearest directory at or above `directory` that has a `pyproject.toml`."""
+    pyproject_root = directory
+    while not (pyproject_root / "pyproject.toml").exists():
+        if pyproject_root.parent == pyproject_root:
+            msg = f"Could not find `pyproject.toml` in {directory} or any parent directories."
+            raise FileNotFoundError(msg)
+        pyproject_root = pyproject_root.parent
+    return pyproject_root
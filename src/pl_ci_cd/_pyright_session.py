@@ -0,0 +1,341 @@
+import contextlib
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Self, cast
+
+from pl_ci_cd._cache import digest_named_files, list_project_files
+from pl_ci_cd._tool_environment import UV_RUN, ToolEnvironment
+
+# A change to any of these can change every file's diagnostics, so the server is restarted.
+_RESTART_INPUTS = ("pyproject.toml", "pyrightconfig.json", "uv.lock")
+_SOURCE_SUFFIXES = (".py", ".pyi")
+_SEVERITIES = {1: "error", 2: "warning", 3: "information"}
+# How long `close()` waits for the server, and then for its output to end, before giving up on it.
+_CLOSE_TIMEOUT_SECONDS = 5
+
+# LSP `FileChangeType`.
+_CHANGED = 2
+
+
+class PyrightSessionError(Exception):
+    pass
+
+
+@dataclass(frozen=True, order=True)
+class TypeDiagnostic:
+    path: Path
+    line: int
+    column: int
+    severity: str
+    message: str
+    rule: str | None
+
+    def __str__(self) -> str:
+        rule = f" ({self.rule})" if self.rule else ""
+        return f"{self.path}:{self.line}:{self.column} - {self.severity}: {self.message}{rule}"
+
+
+class PyrightSession:
+    """A long-lived `pyright-langserver` for one project, restarted when its configuration or file set changes."""
+
+    def __init__(
+        self,
+        directory: Path,
+        tools: ToolEnvironment = UV_RUN,
+        timeout_seconds: float = 600,
+    ) -> None:
+        self._directory = directory.resolve()
+        self._tools = tools
+        self._timeout_seconds = timeout_seconds
+
+        self._process: subprocess.Popen[bytes] | None = None
+        self._reader: threading.Thread | None = None
+        self._write_lock = threading.Lock()
+        self._state = threading.Condition()
+        self._next_id = 0
+        self._restart_digest = ""
+        self._sources: dict[str, tuple[int, int]] = {}
+        self._diagnostics: dict[str, list[TypeDiagnostic]] = {}
+        self._result_ids: dict[str, str] = {}
+
+        # Guarded by `_state`.
+        self._loaded = False
+        self._responses: dict[int, Any] = {}
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def diagnostics(self) -> list[TypeDiagnostic]:
+        """Errors, warnings, and informations for every source file in the project, up to date with the files on disk."""
+        sources = self._snapshot_sources()
+        if (
+            self._process is None
+            or self._process.poll() is not None
+            or self._restart_digest != self._digest_restart_inputs()
+            or sources.keys() != self._sources.keys()
+        ):
+            self._start(sources)
+            self._wait_until_loaded()
+        elif not self._notify_changes(sources):
+            return self._all_diagnostics()
+        self._pull_diagnostics()
+        return self._all_diagnostics()
+
+    def close(self) -> None:
+        if self._process is None:
+            return
+        try:
+            self._request("shutdown", None)
+            self._notify("exit", None)
+            self._process.wait(timeout=_CLOSE_TIMEOUT_SECONDS)
+        except (PyrightSessionError, OSError, subprocess.TimeoutExpired):
+            pass
+        # `uv run` and the language server's node process share the group, and either could hold stdout
+        # open after the other exits.
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(self._process.pid, signal.SIGKILL)
+        self._process.wait()
+        if self._reader is not None:
+            self._reader.join(timeout=_CLOSE_TIMEOUT_SECONDS)
+        for pipe in (self._process.stdin, self._process.stdout):
+            # A server that died mid-message leaves unflushed input that can't be delivered.
+            if pipe is not None:
+                with contextlib.suppress(OSError):
+                    pipe.close()
+        self._process = None
+
+    def _start(self, sources: dict[str, tuple[int, int]]) -> None:
+        self.close()
+        self._diagnostics = {}
+        self._result_ids = {}
+        with self._state:
+            self._loaded = False
+        self._restart_digest = self._digest_restart_inputs()
+        self._sources = sources
+
+        command = self._tools.command(
+            "pyright-langserver", ["--stdio"], self._directory
+        )
+        self._process = subprocess.Popen(
+            [command.program, *command.args],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=self._directory,
+            env=command.env,
+            start_new_session=True,
+        )
+        self._reader = threading.Thread(target=self._read_messages, daemon=True)
+        self._reader.start()
+
+        root_uri = self._directory.as_uri()
+        self._request(
+            "initialize",
+            {
+                "processId": None,
+                "rootUri": root_uri,
+                "workspaceFolders": [{"uri": root_uri, "name": self._directory.name}],
+                "capabilities": {
+                    "workspace": {
+                        "configuration": True,
+                        "didChangeWatchedFiles": {"dynamicRegistration": True},
+                    },
+                    "window": {"workDoneProgress": True},
+                    "textDocument": {"publishDiagnostics": {}},
+                },
+            },
+        )
+        self._notify("initialized", {})
+        # Pyright only reads its settings (and starts analyzing) once told they changed.
+        self._notify("workspace/didChangeConfiguration", {"settings": None})
+
+    def _notify_changes(self, sources: dict[str, tuple[int, int]]) -> bool:
+        changes = [
+            {"uri": (self._directory / file).as_uri(), "type": _CHANGED}
+            for file in sources
+            if sources[file] != self._sources[file]
+        ]
+        self._sources = sources
+        if not changes:
+            return False
+        self._notify("workspace/didChangeWatchedFiles", {"changes": changes})
+        return True
+
+    def _wait_until_loaded(self) -> None:
+        """Wait until the server has found the project's source files, which it shows by first publishing."""
+        deadline = time.monotonic() + self._timeout_seconds
+        with self._state:
+            while not self._loaded:
+                if self._process is None or self._process.poll() is not None:
+                    msg = "pyright-langserver exited unexpectedly."
+                    raise PyrightSessionError(msg)
+                if time.monotonic() >= deadline:
+                    msg = f"pyright-langserver did not find the project's files within {self._timeout_seconds} seconds."
+                    raise PyrightSessionError(msg)
+                self._state.wait(timeout=0.1)
+
+    def _pull_diagnostics(self) -> None:
+        """Bring every source file's diagnostics up to date, asking for all of them before waiting for any."""
+        # pyright never announces that its analysis is done, so diagnostics are pulled. A file's request is
+        # answered once it is checked, and "unchanged" if nothing it depends on changed since its result id.
+        deadline = time.monotonic() + self._timeout_seconds
+        requests = {
+            file: self._send_request(
+                "textDocument/diagnostic",
+                {
+                    "textDocument": {"uri": (self._directory / file).as_uri()},
+                    "previousResultId": self._result_ids.get(file),
+                },
+            )
+            for file in self._sources
+        }
+        for file, request_id in requests.items():
+            report = cast(
+                "dict[str, Any]",
+                self._await_response(request_id, "textDocument/diagnostic", deadline),
+            )
+            # Files pyright leaves out of the project, like those in hidden directories, stay "unchanged".
+            if report["kind"] == "full":
+                self._store_diagnostics(file, report["items"])
+                if report.get("resultId") is None:
+                    self._result_ids.pop(file, None)
+                else:
+                    self._result_ids[file] = report["resultId"]
+
+    def _all_diagnostics(self) -> list[TypeDiagnostic]:
+        return sorted(
+            diagnostic
+            for diagnostics in self._diagnostics.values()
+            for diagnostic in diagnostics
+        )
+
+    def _read_messages(self) -> None:
+        assert self._process is not None
+        assert self._process.stdout is not None
+        stdout = self._process.stdout
+        while True:
+            headers: dict[str, str] = {}
+            while (line := stdout.readline()) not in {b"\r\n", b""}:
+                name, _, value = line.decode().partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if "content-length" not in headers:
+                with self._state:
+                    self._state.notify_all()
+                return
+            self._handle(json.loads(stdout.read(int(headers["content-length"]))))
+
+    def _handle(self, message: dict[str, Any]) -> None:
+        method = message.get("method")
+        if method is not None and "id" in message:
+            self._respond(
+                message["id"], self._answer(method, message.get("params", {}))
+            )
+            return
+        with self._state:
+            if method == "textDocument/publishDiagnostics":
+                # What is published is pulled again anyway; the first publish only shows the files are known.
+                self._loaded = True
+            elif method == "window/logMessage" and message["params"][
+                "message"
+            ].startswith("No source files found"):
+                # Nothing will ever be published for an empty project.
+                self._loaded = True
+            elif method is None:
+                self._responses[message["id"]] = message
+            self._state.notify_all()
+
+    def _answer(self, method: str, params: dict[str, Any]) -> object:
+        if method == "workspace/configuration":
+            return [
+                {"diagnosticMode": "workspace"}
+                if item.get("section") == "python.analysis"
+                else {}
+                for item in params["items"]
+            ]
+        # `client/registerCapability`, `window/workDoneProgress/create`, etc. only need acknowledging.
+        return None
+
+    def _store_diagnostics(self, file: str, items: list[dict[str, Any]]) -> None:
+        self._diagnostics[file] = [
+            TypeDiagnostic(
+                path=Path(file),
+                line=diagnostic["range"]["start"]["line"] + 1,
+                column=diagnostic["range"]["start"]["character"] + 1,
+                severity=_SEVERITIES[diagnostic.get("severity", 1)],
+                message=diagnostic["message"],
+                rule=diagnostic.get("code"),
+            )
+            for diagnostic in items
+            # Severity 4 ("hint") marks unused or unreachable code for editors; the CLI doesn't report it.
+            if diagnostic.get("severity", 1) in _SEVERITIES
+        ]
+
+    def _request(self, method: str, params: dict[str, Any] | None) -> object:
+        request_id = self._send_request(method, params)
+        return self._await_response(
+            request_id, method, time.monotonic() + self._timeout_seconds
+        )
+
+    def _send_request(self, method: str, params: dict[str, Any] | None) -> int:
+        request_id = self._next_id
+        self._next_id += 1
+        self._send(
+            {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        )
+        return request_id
+
+    def _await_response(self, request_id: int, method: str, deadline: float) -> object:
+        with self._state:
+            while request_id not in self._responses:
+                if self._process is None or self._process.poll() is not None:
+                    msg = f"pyright-langserver exited before answering `{method}`."
+                    raise PyrightSessionError(msg)
+                if time.monotonic() >= deadline:
+                    msg = f"pyright-langserver did not answer `{method}`."
+                    raise PyrightSessionError(msg)
+                self._state.wait(timeout=0.1)
+            return self._responses.pop(request_id).get("result")
+
+    def _notify(self, method: str, params: dict[str, Any] | None) -> None:
+        self._send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def _respond(self, request_id: int | str, result: object) -> None:
+        self._send({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+    def _send(self, message: dict[str, Any]) -> None:
+        assert self._process is not None
+        assert self._process.stdin is not None
+        body = json.dumps(message).encode()
+        with self._write_lock:
+            self._process.stdin.write(
+                f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            self._process.stdin.flush()
+
+    def _snapshot_sources(self) -> dict[str, tuple[int, int]]:
+        sources: dict[str, tuple[int, int]] = {}
+        for file in list_project_files(self._directory):
+            if file.endswith(_SOURCE_SUFFIXES):
+                path = self._directory / file
+                if path.is_file():
+                    stat = path.stat()
+                    sources[file] = (stat.st_mtime_ns, stat.st_size)
+        return sources
+
+    def _digest_restart_inputs(self) -> str:
+        return digest_named_files(self._directory, _RESTART_INPUTS)
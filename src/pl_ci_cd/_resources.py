@@ -0,0 +1,126 @@
+import math
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, cast
+
+# Where cgroup v2 puts a container's memory limit, which is what CI runners enforce.
+_CGROUP_MEMORY_MAX = Path("/sys/fs/cgroup/memory.max")
+_MEMINFO = Path("/proc/meminfo")
+
+# Roughly what each stage needs on a mid-sized project. `types` is pyright's node process,
+# `tests` a single pytest process with coverage.
+DEFAULT_STAGE_WEIGHTS = {
+    "format": (1.0, 256.0),
+    "lint": (1.0, 256.0),
+    "types": (1.0, 1536.0),
+    "tests": (1.0, 1024.0),
+}
+
+
+class ResourceConfigError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Resources:
+    cpus: float = 1.0
+    memory_mb: float = 0.0
+
+    def __add__(self, other: "Resources") -> "Resources":
+        return Resources(self.cpus + other.cpus, self.memory_mb + other.memory_mb)
+
+    def __mul__(self, factor: float) -> "Resources":
+        return Resources(self.cpus * factor, self.memory_mb * factor)
+
+    def fits_in(self, budget: "Resources") -> bool:
+        return self.cpus <= budget.cpus and self.memory_mb <= budget.memory_mb
+
+
+UNLIMITED = Resources(math.inf, math.inf)
+
+
+@dataclass(frozen=True)
+class ResourceConfig:
+    """The machine's budget for concurrent stages, and what each stage takes out of it."""
+
+    budget: Resources
+    weights: dict[str, Resources]
+
+
+def load_resource_config(tool_config: dict[str, Any]) -> ResourceConfig:
+    """
+    Read `[tool.pl-ci-cd.resources]`, filling in the detected cores and memory and the default stage weights.
+
+    For example, to fit a runner with 8 GB and give pyright more room than the default:
+
+        [tool.pl-ci-cd.resources]
+        cpus = 4
+        memory-mb = 8192
+        stages = { types = { cpus = 1, memory-mb = 3072 } }
+    """
+    table = _table(tool_config.get("resources", {}), "resources")
+    detected = detect_resources()
+    budget = Resources(
+        _number(table, "cpus", "resources", detected.cpus),
+        _number(table, "memory-mb", "resources", detected.memory_mb),
+    )
+    stages = _table(table.get("stages", {}), "resources.stages")
+    unknown = set(stages) - set(DEFAULT_STAGE_WEIGHTS)
+    if unknown:
+        msg = f"Unknown stage(s) in [tool.pl-ci-cd.resources.stages]: {', '.join(sorted(unknown))}. Known stages: {', '.join(DEFAULT_STAGE_WEIGHTS)}."
+        raise ResourceConfigError(msg)
+    weights: dict[str, Resources] = {}
+    for stage, (cpus, memory_mb) in DEFAULT_STAGE_WEIGHTS.items():
+        section = f"resources.stages.{stage}"
+        weight = _table(stages.get(stage, {}), section)
+        weights[stage] = Resources(
+            _number(weight, "cpus", section, cpus),
+            _number(weight, "memory-mb", section, memory_mb),
+        )
+    return ResourceConfig(budget, weights)
+
+
+def detect_resources() -> Resources:
+    """Return the cores this process may run on and the memory available to it, unlimited where unknown."""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:  # pragma: no cover
+        cpus = os.cpu_count() or 1
+    limits = [_cgroup_memory_mb(), _available_memory_mb()]
+    return Resources(
+        float(cpus), min((limit for limit in limits if limit), default=math.inf)
+    )
+
+
+def _cgroup_memory_mb() -> float | None:
+    if not _CGROUP_MEMORY_MAX.exists():
+        return None
+    limit = _CGROUP_MEMORY_MAX.read_text().strip()
+    # "max" means no limit.
+    return int(limit) / 2**20 if limit.isdigit() else None
+
+
+def _available_memory_mb() -> float | None:
+    if not _MEMINFO.exists():  # pragma: no cover
+        return None
+    for line in _MEMINFO.read_text().splitlines():
+        name, _, value = line.partition(":")
+        if name == "MemAvailable":
+            return int(value.split()[0]) / 1024
+    return None  # pragma: no cover
+
+
+def _table(value: object, section: str) -> dict[str, Any]:
+    if not isinstance(value, dict):
+        msg = f"[tool.pl-ci-cd.{section}] must be a table."
+        raise ResourceConfigError(msg)
+    return {str(key): item for key, item in cast("dict[object, Any]", value).items()}
+
+
+def _number(table: dict[str, Any], key: str, section: str, default: float) -> float:
+    value = table.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, int | float) or value <= 0:
+        msg = f"`{key}` in [tool.pl-ci-cd.{section}] must be a positive number, not {value!r}."
+        raise ResourceConfigError(msg)
+    return float(value)
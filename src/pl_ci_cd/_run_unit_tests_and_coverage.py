@@ -1,10 +1,22 @@
+from collections.abc import Iterable
 from pathlib import Path
 from types import NoneType
 
 from pl_mocks_and_fakes import MockInUnitTests, MockReason
-from pl_run_program.run_program import run_program
+from pl_run_program import ProgramResult
+from pl_user_io.display import display
 
-from ._constants import UV_PROGRAM
+from ._cache import ensure_cache_dir
+from ._cancellation import run_cancellable_program, run_cancellable_program_async
+from ._failed_tests import load_failed_tests, record_failed_tests
+from ._junit import parse_junit_failures
+from ._tool_environment import UV_RUN, ToolCommand, ToolEnvironment
+
+_REPORT_NAME = "pytest-report.xml"
+# pytest's exit codes for a test id that matches nothing (usage error) and for no tests collected. Either
+# means the record is stale: the tests were renamed, re-parametrized, or deleted.
+_PYTEST_USAGE_ERROR = 4
+_PYTEST_NO_TESTS_COLLECTED = 5
 
 
 class CoverageOrTestsError(Exception):
@@ -12,15 +24,70 @@ class CoverageOrTestsError(Exception):
 
 
 @MockInUnitTests(MockReason.SLOW)
-def run_unit_tests_and_coverage(directory: Path) -> NoneType:
+def run_unit_tests_and_coverage(
+    directory: Path, tools: ToolEnvironment = UV_RUN
+) -> NoneType:
     """
     Run pytest with coverage in one command. Raises if tests fail or coverage is below 100%.
 
-    Tests and coverage are combined to save time during CI.
+    Tests and coverage are combined to save time during CI. The tests that failed are remembered for
+    `run_failed_tests_first`.
     """
-    args = ["run", "pytest", "--cov", "--cov-fail-under=100", "-q", str(directory)]
-    result = run_program(UV_PROGRAM, args, cwd=directory)
+    command = _pytest_command(directory, tools)
+    result = run_cancellable_program(
+        command.program,
+        command.args,
+        cwd=directory,
+        env=command.env,
+        log_name="pytest",
+    )
+    _check_result(directory, result)
+
+
+async def run_unit_tests_and_coverage_async(
+    directory: Path, tools: ToolEnvironment = UV_RUN
+) -> NoneType:
+    command = _pytest_command(directory, tools)
+    result = await run_cancellable_program_async(
+        command.program,
+        command.args,
+        cwd=directory,
+        env=command.env,
+        log_name="pytest",
+    )
+    _check_result(directory, result)
+
+
+def junit_report_args(directory: Path) -> list[str]:
+    """Return the pytest arguments that write the report `record_reported_failures` reads, removing a stale one."""
+    report = ensure_cache_dir(directory) / _REPORT_NAME
+    report.unlink(missing_ok=True)
+    return [f"--junitxml={report}", "-o", "junit_family=xunit1"]
 
+
+def record_reported_failures(directory: Path, kept: Iterable[str] = ()) -> None:
+    """Remember the tests the report lists as failed, plus `kept`, for `run_failed_tests_first`."""
+    report = ensure_cache_dir(directory) / _REPORT_NAME
+    # No report means pytest stopped before running anything, which says nothing about the last failures.
+    if report.exists():
+        record_failed_tests(
+            directory, [*parse_junit_failures(report.read_text()), *kept]
+        )
+
+
+def _pytest_command(directory: Path, tools: ToolEnvironment) -> ToolCommand:
+    args = [
+        "--cov",
+        "--cov-fail-under=100",
+        "-q",
+        *junit_report_args(directory),
+        str(directory),
+    ]
+    return tools.command("pytest", args, directory)
+
+
+def _check_result(directory: Path, result: ProgramResult) -> None:
+    record_reported_failures(directory)
     if result.returncode == 0:
         return
 
@@ -28,3 +95,54 @@ def run_unit_tests_and_coverage(directory: Path) -> NoneType:
         f"Tests or coverage failed. stdout: `{result.stdout}` stderr: `{result.stderr}`"
     )
     raise CoverageOrTestsError(msg)
+
+
+def write_args_file(args_file: Path, test_ids: list[str]) -> str:
+    """
+    Write `test_ids` to `args_file` and return the argument that has pytest read them from it.
+
+    There may be too many ids for a command line. pytest reads `@file` arguments since 8.2.
+    """
+    args_file.write_text("\n".join(test_ids))
+    return f"@{args_file}"
+
+
+def run_failed_tests_first(directory: Path, tools: ToolEnvironment = UV_RUN) -> None:
+    """
+    Re-run just the tests that failed in the last full run, if any, and raise at the first that still fails.
+
+    Meant to run before the full suite, so a red test is reported in seconds rather than after every test.
+    The record is forgotten once those tests pass, or if pytest no longer finds them, so a stale record
+    never stops the full suite from running.
+    """
+    failed = load_failed_tests(directory)
+    if not failed:
+        return
+    display(f"Re-running {len(failed)} test(s) that failed last time.")
+    result = run_failed_tests(directory, tools, failed)
+    if result.returncode in {_PYTEST_USAGE_ERROR, _PYTEST_NO_TESTS_COLLECTED}:
+        display("Tests that failed last time no longer exist. Running every test.")
+    elif result.returncode != 0:
+        msg = f"Tests that failed last time still fail. stdout: `{result.stdout}` stderr: `{result.stderr}`"
+        raise CoverageOrTestsError(msg)
+    record_failed_tests(directory, [])
+
+
+@MockInUnitTests(MockReason.SLOW)
+def run_failed_tests(
+    directory: Path, tools: ToolEnvironment, test_ids: list[str]
+) -> ProgramResult:
+    args_file = ensure_cache_dir(directory) / "failed-tests.args"
+    # `--no-cov`, since a few tests can't reach the coverage the full run requires.
+    command = tools.command(
+        "pytest",
+        ["-x", "-q", "--no-cov", write_args_file(args_file, test_ids)],
+        directory,
+    )
+    return run_cancellable_program(
+        command.program,
+        command.args,
+        cwd=directory,
+        env=command.env,
+        log_name="pytest-failed-first",
+    )
@@ -0,0 +1,181 @@
+import heapq
+import json
+import os
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import NoneType
+
+from pl_mocks_and_fakes import MockInUnitTests, MockReason
+from pl_run_program import ProgramResult
+
+from pl_ci_cd._cache import ensure_cache_dir
+from pl_ci_cd._cancellation import run_cancellable_program, submit_in_context
+from pl_ci_cd._failed_tests import record_failed_tests
+from pl_ci_cd._junit import junit_test_cases, parse_junit_failures
+from pl_ci_cd._run_unit_tests_and_coverage import CoverageOrTestsError, write_args_file
+from pl_ci_cd._tool_environment import UV_RUN, ToolEnvironment
+
+DURATIONS_NAME = "test_durations.json"
+_SHARDS_DIR_NAME = "shards"
+# Used for tests without a recorded duration when nothing at all is recorded yet.
+_DEFAULT_DURATION_SECONDS = 1.0
+
+
+def run_sharded_unit_tests_and_coverage(
+    directory: Path, tools: ToolEnvironment = UV_RUN, workers: int | None = None
+) -> NoneType:
+    """
+    Like `run_unit_tests_and_coverage`, but spread the tests across `workers` pytest processes (default: one per CPU).
+
+    Shards are balanced longest-first on the test durations recorded by earlier runs. Each shard writes its own
+    coverage data, which is combined before checking for 100% coverage.
+    """
+    shards_dir = ensure_cache_dir(directory) / _SHARDS_DIR_NAME
+    shards_dir.mkdir(exist_ok=True)
+    for stale in shards_dir.iterdir():
+        stale.unlink()
+
+    collected = collect_test_ids(directory, tools)
+    if collected.returncode != 0:
+        msg = f"Collecting tests failed. stdout: `{collected.stdout}` stderr: `{collected.stderr}`"
+        raise CoverageOrTestsError(msg)
+    test_ids = [line for line in collected.stdout.splitlines() if "::" in line]
+
+    durations_path = ensure_cache_dir(directory) / DURATIONS_NAME
+    durations = load_durations(durations_path)
+    shards = balance_shards(test_ids, durations, shard_count(workers))
+
+    with ThreadPoolExecutor(max_workers=max(len(shards), 1)) as executor:
+        futures = [
+            submit_in_context(
+                executor, run_pytest_shard, directory, tools, index, shard
+            )
+            for index, shard in enumerate(shards)
+        ]
+        results = [future.result() for future in futures]
+
+    failed: list[str] = []
+    for shard in shards_dir.glob("*.xml"):
+        durations |= parse_junit_durations(shard.read_text())
+        failed += parse_junit_failures(shard.read_text())
+    save_durations(durations_path, durations)
+    record_failed_tests(directory, failed)
+
+    for result in results:
+        if result.returncode != 0:
+            msg = f"Tests or coverage failed. stdout: `{result.stdout}` stderr: `{result.stderr}`"
+            raise CoverageOrTestsError(msg)
+
+    combined = combine_coverage(
+        directory, tools, sorted(str(path) for path in shards_dir.glob(".coverage*"))
+    )
+    if combined.returncode != 0:
+        msg = f"Tests or coverage failed. stdout: `{combined.stdout}` stderr: `{combined.stderr}`"
+        raise CoverageOrTestsError(msg)
+
+
+def shard_count(workers: int | None) -> int:
+    """Return how many pytest processes `run_sharded_unit_tests_and_coverage` starts at most for `workers`."""
+    return workers or os.cpu_count() or 1
+
+
+def balance_shards(
+    test_ids: list[str], durations: dict[str, float], workers: int
+) -> list[list[str]]:
+    """
+    Split `test_ids` into at most `workers` shards of roughly equal total duration.
+
+    The longest tests are placed first, each on the shard with the least work so far. Tests without a
+    recorded duration are assumed to take the median of the recorded ones. Shards keep collection order.
+    """
+    if not test_ids:
+        return []
+    known = [durations[test] for test in test_ids if test in durations]
+    default = statistics.median(known) if known else _DEFAULT_DURATION_SECONDS
+    order = {test: index for index, test in enumerate(test_ids)}
+
+    shards: list[list[str]] = [[] for _ in range(min(workers, len(test_ids)))]
+    loads = [(0.0, index) for index in range(len(shards))]
+    for test in sorted(test_ids, key=lambda test: -durations.get(test, default)):
+        load, index = heapq.heappop(loads)
+        shards[index].append(test)
+        heapq.heappush(loads, (load + durations.get(test, default), index))
+    return [sorted(shard, key=order.__getitem__) for shard in shards]
+
+
+def parse_junit_durations(report: str) -> dict[str, float]:
+    """Test durations by test id, from a JUnit XML report written with `junit_family=xunit1`."""
+    return {
+        test_id: float(case.get("time", 0))
+        for test_id, case in junit_test_cases(report)
+    }
+
+
+def load_durations(path: Path) -> dict[str, float]:
+    if not path.exists():
+        return {}
+    try:
+        raw = json.loads(path.read_text())
+        return {str(test): float(seconds) for test, seconds in raw.items()}
+    except (ValueError, TypeError, AttributeError):
+        return {}
+
+
+def save_durations(path: Path, durations: dict[str, float]) -> None:
+    path.write_text(json.dumps(durations, sort_keys=True))
+
+
+@MockInUnitTests(MockReason.SLOW)
+def collect_test_ids(directory: Path, tools: ToolEnvironment) -> ProgramResult:
+    # `--verbosity` overrides any `-q` in the project's addopts, which would list files instead of tests.
+    command = tools.command(
+        "pytest", ["--collect-only", "--verbosity=-1", str(directory)], directory
+    )
+    return run_cancellable_program(
+        command.program, command.args, cwd=directory, env=command.env
+    )
+
+
+@MockInUnitTests(MockReason.SLOW)
+def run_pytest_shard(
+    directory: Path, tools: ToolEnvironment, index: int, test_ids: list[str]
+) -> ProgramResult:
+    shards_dir = ensure_cache_dir(directory) / _SHARDS_DIR_NAME
+    command = tools.command(
+        "pytest",
+        [
+            "--cov",
+            "--cov-report=",
+            "-q",
+            f"--junitxml={shards_dir / f'shard-{index}.xml'}",
+            "-o",
+            "junit_family=xunit1",
+            write_args_file(shards_dir / f"shard-{index}.args", test_ids),
+        ],
+        directory,
+    )
+    env = {**command.env, "COVERAGE_FILE": str(shards_dir / f".coverage.{index}")}
+    return run_cancellable_program(
+        command.program,
+        command.args,
+        cwd=directory,
+        env=env,
+        log_name=f"pytest-shard-{index}",
+    )
+
+
+@MockInUnitTests(MockReason.SLOW)
+def combine_coverage(
+    directory: Path, tools: ToolEnvironment, data_files: list[str]
+) -> ProgramResult:
+    combine = tools.command("coverage", ["combine", "-q", *data_files], directory)
+    result = run_cancellable_program(
+        combine.program, combine.args, cwd=directory, env=combine.env
+    )
+    if result.returncode != 0:
+        return result
+    report = tools.command("coverage", ["report", "--fail-under=100"], directory)
+    return run_cancellable_program(
+        report.program, report.args, cwd=directory, env=report.env
+    )
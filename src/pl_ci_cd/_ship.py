@@ -0,0 +1,547 @@
+import os
+import subprocess
+import tempfile
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from textwrap import dedent
+from typing import Annotated
+
+import typer
+from pl_mocks_and_fakes import MockInUnitTests, MockReason
+from pl_run_program import (
+    SimpleProgramError,
+    run_program,
+    run_simple_program,
+)
+from pl_tiny_clients.git_push import git_push
+from pl_user_io.display import display
+from pl_user_io.task import task
+
+from pl_ci_cd._ci_ledger import CiLedger
+from pl_ci_cd._constants import git_program
+from pl_ci_cd._git_session import git_session, git_sessions
+from pl_ci_cd._in_memory_rebase import rebase_in_memory, replay
+from pl_ci_cd._merge_queue import (
+    FAILED,
+    PENDING,
+    SHIPPED,
+    MergeQueue,
+    QueueEntry,
+    owner_is_running,
+    reload,
+)
+from pl_ci_cd._project import ProjectContext
+from pl_ci_cd._ship_jobs import ShipJob, ShipJobs, start_worker
+from pl_ci_cd._trace import record_exit_code, trace_file, traced
+
+MAIN_BRANCH = "main"
+
+REBASE_CONFLICT_PROMPT = dedent("""\
+    A rebase conflict occurred in the worktree at {worktree}. Hand the
+    following message to the agent working in that worktree:
+
+    ----
+    I just rebased this branch onto {main_branch} as part
+    of a CD process, and there were conflicts.
+    Now, there are conflict markers in one or more files in this worktree.
+    Resolve them in place by editing the affected files only. Do NOT run
+    any git commands — leave staging, rebasing, and committing to the
+    outer process. When you are done, or if you determine the conflict
+    is irreconcilable, report back.
+    ----
+""")
+
+
+@dataclass(frozen=True)
+class _Ci:
+    script: Path
+    ledger: CiLedger
+    # Run the script even for a tree that already passed it.
+    force: bool
+
+
+@MockInUnitTests(MockReason.UNMITIGATED_SIDE_EFFECT)
+def fix_with_agent(prompt: str) -> None:
+    task(prompt)
+
+
+def ship(
+    worktree: Path | None = None,
+    repo_dir: Path | None = None,
+    queue: Annotated[
+        bool,
+        typer.Option(
+            help="Ship the worktree through the repository's merge queue: pending worktrees are stacked into one train, CI runs once on its tip, and a failing train is bisected so every branch before the breaking one still ships.",
+        ),
+    ] = False,
+    detach: Annotated[
+        bool,
+        typer.Option(
+            help="Hand push and deploy to a background worker once `main` is merged, instead of waiting for them. Jobs queued while one runs are coalesced, so only the newest `main` is deployed. The worker runs `.ship/deploy` in a clean checkout of the merged commit, so the script sees only committed files, not untracked ones like `.env` or `.venv`.",
+        ),
+    ] = False,
+    status: Annotated[
+        bool,
+        typer.Option(
+            help="Show the background push-and-deploy jobs of `--detach` instead of shipping.",
+        ),
+    ] = False,
+    force_ci: Annotated[
+        bool,
+        typer.Option(
+            help="Run `.ship/test` even when the exact tree being shipped already passed it. Passing trees are remembered per hash of `.ship/test`, for the most recent 1000 passes.",
+        ),
+    ] = False,
+    trace: Annotated[
+        Path | None,
+        typer.Option(
+            help="Write a Chrome trace-event JSON file of each phase's timing, exit codes, and child-process resource usage.",
+        ),
+    ] = None,
+) -> None:
+    if repo_dir is None:
+        repo_dir = Path.cwd()  # pragma: no cover
+    with trace_file(trace), traced("ship", "ship"), git_sessions():
+        if status:
+            _show_status(repo_dir)
+        else:
+            _ship(worktree, repo_dir, queue=queue, detach=detach, force_ci=force_ci)
+
+
+def push_and_deploy(repo_dir: Path, commit: str) -> None:
+    """
+    Push `commit` as `main` and run its `.ship/deploy` in a clean checkout of it, as ship does once merged.
+
+    For the background worker, which runs after `main` may have moved on, so it never looks at `main`'s
+    current tip or the repository's worktree. Fails if `main` no longer contains `commit`.
+    """
+    is_ancestor = run_program(
+        git_program(),
+        ["merge-base", "--is-ancestor", commit, MAIN_BRANCH],
+        cwd=repo_dir,
+    )
+    if is_ancestor.returncode != 0:
+        msg = f"{MAIN_BRANCH} no longer contains {commit[:12]}."
+        raise RuntimeError(msg)
+
+    display(f"Pushing {commit[:12]}...")
+    with traced("Push", "ship"):
+        _git(repo_dir, "push", "origin", f"{commit}:refs/heads/{MAIN_BRANCH}")
+
+    with _detached_worktree(repo_dir, commit) as checkout:
+        deploy_script = checkout / ".ship" / "deploy"
+        display(f"Deploying ({deploy_script})...")
+        with traced("Deploy", "ship"):
+            _run_deploy(deploy_script, checkout)
+
+
+@contextmanager
+def _detached_worktree(repo_dir: Path, commit: str) -> Iterator[Path]:
+    """Check `commit` out in a temporary worktree of its own, removed again on exit."""
+    with tempfile.TemporaryDirectory() as directory:
+        checkout = Path(directory) / "checkout"
+        _git(repo_dir, "worktree", "add", "--detach", str(checkout), commit)
+        try:
+            yield checkout
+        finally:
+            _git(repo_dir, "worktree", "remove", "--force", str(checkout))
+
+
+def _ship(
+    worktree: Path | None,
+    repo_dir: Path,
+    *,
+    queue: bool,
+    detach: bool,
+    force_ci: bool,
+) -> None:
+    project = ProjectContext(repo_dir)
+    test_script = repo_dir / ".ship" / "test"
+    deploy_script = repo_dir / ".ship" / "deploy"
+    if not test_script.exists():
+        msg = f"Missing {test_script}"
+        raise RuntimeError(msg)
+    if not deploy_script.exists():
+        msg = f"Missing {deploy_script}"
+        raise RuntimeError(msg)
+    if project.git_status is None:
+        msg = f"{repo_dir} is not in a git repository."
+        raise RuntimeError(msg)
+    git_common_dir = git_session(repo_dir).common_dir
+    ci = _Ci(test_script, CiLedger(git_common_dir, test_script), force_ci)
+
+    if queue:
+        if worktree is None:
+            msg = "`--queue` needs `--worktree`."
+            raise RuntimeError(msg)
+        _ship_through_queue(
+            worktree, project, ci, deploy_script, git_common_dir, detach=detach
+        )
+    else:
+        if worktree is not None:
+            _merge(worktree, project, ci)
+        else:
+            _commit_and_test(project, ci)
+        _push_and_deploy(deploy_script, repo_dir, detach=detach)
+
+    display("Queued for shipping." if detach else "Shipped.")
+
+
+def _push_and_deploy(deploy_script: Path, repo_dir: Path, *, detach: bool) -> None:
+    if detach:
+        jobs = ShipJobs(git_session(repo_dir).common_dir)
+        job = jobs.add(git_session(repo_dir).resolve(MAIN_BRANCH))
+        start_worker(jobs, repo_dir)
+        display(
+            f"Pushing and deploying in the background as job {job.id}. Follow it with `ship --status`."
+        )
+        return
+
+    display("Pushing...")
+    with traced("Push", "ship"):
+        git_push()
+
+    display(f"Deploying ({deploy_script})...")
+    with traced("Deploy", "ship"):
+        _run_deploy(deploy_script, repo_dir)
+
+
+def _commit_and_test(project: ProjectContext, ci: _Ci) -> None:
+    if not project.git_status:
+        msg = f"Repository at {project.root} has no changes to ship."
+        raise RuntimeError(msg)
+
+    display(f"Running CI ({ci.script})...")
+    with traced("CI", "ship"):
+        # The only tree ship has to stage to hash: everywhere else, everything is committed by then.
+        _run_ci(ci, project.root, git_session(project.root).working_tree())
+
+    display("Committing changes...")
+    with traced("Commit", "ship"):
+        _git(project.root, "add", "-A")
+        _git(project.root, "commit", "-m", "Commit")
+    _record_ci_pass(ci, project.root)
+
+
+def _merge(worktree: Path, project: ProjectContext, ci: _Ci) -> None:
+    if project.git_status:
+        msg = f"Repository at {project.root} is dirty. Commit or stash changes first."
+        raise RuntimeError(msg)
+
+    display("Committing worktree changes...")
+    with traced("Commit", "ship"):
+        _git(worktree, "add", "-A")
+        _git(worktree, "commit", "-m", "Commit")
+
+    display(f"Rebasing onto {MAIN_BRANCH}...")
+    try:
+        with traced("Rebase", "ship"):
+            if not rebase_in_memory(git_session(worktree), MAIN_BRANCH):
+                display(
+                    "The rebase conflicts. Rebasing in the worktree to resolve it..."
+                )
+                _git(worktree, "rebase", MAIN_BRANCH)
+    except SimpleProgramError:
+        _handle_rebase_conflict(worktree)
+        _undo_auto_commit(worktree)
+        msg = (
+            "Rebase conflict was resolved. Review the unstaged changes in "
+            f"{worktree} and re-run when satisfied."
+        )
+        raise RuntimeError(msg) from None
+
+    display(f"Running CI ({ci.script})...")
+    try:
+        with traced("CI", "ship"):
+            _run_ci(ci, worktree, _committed_tree(worktree))
+    except RuntimeError:
+        _undo_auto_commit(worktree)
+        raise
+    _amend_auto_fixes(worktree)
+    _record_ci_pass(ci, worktree)
+
+    branch = git_session(worktree).current_branch()
+    display(f"Fast-forward merging {branch} into {MAIN_BRANCH}...")
+    with traced("Merge", "ship"):
+        _git(project.root, "merge", "--ff-only", branch)
+
+
+def _ship_through_queue(
+    worktree: Path,
+    project: ProjectContext,
+    ci: _Ci,
+    deploy_script: Path,
+    git_common_dir: Path,
+    *,
+    detach: bool,
+) -> None:
+    """Queue the worktree's branch and wait until a train ships it or rejects it."""
+    if project.git_status:
+        msg = f"Repository at {project.root} is dirty. Commit or stash changes first."
+        raise RuntimeError(msg)
+
+    display("Committing worktree changes...")
+    with traced("Commit", "ship"):
+        _git(worktree, "add", "-A")
+        _git(worktree, "commit", "-m", "Commit")
+
+    session = git_session(worktree)
+    merge_queue = MergeQueue(git_common_dir)
+    entry = merge_queue.enqueue(
+        worktree, session.current_branch(), session.resolve("HEAD")
+    )
+    display(f"Queued {entry.branch} for the merge train.")
+
+    # Whoever holds the lock runs trains over everything pending, so another process's train often ships
+    # this branch first. Trains never touch worktrees: each `ship` settles its own.
+    with merge_queue.lock():
+        try:
+            while (entry := reload(entry)).status == PENDING:
+                _run_train(
+                    merge_queue.pending(), project, ci, deploy_script, detach=detach
+                )
+        finally:
+            entry = reload(entry)
+            if entry.status != PENDING:
+                _settle(entry, project)
+    if entry.status == FAILED:
+        raise RuntimeError(entry.message)
+
+
+def _settle(entry: QueueEntry, project: ProjectContext) -> None:
+    """Move the worktree onto what `main` merged of it, or unstage its changes if nothing was merged."""
+    entry.path.unlink()
+    merged = run_program(
+        git_program(),
+        ["merge-base", "--is-ancestor", entry.commit, MAIN_BRANCH],
+        cwd=project.root,
+    )
+    if merged.returncode == 0:
+        _git(entry.worktree, "reset", "--keep", entry.commit)
+    else:
+        _undo_auto_commit(entry.worktree)
+
+
+def _run_train(
+    entries: list[QueueEntry],
+    project: ProjectContext,
+    ci: _Ci,
+    deploy_script: Path,
+    *,
+    detach: bool,
+) -> None:
+    """Stack `entries` onto main, run CI once on the combined tip, and ship every branch before the first one that breaks it."""
+    display(f"Merge train: {', '.join(entry.branch for entry in entries)}")
+    try:
+        train = _stack(entries, project)
+        if not train:
+            return
+        with _detached_worktree(project.root, train[-1].commit) as scratch:
+            passing = _passing_prefix(train, ci, scratch)
+            if passing:
+                _record_ci_pass(ci, scratch)
+                train[passing - 1].commit = git_session(scratch).resolve("HEAD")
+    except Exception as error:
+        for entry in entries:
+            if entry.status == PENDING:
+                _reject(entry, f"The merge train failed: {error}")
+        raise
+    # The branches after the breaking one stay queued for the next train.
+    if passing < len(train):
+        breaking = train[passing]
+        _reject(
+            breaking,
+            f"CI failed with {breaking.branch} in the merge train. Its changes are unstaged in {breaking.worktree}.",
+        )
+    if passing == 0:
+        return
+
+    merged = train[:passing]
+    display(
+        f"Fast-forward merging {', '.join(entry.branch for entry in merged)} into {MAIN_BRANCH}..."
+    )
+    with traced("Merge", "ship"):
+        _git(project.root, "merge", "--ff-only", merged[-1].commit)
+    try:
+        _push_and_deploy(deploy_script, project.root, detach=detach)
+    except RuntimeError as error:
+        for entry in merged:
+            _reject(entry, str(error))
+        return
+    for entry in merged:
+        entry.status = SHIPPED
+        entry.save()
+
+
+def _stack(entries: list[QueueEntry], project: ProjectContext) -> list[QueueEntry]:
+    """Replay each entry's own commits onto the one before it, returning those that replayed cleanly."""
+    session = git_session(project.root)
+    tip = session.resolve(MAIN_BRANCH)
+    train: list[QueueEntry] = []
+    for entry in entries:
+        if not owner_is_running(entry):
+            _reject(
+                entry, f"The `ship` that queued {entry.branch} is no longer running."
+            )
+            continue
+        if not entry.worktree.is_dir():
+            _reject(entry, f"The worktree {entry.worktree} no longer exists.")
+            continue
+        display(f"Rebasing {entry.branch} onto the train...")
+        with traced("Rebase", "ship"):
+            rebased = replay(session, entry.commit, tip)
+        if rebased is None:
+            _reject(
+                entry,
+                f"Rebasing {entry.branch} onto the merge train conflicted. Ship it without `--queue` to resolve the conflict.",
+            )
+            continue
+        entry.commit = tip = rebased
+        train.append(entry)
+    return train
+
+
+def _passing_prefix(train: list[QueueEntry], ci: _Ci, scratch: Path) -> int:
+    """Return how many branches at the front of `train` pass CI together, leaving `scratch` at their tip."""
+    display(f"Running CI ({ci.script}) on the train...")
+    if _ci_passes(ci, scratch):
+        _amend_auto_fixes(scratch)
+        return len(train)
+
+    # Bisect, amending what CI fixes on each passing probe, so the tip that ships keeps its own fixes.
+    passing, failing = 0, len(train)
+    passing_tip = ""
+    while failing - passing > 1:
+        middle = (passing + failing) // 2
+        display(
+            f"Bisecting: running CI on the train up to {train[middle - 1].branch}..."
+        )
+        _check_out(scratch, train[middle - 1].commit)
+        if _ci_passes(ci, scratch):
+            _amend_auto_fixes(scratch)
+            passing, passing_tip = middle, git_session(scratch).resolve("HEAD")
+        else:
+            failing = middle
+    if passing:
+        _check_out(scratch, passing_tip)
+    return passing
+
+
+def _check_out(scratch: Path, commit: str) -> None:
+    """Check `commit` out in `scratch`, dropping whatever the last CI run changed there."""
+    _git(scratch, "reset", "--hard")
+    _git(scratch, "clean", "-fd")
+    _git(scratch, "checkout", "--detach", commit)
+
+
+def _ci_passes(ci: _Ci, worktree: Path) -> bool:
+    try:
+        with traced("CI", "ship"):
+            _run_ci(ci, worktree, _committed_tree(worktree))
+    except RuntimeError:
+        return False
+    return True
+
+
+def _reject(entry: QueueEntry, message: str) -> None:
+    display(f"✗ {entry.branch}: {message}")
+    entry.status = FAILED
+    entry.message = message
+    entry.save()
+
+
+def _show_status(repo_dir: Path) -> None:
+    jobs = ShipJobs(git_session(repo_dir).common_dir).all()
+    if not jobs:
+        display("No background ship jobs.")
+        return
+    for job in reversed(jobs):
+        display(_describe_job(job))
+
+
+def _describe_job(job: ShipJob) -> str:
+    description = f"{job.id}  {job.status:<10}  {job.commit[:12]}  queued {_local_time(job.queued_at)}"
+    if job.finished_at is not None:
+        description += f", finished {_local_time(job.finished_at)}"
+    if job.message:
+        description += f"  {job.message}"
+    return description
+
+
+def _local_time(seconds: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(seconds))
+
+
+def _handle_rebase_conflict(worktree: Path) -> None:
+    fix_with_agent(
+        REBASE_CONFLICT_PROMPT.format(worktree=worktree, main_branch=MAIN_BRANCH)
+    )
+
+    try:
+        _git(worktree, "diff", "--check")
+    except SimpleProgramError:
+        _git(worktree, "rebase", "--abort")
+        _undo_auto_commit(worktree)
+        msg = "Rebase conflict was irreconcilable; aborted."
+        raise RuntimeError(msg) from None
+
+    _git(worktree, "add", "-A")
+    # `-c core.editor=/bin/true` skips the commit-message editor that
+    # `git rebase --continue` would otherwise pop up. Absolute path so
+    # git doesn't need PATH to locate it.
+    _git(worktree, "-c", "core.editor=/bin/true", "rebase", "--continue")
+
+
+def _run_ci(ci: _Ci, worktree: Path, tree: str) -> None:
+    """Run the CI script in `worktree`, unless `tree`, what the worktree holds, already passed the same script."""
+    if not ci.force and ci.ledger.has_passed(tree):
+        display(f"Skipping CI: tree {tree[:12]} already passed it.")
+        return
+    result = subprocess.run(
+        [str(ci.script)], cwd=worktree, env=dict(os.environ), check=False
+    )
+    record_exit_code(result.returncode)
+    if result.returncode != 0:
+        msg = f"CI failed with return code {result.returncode}."
+        raise RuntimeError(msg)
+
+
+def _record_ci_pass(ci: _Ci, worktree: Path) -> None:
+    """Record the worktree's commit, with the fixes CI made committed too, as what passed CI."""
+    ci.ledger.record(_committed_tree(worktree))
+
+
+def _committed_tree(worktree: Path) -> str:
+    return git_session(worktree).resolve("HEAD^{tree}")
+
+
+def _run_deploy(deploy_script: Path, cwd: Path) -> None:
+    result = subprocess.run(
+        [str(deploy_script)], cwd=cwd, env=dict(os.environ), check=False
+    )
+    record_exit_code(result.returncode)
+    if result.returncode != 0:
+        msg = f"Deploy failed with return code {result.returncode}."
+        raise RuntimeError(msg)
+
+
+def _amend_auto_fixes(worktree: Path) -> None:
+    if _git(worktree, "status", "--porcelain").strip():
+        _git(worktree, "add", "-A")
+        _git(worktree, "commit", "--amend", "--no-edit")
+
+
+def _undo_auto_commit(worktree: Path) -> None:
+    """Revert ship's own commit so the agent's edits remain in the worktree as unstaged changes."""
+    _git(worktree, "reset", "--mixed", "HEAD~1")
+
+
+def _git(cwd: Path, *args: str) -> str:
+    return run_simple_program(git_program(), list(args), cwd=cwd, env=dict(os.environ))
+
+
+def main() -> None:
+    typer.run(ship)  # pragma: no cover
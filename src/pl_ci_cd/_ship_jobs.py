@@ -0,0 +1,166 @@
+import contextlib
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from pl_mocks_and_fakes import MockInUnitTests, MockReason
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SUPERSEDED = "superseded"
+# Finished jobs kept for `ship --status`.
+MAX_FINISHED_JOBS = 50
+
+
+@dataclass
+class ShipJob:
+    """A push and deploy of `main` that `ship --detach` handed to the background worker."""
+
+    id: str
+    # `main` when the job was queued.
+    commit: str
+    status: str = QUEUED
+    # Why the job failed, or which job superseded it.
+    message: str = ""
+    # Seconds since the epoch.
+    queued_at: float = 0.0
+    finished_at: float | None = None
+
+
+class ShipJobs:
+    """
+    The background push-and-deploy jobs of one repository, one JSON file each in its git directory.
+
+    At most one worker runs them at a time. A worker runs only the newest queued job and marks the older
+    ones superseded, since deploying `main` deploys everything merged before it.
+    """
+
+    def __init__(self, git_common_dir: Path) -> None:
+        self.directory = git_common_dir / "pl-ci-cd" / "ship-jobs"
+
+    def add(self, commit: str) -> ShipJob:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        job = ShipJob(f"{time.time_ns()}-{os.getpid()}", commit, queued_at=time.time())
+        self._save(job)
+        return job
+
+    def all(self) -> list[ShipJob]:
+        """Return every job kept, oldest first."""
+        jobs: list[ShipJob] = []
+        for path in sorted(self.directory.glob("*.json")):
+            # A worker may prune it after it was listed.
+            with contextlib.suppress(FileNotFoundError):
+                jobs.append(_load(path))
+        return jobs
+
+    def has_queued(self) -> bool:
+        return any(job.status == QUEUED for job in self.all())
+
+    def claim_newest(self) -> ShipJob | None:
+        """Mark the newest queued job running and the other queued ones superseded by it, and return it."""
+        queued = [job for job in self.all() if job.status == QUEUED]
+        if not queued:
+            return None
+        newest = queued[-1]
+        for job in queued[:-1]:
+            self._finish(job, SUPERSEDED, f"Superseded by {newest.id}.")
+        newest.status = RUNNING
+        self._save(newest)
+        return newest
+
+    def finish(self, job: ShipJob, error: str | None) -> None:
+        if error is None:
+            self._finish(job, DONE, "")
+        else:
+            self._finish(job, FAILED, error)
+
+    def requeue_interrupted(self) -> None:
+        """Queue again the jobs a worker was running when it died. Call only while holding the worker lock."""
+        for job in self.all():
+            if job.status == RUNNING:
+                job.status = QUEUED
+                self._save(job)
+
+    @contextmanager
+    def worker_lock(self) -> Iterator[bool]:
+        """Take the worker lock if no other worker holds it, yielding whether it was taken."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with (self.directory / "worker.lock").open("w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _finish(self, job: ShipJob, status: str, message: str) -> None:
+        job.status = status
+        job.message = message
+        job.finished_at = time.time()
+        self._save(job)
+
+    def _save(self, job: ShipJob) -> None:
+        path = self.directory / f"{job.id}.json"
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(asdict(job)))
+        temporary.replace(path)
+
+    def prune(self) -> None:
+        """Delete all but the newest finished jobs. Call only while holding the worker lock."""
+        finished = [job for job in self.all() if job.finished_at is not None]
+        for job in finished[:-MAX_FINISHED_JOBS]:
+            (self.directory / f"{job.id}.json").unlink()
+
+
+def run_jobs(jobs: ShipJobs, run: Callable[[ShipJob], None]) -> None:
+    """
+    Run queued jobs with `run` until none are left, unless another worker is already running them.
+
+    After letting go of the lock the queue is checked once more, so a job queued just as the last worker
+    was finishing isn't left behind when that ship's own worker found the lock still taken.
+    """
+    while True:
+        with jobs.worker_lock() as acquired:
+            if not acquired:
+                return
+            jobs.requeue_interrupted()
+            while (job := jobs.claim_newest()) is not None:
+                try:
+                    run(job)
+                except Exception as error:
+                    jobs.finish(job, str(error))
+                else:
+                    jobs.finish(job, None)
+            jobs.prune()
+        if not jobs.has_queued():
+            return
+
+
+@MockInUnitTests(MockReason.UNMITIGATED_SIDE_EFFECT)
+def start_worker(jobs: ShipJobs, repo_dir: Path) -> None:
+    """Start a background worker for the jobs of `repo_dir`, which outlives this process."""
+    with (jobs.directory / "worker.log").open("a") as log:
+        subprocess.Popen(
+            [sys.executable, "-m", "pl_ci_cd._ship_worker", str(repo_dir)],
+            cwd=repo_dir,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+
+
+def _load(path: Path) -> ShipJob:
+    return ShipJob(**json.loads(path.read_text()))
@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+from pl_user_io.display import display
+
+from pl_ci_cd._git_session import git_session, git_sessions
+from pl_ci_cd._ship import push_and_deploy
+from pl_ci_cd._ship_jobs import ShipJob, ShipJobs, run_jobs
+
+
+def run_worker(repo_dir: Path) -> None:
+    """Push and deploy the jobs `ship --detach` queued for `repo_dir` until none are left."""
+    with git_sessions():
+        jobs = ShipJobs(git_session(repo_dir).common_dir)
+
+    def _run(job: ShipJob) -> None:
+        display(f"Running job {job.id} ({job.commit[:12]})...")
+        push_and_deploy(repo_dir, job.commit)
+
+    run_jobs(jobs, _run)
+
+
+def main() -> None:
+    run_worker(Path(sys.argv[1]))  # pragma: no cover
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
@@ -0,0 +1,104 @@
+import json
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from pl_ci_cd._cache import CACHE_DIR_NAME, ensure_cache_dir
+
+STAGE_HISTORY_NAME = "stage_history.json"
+# How much the latest run moves a stage's averages. Higher follows changes faster but noisier.
+_SMOOTHING = 0.3
+# The failure rate assumed for a stage that never ran, so a single pass doesn't make it look infallible.
+_PRIOR_FAILURE_RATE = 0.5
+# Keeps a stage that hasn't failed in a long time from having an infinite priority key.
+_MIN_FAILURE_RATE = 0.001
+
+
+@dataclass
+class StageStats:
+    runs: int
+    # Exponentially weighted averages over past runs.
+    seconds: float
+    failure_rate: float
+
+
+class StageHistory:
+    """
+    Per-project record of how long each stage takes and how often it fails, kept in the cache directory.
+
+    Averages are weighted toward recent runs, so the history follows a project as it grows.
+    """
+
+    def __init__(self, project_root: Path) -> None:
+        self._project_root = project_root
+        self._lock = threading.Lock()
+        self._stats = self._load()
+
+    def stats(self, label: str) -> StageStats | None:
+        return self._stats.get(label)
+
+    def record(self, label: str, seconds: float, passed: bool) -> None:
+        """Add a finished run of a stage and save the history. Safe to call from the threads of parallel stages."""
+        with self._lock:
+            previous = self._stats.get(label)
+            failed = 0.0 if passed else 1.0
+            if previous is None:
+                self._stats[label] = StageStats(
+                    1, seconds, _smooth(_PRIOR_FAILURE_RATE, failed)
+                )
+            else:
+                self._stats[label] = StageStats(
+                    previous.runs + 1,
+                    _smooth(previous.seconds, seconds),
+                    _smooth(previous.failure_rate, failed),
+                )
+            path = ensure_cache_dir(self._project_root) / STAGE_HISTORY_NAME
+            path.write_text(
+                json.dumps(
+                    {label: asdict(stats) for label, stats in self._stats.items()},
+                    sort_keys=True,
+                )
+            )
+
+    def priority(self, label: str) -> float:
+        """
+        Sort key that puts stages likely to fail soon first: expected seconds per failure found.
+
+        Running stages in increasing order of duration over failure probability minimizes the expected time
+        until the first failure. A stage without history sorts first, so its cost is learned.
+        """
+        stats = self._stats.get(label)
+        if stats is None:
+            return 0.0
+        return stats.seconds / max(stats.failure_rate, _MIN_FAILURE_RATE)
+
+    def _load(self) -> dict[str, StageStats]:
+        path = self._project_root / CACHE_DIR_NAME / STAGE_HISTORY_NAME
+        if not path.exists():
+            return {}
+        try:
+            raw = json.loads(path.read_text())
+            return {
+                str(label): StageStats(
+                    int(stats["runs"]),
+                    float(stats["seconds"]),
+                    float(stats["failure_rate"]),
+                )
+                for label, stats in raw.items()
+            }
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return {}
+
+
+def format_eta(seconds: float) -> str:
+    """Format an estimated duration like `~12s` or `~2m05s`."""
+    if seconds < 1:
+        return "<1s"
+    if seconds < 60:
+        return f"~{seconds:.0f}s"
+    minutes, rest = divmod(round(seconds), 60)
+    return f"~{minutes}m{rest:02d}s"
+
+
+def _smooth(average: float, latest: float) -> float:
+    return (1 - _SMOOTHING) * average + _SMOOTHING * latest
@@ -0,0 +1,192 @@
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from pl_user_io.display import display
+from pl_user_io.loading_spinner import loading_spinner
+
+from pl_ci_cd._cache import StageCache, StageInputs
+from pl_ci_cd._cancellation import (
+    CancellationScope,
+    cancellation_scope,
+    submit_in_context,
+)
+from pl_ci_cd._resources import UNLIMITED, Resources
+from pl_ci_cd._stage_history import StageHistory, format_eta
+from pl_ci_cd._trace import traced
+
+
+@dataclass(frozen=True)
+class Stage:
+    label: str
+    run: Callable[[], None]
+    # None means the stage's result is never cached.
+    inputs: StageInputs | None = None
+    # What the stage takes out of the budget while it runs in parallel with others.
+    weight: Resources = field(default_factory=Resources)
+    # Whether running the stage rewrites its own inputs, as fixers do. Its pass is then recorded for the
+    # inputs it leaves behind rather than those it started from.
+    rewrites_inputs: bool = False
+
+
+def prioritize(stages: list[Stage], history: StageHistory) -> list[Stage]:
+    """Order `stages` so the ones likely to fail soonest for their cost come first. Ties keep their order."""
+    return sorted(stages, key=lambda stage: history.priority(stage.label))
+
+
+def run_stages_in_order(
+    stages: list[Stage],
+    cache: StageCache | None = None,
+    history: StageHistory | None = None,
+) -> None:
+    for stage in stages:
+        # Keyed only now, after the stages before it, so the tree a fixer leaves behind is what gets checked.
+        key = _cache_key(stage, cache)
+        if _passed_before(stage, key, cache):
+            continue
+        start = time.monotonic()
+        try:
+            with (
+                loading_spinner(stage.label + _eta([stage.label], history)),
+                traced(stage.label, "check"),
+            ):
+                stage.run()
+        except Exception:
+            _record_run(stage, history, time.monotonic() - start, passed=False)
+            raise
+        _record_run(stage, history, time.monotonic() - start, passed=True)
+        _record_pass(stage, key, cache)
+
+
+def run_stages_in_parallel(
+    stages: list[Stage],
+    cache: StageCache | None = None,
+    history: StageHistory | None = None,
+    budget: Resources = UNLIMITED,
+) -> None:
+    """
+    Run `stages` concurrently, reporting each one as it finishes.
+
+    A stage starts only while its weight fits in what `budget` has left, taking the first waiting stage that
+    fits each time one finishes. A stage bigger than the whole budget runs once nothing else is running.
+    The first failure kills the programs of every stage still running, skips those still waiting, and is
+    re-raised once the running ones have exited. Ctrl-C kills them too, before waiting for the threads.
+    """
+    keys: dict[Stage, str | None] = {}
+    for stage in stages:
+        key = _cache_key(stage, cache)
+        if not _passed_before(stage, key, cache):
+            keys[stage] = key
+    stages = list(keys)
+    if not stages:
+        return
+    labels = [stage.label for stage in stages]
+    display(f"Running in parallel: {', '.join(labels)}{_eta(labels, history)}")
+    scope = CancellationScope()
+    first_error: BaseException | None = None
+    waiting = list(stages)
+    running: dict[Future[None], Stage] = {}
+    # When each running stage was admitted, so time spent waiting for the budget isn't counted as its own.
+    started: dict[Future[None], float] = {}
+
+    with ThreadPoolExecutor(max_workers=len(stages)) as executor:
+        try:
+            while waiting or running:
+                if first_error is None:
+                    for stage in _admit(waiting, list(running.values()), budget):
+                        waiting.remove(stage)
+                        future = submit_in_context(
+                            executor, _run_in_scope, stage, scope
+                        )
+                        running[future] = stage
+                        started[future] = time.monotonic()
+                else:
+                    for stage in waiting:
+                        display(f"- {stage.label} (cancelled)")
+                    waiting.clear()
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    seconds = time.monotonic() - started.pop(future)
+                    error = future.exception()
+                    if first_error is not None:
+                        display(f"- {stage.label} (cancelled)")
+                    elif error is None:
+                        display(f"✓ {stage.label}")
+                        _record_run(stage, history, seconds, passed=True)
+                        _record_pass(stage, keys[stage], cache)
+                    else:
+                        display(f"✗ {stage.label}")
+                        _record_run(stage, history, seconds, passed=False)
+                        first_error = error
+                        scope.cancel()
+        except BaseException:
+            scope.cancel()
+            raise
+
+    if first_error is not None:
+        raise first_error
+
+
+def _admit(
+    waiting: list[Stage], running: list[Stage], budget: Resources
+) -> list[Stage]:
+    """Pick the waiting stages, in order, that fit in `budget` next to the running ones."""
+    admitted: list[Stage] = []
+    in_use = sum((stage.weight for stage in running), Resources(0, 0))
+    for stage in waiting:
+        if (in_use + stage.weight).fits_in(budget) or not (running or admitted):
+            admitted.append(stage)
+            in_use += stage.weight
+    return admitted
+
+
+def _run_in_scope(stage: Stage, scope: CancellationScope) -> None:
+    with cancellation_scope(scope), traced(stage.label, "check"):
+        stage.run()
+
+
+def _cache_key(stage: Stage, cache: StageCache | None) -> str | None:
+    """
+    Key the stage's inputs as they are before it runs, so a file edited while it runs can't be recorded as passing.
+
+    None for stages that aren't cached.
+    """
+    return None if cache is None or stage.inputs is None else cache.key(stage.inputs)
+
+
+def _passed_before(stage: Stage, key: str | None, cache: StageCache | None) -> bool:
+    if cache is None or key is None or not cache.has_passed(key):
+        return False
+    display(f"✓ {stage.label} (cached pass)")
+    return True
+
+
+def _record_pass(stage: Stage, key: str | None, cache: StageCache | None) -> None:
+    if cache is None or stage.inputs is None or key is None:
+        return
+    if stage.rewrites_inputs:
+        key = cache.key(stage.inputs)
+    cache.record_pass(key, stage.inputs)
+
+
+def _eta(labels: list[str], history: StageHistory | None) -> str:
+    """How long the stages with `labels` usually take together, like ` (~12s)`, or nothing without history for all."""
+    if history is None:
+        return ""
+    seconds: list[float] = []
+    for label in labels:
+        stats = history.stats(label)
+        if stats is None:
+            return ""
+        seconds.append(stats.seconds)
+    # Concurrent stages take as long as the slowest.
+    return f" ({format_eta(max(seconds))})"
+
+
+def _record_run(
+    stage: Stage, history: StageHistory | None, seconds: float, *, passed: bool
+) -> None:
+    if history is not None:
+        history.record(stage.label, seconds, passed)
@@ -0,0 +1,124 @@
+import asyncio
+import subprocess
+import threading
+from collections import deque
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import IO, cast
+
+from pl_user_io.display import display
+
+LOGS_DIR_NAME = "logs"
+# Lines of each output stream kept in memory, and so in error messages.
+TAIL_LINES = 50
+# Longer lines are cut in the tail, since a single line can be megabytes (like a minified JSON dump).
+_MAX_TAIL_LINE_LENGTH = 1_000
+
+_log_dir: ContextVar[Path | None] = ContextVar("_log_dir", default=None)
+
+
+@contextmanager
+def streaming_output(log_dir: Path) -> Generator[Path]:
+    """
+    Stream the output of tools run inside this context with a `log_name` instead of buffering it.
+
+    Each line is displayed as it arrives, prefixed with the log name, and the full output is written to
+    `<log_dir>/<log_name>.log`. The returned stdout and stderr hold only their last `TAIL_LINES` lines.
+    """
+    log_dir.mkdir(parents=True, exist_ok=True)
+    token = _log_dir.set(log_dir)
+    try:
+        yield log_dir
+    finally:
+        _log_dir.reset(token)
+
+
+def streaming_log_dir() -> Path | None:
+    return _log_dir.get()
+
+
+class _Tail:
+    def __init__(self) -> None:
+        self.lines: deque[str] = deque(maxlen=TAIL_LINES)
+        self.total = 0
+
+    def add(self, line: str) -> None:
+        self.total += 1
+        if len(line) > _MAX_TAIL_LINE_LENGTH:
+            line = f"{line[:_MAX_TAIL_LINE_LENGTH]}… (line cut)\n"
+        self.lines.append(line)
+
+    @property
+    def omitted(self) -> int:
+        return self.total - len(self.lines)
+
+
+def stream_process_output(
+    process: subprocess.Popen[str], log_path: Path, label: str
+) -> tuple[str, str]:
+    """Display and log the output of `process` until it exits, and return the tails of its stdout and stderr."""
+    stdout_tail = _Tail()
+    stderr_tail = _Tail()
+    lock = threading.Lock()
+
+    with log_path.open("w") as log:
+
+        def _pump(pipe: IO[str] | None, tail: _Tail) -> None:
+            # Both pipes are set, since the program is started with `stdout=PIPE` and `stderr=PIPE`.
+            for line in pipe or ():
+                with lock:
+                    log.write(line)
+                    tail.add(line)
+                    display(f"{label}: {line.rstrip()}")
+
+        # stderr is read on its own thread so a full stderr pipe can't block the program while stdout is read.
+        stderr_reader = threading.Thread(
+            target=_pump, args=(process.stderr, stderr_tail)
+        )
+        stderr_reader.start()
+        _pump(process.stdout, stdout_tail)
+        stderr_reader.join()
+        process.wait()
+
+    return _tail_output(stdout_tail, stderr_tail, log_path)
+
+
+async def stream_process_output_async(
+    process: asyncio.subprocess.Process, log_path: Path, label: str
+) -> tuple[str, str]:
+    """Awaitable `stream_process_output` for an asyncio subprocess."""
+    stdout_tail = _Tail()
+    stderr_tail = _Tail()
+
+    with log_path.open("w") as log:
+
+        async def _pump(pipe: asyncio.StreamReader, tail: _Tail) -> None:
+            while raw := await pipe.readline():
+                line = raw.decode()
+                log.write(line)
+                tail.add(line)
+                display(f"{label}: {line.rstrip()}")
+
+        # Both pipes are set, since the program is started with `stdout=PIPE` and `stderr=PIPE`.
+        await asyncio.gather(
+            _pump(cast("asyncio.StreamReader", process.stdout), stdout_tail),
+            _pump(cast("asyncio.StreamReader", process.stderr), stderr_tail),
+        )
+        await process.wait()
+
+    return _tail_output(stdout_tail, stderr_tail, log_path)
+
+
+def _tail_output(
+    stdout_tail: _Tail, stderr_tail: _Tail, log_path: Path
+) -> tuple[str, str]:
+    note = f"[Full output in {log_path}"
+    if stdout_tail.omitted:
+        note += f"; {stdout_tail.omitted} earlier line(s) omitted"
+    stdout = f"{note}]\n{''.join(stdout_tail.lines)}"
+    stderr = "".join(stderr_tail.lines)
+    if stderr_tail.omitted:
+        stderr = f"[{stderr_tail.omitted} earlier line(s) omitted]\n{stderr}"
+    return stdout, stderr
@@ -0,0 +1,387 @@
+import ast
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from types import NoneType
+
+from pl_mocks_and_fakes import MockInUnitTests, MockReason
+from pl_run_program import ProgramResult
+from pl_user_io.display import display
+
+from pl_ci_cd._cache import StageCache, ensure_cache_dir
+from pl_ci_cd._cancellation import run_cancellable_program
+from pl_ci_cd._failed_tests import load_failed_tests
+from pl_ci_cd._run_unit_tests_and_coverage import (
+    CoverageOrTestsError,
+    junit_report_args,
+    record_reported_failures,
+)
+from pl_ci_cd._tool_environment import UV_RUN, ToolEnvironment
+
+IMPACT_MAP_NAME = "test_impact.json"
+_IMPACT_MAP_VERSION = 1
+_COVERAGE_EXPORT_NAME = "coverage.json"
+
+# The test id coverage records for lines run outside any test, like module bodies run on import.
+_NO_TEST = ""
+# pytest's exit code when every selected test was deselected, e.g. by a marker.
+_NO_TESTS_COLLECTED = 5
+
+
+@dataclass(frozen=True)
+class FileCoverage:
+    statements: frozenset[int]
+    # Executed line -> ids of the tests that ran it.
+    lines: dict[int, frozenset[str]]
+
+    def tests(self) -> set[str]:
+        return {test for tests in self.lines.values() for test in tests} - {_NO_TEST}
+
+
+@dataclass(frozen=True)
+class ImpactMap:
+    """Per-test coverage of a passing run, and the digests of the project files it ran against."""
+
+    digests: dict[str, str]
+    files: dict[str, FileCoverage]
+    branch_coverage: bool
+
+    def tests(self) -> set[str]:
+        return {test for coverage in self.files.values() for test in coverage.tests()}
+
+
+@dataclass(frozen=True)
+class ImpactSelection:
+    # Test files and test ids to run, or None to run every test.
+    targets: list[str] | None
+    reason: str
+
+
+def run_impacted_unit_tests_and_coverage(
+    directory: Path, tools: ToolEnvironment = UV_RUN
+) -> NoneType:
+    """
+    Like `run_unit_tests_and_coverage`, but only run the tests affected by changes since the last passing run.
+
+    Each passing run records which tests ran which lines. The next run selects the tests that ran a changed
+    file, plus the test files that import it directly or through other project modules, and re-checks coverage on the fresh coverage merged with the
+    recorded coverage of everything else. Changes that can't be traced to specific tests (conftest.py,
+    configuration, dependencies, added or removed files) run every test.
+    """
+    map_path = ensure_cache_dir(directory) / IMPACT_MAP_NAME
+    recorded = load_impact_map(map_path)
+    digests = StageCache(directory).file_digests()
+    selection = select_tests(directory, recorded, digests)
+
+    merged = None
+    if recorded is not None and selection.targets == []:
+        display("Nothing changed since the last passing run.")
+        merged = recorded.files
+    elif recorded is not None and selection.targets is not None:
+        display(
+            f"{selection.reason}, running {len(selection.targets)} impacted test target(s)."
+        )
+        fresh = _run_tests(directory, tools, selection.targets, digests)
+        merged = merge_coverage(recorded, fresh, selection.targets)
+        if merged is None:
+            display("A changed file is no longer covered, running every test.")
+    else:
+        display(f"{selection.reason}, running every test.")
+
+    if merged is None:
+        result = _run_tests(directory, tools, None, digests)
+        merged, branch_coverage = result.files, result.branch_coverage
+    else:
+        branch_coverage = False
+
+    uncovered = uncovered_lines(merged)
+    if uncovered:
+        listing = "\n".join(
+            f"{file}: {', '.join(map(str, lines))}" for file, lines in uncovered.items()
+        )
+        msg = f"Coverage is below 100%. Lines no test runs:\n{listing}"
+        raise CoverageOrTestsError(msg)
+    save_impact_map(map_path, ImpactMap(digests, merged, branch_coverage))
+
+
+def select_tests(
+    project_root: Path, recorded: ImpactMap | None, digests: dict[str, str]
+) -> ImpactSelection:
+    if recorded is None:
+        return ImpactSelection(None, "No per-test coverage is recorded")
+    if recorded.branch_coverage:
+        return ImpactSelection(None, "Branch coverage can't be merged across runs")
+
+    tests = recorded.tests()
+    test_files = {_test_file(test) for test in tests}
+    changed = changed_files(recorded, digests)
+    imports: dict[str, set[str]] | None = None
+    targets: set[str] = set()
+    for file in changed:
+        if file not in digests or file not in recorded.digests:
+            return ImpactSelection(None, f"{file} was added or removed")
+        if Path(file).name == "conftest.py":
+            return ImpactSelection(None, f"{file} changed")
+        if file in test_files:
+            targets.add(file)
+            continue
+        coverage = recorded.files.get(file)
+        if coverage is None or not coverage.tests():
+            return ImpactSelection(
+                None, f"{file} changed and no test is recorded as running it"
+            )
+        targets |= coverage.tests()
+        if imports is None:
+            imports = _project_imports(project_root, digests)
+        targets |= _test_files_importing(file, test_files, imports)
+
+    # A test id is redundant next to its whole file.
+    targets = {
+        target
+        for target in targets
+        if target == _test_file(target) or _test_file(target) not in targets
+    }
+    return ImpactSelection(
+        sorted(targets), f"{len(changed)} file(s) changed since the last passing run"
+    )
+
+
+def changed_files(recorded: ImpactMap, digests: dict[str, str]) -> list[str]:
+    return sorted(
+        file
+        for file in digests.keys() | recorded.digests.keys()
+        if digests.get(file) != recorded.digests.get(file)
+    )
+
+
+def merge_coverage(
+    recorded: ImpactMap, fresh: ImpactMap, targets: list[str]
+) -> dict[str, FileCoverage] | None:
+    """
+    Coverage of every test, from the fresh coverage of the re-run tests and the recorded coverage of the rest.
+
+    Returns None if a changed file was not measured at all, since then which tests still run it is unknown.
+    """
+    rerun = {test for test in recorded.tests() | fresh.tests() if _reran(test, targets)}
+    changed = set(changed_files(recorded, fresh.digests))
+    if any(file in changed and file not in fresh.files for file in recorded.files):
+        return None
+
+    merged: dict[str, FileCoverage] = {}
+    for file in recorded.files.keys() | fresh.files.keys():
+        old = recorded.files.get(file)
+        new = fresh.files.get(file)
+        if old is None or file in changed:
+            assert new is not None
+            merged[file] = new
+            continue
+        lines = {line: tests - rerun for line, tests in old.lines.items()}
+        if new is not None:
+            for line, tests in new.lines.items():
+                lines[line] = lines.get(line, frozenset()) | tests
+        merged[file] = FileCoverage(
+            old.statements, {line: tests for line, tests in lines.items() if tests}
+        )
+    return merged
+
+
+def uncovered_lines(files: dict[str, FileCoverage]) -> dict[str, list[int]]:
+    uncovered = {
+        file: sorted(coverage.statements - coverage.lines.keys())
+        for file, coverage in sorted(files.items())
+    }
+    return {file: lines for file, lines in uncovered.items() if lines}
+
+
+def parse_coverage_json(report: str, digests: dict[str, str]) -> ImpactMap:
+    """Read the output of `coverage json --show-contexts` as recorded by pytest-cov's `--cov-context=test`."""
+    raw = json.loads(report)
+    files: dict[str, FileCoverage] = {}
+    for file, data in raw["files"].items():
+        files[Path(file).as_posix()] = FileCoverage(
+            frozenset(data["executed_lines"] + data["missing_lines"]),
+            {
+                int(line): frozenset(_test_id(context) for context in contexts)
+                for line, contexts in data["contexts"].items()
+            },
+        )
+    return ImpactMap(digests, files, raw["meta"]["branch_coverage"])
+
+
+def load_impact_map(path: Path) -> ImpactMap | None:
+    if not path.exists():
+        return None
+    try:
+        raw = json.loads(path.read_text())
+        if raw["version"] != _IMPACT_MAP_VERSION:
+            return None
+        return ImpactMap(
+            raw["digests"],
+            {
+                file: FileCoverage(
+                    frozenset(data["statements"]),
+                    {
+                        int(line): frozenset(tests)
+                        for line, tests in data["lines"].items()
+                    },
+                )
+                for file, data in raw["files"].items()
+            },
+            raw["branch_coverage"],
+        )
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def save_impact_map(path: Path, impact_map: ImpactMap) -> None:
+    raw = {
+        "version": _IMPACT_MAP_VERSION,
+        "branch_coverage": impact_map.branch_coverage,
+        "digests": impact_map.digests,
+        "files": {
+            file: {
+                "statements": sorted(coverage.statements),
+                "lines": {
+                    str(line): sorted(tests)
+                    for line, tests in sorted(coverage.lines.items())
+                },
+            }
+            for file, coverage in impact_map.files.items()
+        },
+    }
+    path.write_text(json.dumps(raw))
+
+
+def _run_tests(
+    directory: Path,
+    tools: ToolEnvironment,
+    targets: list[str] | None,
+    digests: dict[str, str],
+) -> ImpactMap:
+    result = run_pytest_with_test_contexts(directory, tools, targets)
+    # Tests this run left out failed last time for all anyone knows, so they stay recorded.
+    kept = (
+        []
+        if targets is None
+        else [
+            test for test in load_failed_tests(directory) if not _reran(test, targets)
+        ]
+    )
+    record_reported_failures(directory, kept)
+    # A subset of the tests can't meet the coverage gate on its own, so the gate is checked after merging.
+    passed = result.returncode == 0 or (
+        targets is not None and result.returncode == _NO_TESTS_COLLECTED
+    )
+    if not passed:
+        msg = f"Tests or coverage failed. stdout: `{result.stdout}` stderr: `{result.stderr}`"
+        raise CoverageOrTestsError(msg)
+    return parse_coverage_json(export_coverage(directory, tools), digests)
+
+
+@MockInUnitTests(MockReason.SLOW)
+def run_pytest_with_test_contexts(
+    directory: Path, tools: ToolEnvironment, targets: list[str] | None
+) -> ProgramResult:
+    args = ["--cov", "--cov-context=test", "-q", *junit_report_args(directory)]
+    args += [str(directory), "--cov-fail-under=100"] if targets is None else targets
+    command = tools.command("pytest", args, directory)
+    return run_cancellable_program(
+        command.program,
+        command.args,
+        cwd=directory,
+        env=command.env,
+        log_name="pytest",
+    )
+
+
+@MockInUnitTests(MockReason.SLOW)
+def export_coverage(directory: Path, tools: ToolEnvironment) -> str:
+    output = ensure_cache_dir(directory) / _COVERAGE_EXPORT_NAME
+    command = tools.command(
+        "coverage",
+        ["json", "--show-contexts", "--fail-under=0", "-q", "-o", str(output)],
+        directory,
+    )
+    result = run_cancellable_program(
+        command.program, command.args, cwd=directory, env=command.env
+    )
+    if result.returncode != 0:
+        msg = f"Exporting coverage failed. stdout: `{result.stdout}` stderr: `{result.stderr}`"
+        raise CoverageOrTestsError(msg)
+    report = output.read_text()
+    output.unlink()
+    return report
+
+
+def _test_id(context: str) -> str:
+    # pytest-cov labels contexts "<test id>|setup", "<test id>|run", and "<test id>|teardown".
+    return context.rpartition("|")[0] if "|" in context else context
+
+
+def _test_file(test: str) -> str:
+    return test.partition("::")[0]
+
+
+def _reran(test: str, targets: list[str]) -> bool:
+    return test in targets or _test_file(test) in targets
+
+
+def _test_files_importing(
+    file: str, test_files: set[str], imports: dict[str, set[str]]
+) -> set[str]:
+    """
+    Test files that import `file`, directly or through any chain of project modules.
+
+    A test that only uses a module's constants or classes runs none of its lines, so it isn't recorded as covering it.
+    The same goes for a module that re-exports or builds on them, so importers of importers count too.
+    """
+    reached = {file}
+    pending = [file]
+    while pending:
+        names = _module_names(pending.pop())
+        for importer, modules in imports.items():
+            if importer not in reached and modules & names:
+                reached.add(importer)
+                pending.append(importer)
+    return reached & test_files
+
+
+def _module_names(file: str) -> set[str]:
+    parts = Path(file).with_suffix("").parts
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    # The module name depends on which directory is on `sys.path`, so any suffix of the path may be it.
+    return {".".join(parts[start:]) for start in range(len(parts))}
+
+
+def _project_imports(
+    project_root: Path, digests: dict[str, str]
+) -> dict[str, set[str]]:
+    """Map each project Python file to the modules it imports."""
+    return {
+        file: _imported_modules(project_root, file)
+        for file in digests
+        if file.endswith(".py")
+    }
+
+
+def _imported_modules(project_root: Path, file: str) -> set[str]:
+    try:
+        tree = ast.parse((project_root / file).read_text())
+    except (SyntaxError, ValueError):
+        # A file that doesn't parse can't be imported, so no test reaches a changed file through it.
+        return set()
+    package = list(Path(file).parent.parts)
+    modules: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules |= {alias.name for alias in node.names}
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module.split(".") if node.module else []
+            if node.level:
+                base = package[: len(package) - node.level + 1] + base
+            module = ".".join(base)
+            modules.add(module)
+            # `from package import module` imports a module too.
+            modules |= {f"{module}.{alias.name}".lstrip(".") for alias in node.names}
+    return modules
@@ -0,0 +1,75 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from pl_run_program import Program, program_at_path, run_simple_program
+
+from pl_ci_cd._cache import digest_named_files
+from pl_ci_cd._constants import uv_program
+
+# Written into the synced environment, so deleting `.venv` also forces a re-sync.
+SYNC_STAMP_NAME = ".pl-ci-cd-synced"
+_SYNC_INPUTS = ("uv.lock", "pyproject.toml")
+
+
+@dataclass(frozen=True)
+class ToolCommand:
+    program: Program
+    args: list[str]
+    env: dict[str, str]
+
+
+@dataclass(frozen=True)
+class ToolEnvironment:
+    """
+    How stages launch ruff, pyright, and pytest.
+
+    Without a `venv`, every tool goes through `uv run`, which checks the lock and sync state on each launch.
+    With one, tools are run straight from its `bin` directory.
+    """
+
+    venv: Path | None = None
+
+    def command(self, tool: str, args: list[str], directory: Path) -> ToolCommand:
+        if self.venv is None:
+            return ToolCommand(
+                uv_program(), ["--directory", str(directory), "run", tool, *args], {}
+            )
+        bin_dir = self.venv / "bin"
+        # The same variables `uv run` sets, so tools (and their subprocesses) find the environment.
+        # The default search path stays on PATH for programs tools need, like pyright's `node`.
+        env = {
+            "VIRTUAL_ENV": str(self.venv),
+            "PATH": os.pathsep.join([str(bin_dir), os.defpath]),
+        }
+        return ToolCommand(program_at_path(bin_dir / tool), args, env)
+
+
+UV_RUN = ToolEnvironment()
+
+
+def ruff_command(
+    tools: ToolEnvironment, args: list[str], paths: list[Path] | None, directory: Path
+) -> ToolCommand | None:
+    """Return ruff with `args` on `paths`, or the whole directory if None. None if `paths` is empty."""
+    if paths is None:
+        return tools.command("ruff", args, directory)
+    if not paths:
+        return None
+    # Explicitly passed paths bypass ruff's `exclude` setting unless forced.
+    return tools.command(
+        "ruff", [*args, "--force-exclude", *map(str, paths)], directory
+    )
+
+
+def synced_tool_environment(project_root: Path) -> ToolEnvironment:
+    """Sync the project's environment, unless nothing it is built from changed since the last sync, and return it."""
+    venv = project_root / ".venv"
+    stamp = venv / SYNC_STAMP_NAME
+    if not stamp.exists() or stamp.read_text() != digest_named_files(
+        project_root, _SYNC_INPUTS
+    ):
+        run_simple_program(uv_program(), ["--directory", str(project_root), "sync"])
+        # Digest after syncing, since `uv sync` may rewrite the lock file.
+        stamp.write_text(digest_named_files(project_root, _SYNC_INPUTS))
+    return ToolEnvironment(venv)
@@ -0,0 +1,195 @@
+import json
+import os
+import resource
+import threading
+import time
+from collections.abc import Callable, Generator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+
+@dataclass(frozen=True)
+class ChildUsage:
+    """
+    Resources used by child processes that finished during a span.
+
+    Measured for the whole process, so spans that overlap (like parallel stages) each include the other's children.
+    """
+
+    user_seconds: float
+    system_seconds: float
+    # The peak of the largest child so far, not just those during the span.
+    max_rss_kb: int
+
+
+@dataclass(frozen=True)
+class Span:
+    name: str
+    category: str
+    # Seconds since the epoch.
+    start: float
+    end: float
+    thread: str
+    # The last non-zero exit code of a program run during the span, else the last exit code.
+    exit_code: int | None
+    child_usage: ChildUsage
+    # The type of the exception the span ended with.
+    error: str | None
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass(frozen=True)
+class TraceEvent:
+    kind: Literal["start", "end"]
+    name: str
+    category: str
+    # Set for "end" events.
+    span: Span | None = None
+
+
+class Tracer:
+    """
+    Records a span for each stage of `check` and phase of `ship` run inside `tracing(tracer)`.
+
+    Each hook is called with a `TraceEvent` as a span starts and ends, from the thread running it.
+    """
+
+    def __init__(self, hooks: Sequence[Callable[[TraceEvent], None]] = ()) -> None:
+        self._hooks = list(hooks)
+        self._lock = threading.Lock()
+        self._spans: list[Span] = []
+
+    @property
+    def spans(self) -> list[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def emit(self, event: TraceEvent) -> None:
+        if event.span is not None:
+            with self._lock:
+                self._spans.append(event.span)
+        for hook in self._hooks:
+            hook(event)
+
+    def write_chrome_trace(self, path: Path) -> None:
+        """Write the spans as Chrome trace-event JSON, which Perfetto and `chrome://tracing` open."""
+        threads: dict[str, int] = {}
+        events: list[dict[str, object]] = []
+        for span in sorted(self.spans, key=lambda span: span.start):
+            thread_id = threads.setdefault(span.thread, len(threads))
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": round(span.start * 1_000_000),
+                    "dur": round(span.duration * 1_000_000),
+                    "pid": os.getpid(),
+                    "tid": thread_id,
+                    "args": {
+                        "exit_code": span.exit_code,
+                        "error": span.error,
+                        "child_user_seconds": span.child_usage.user_seconds,
+                        "child_system_seconds": span.child_usage.system_seconds,
+                        "child_max_rss_kb": span.child_usage.max_rss_kb,
+                    },
+                }
+            )
+        events.extend(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "tid": thread_id,
+                "args": {"name": thread},
+            }
+            for thread, thread_id in threads.items()
+        )
+        path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+
+
+@dataclass
+class _OpenSpan:
+    exit_code: int | None = None
+
+
+_tracers: ContextVar[tuple[Tracer, ...]] = ContextVar("_tracers", default=())
+_open_span: ContextVar[_OpenSpan | None] = ContextVar("_open_span", default=None)
+
+
+@contextmanager
+def tracing(tracer: Tracer) -> Generator[Tracer]:
+    """Record spans into `tracer`, as well as into any tracer already active."""
+    token = _tracers.set((*_tracers.get(), tracer))
+    try:
+        yield tracer
+    finally:
+        _tracers.reset(token)
+
+
+@contextmanager
+def trace_file(path: Path | None) -> Generator[None]:
+    """Write a Chrome trace of everything run inside to `path`, even if it fails. Does nothing if `path` is None."""
+    if path is None:
+        yield
+        return
+    tracer = Tracer()
+    try:
+        with tracing(tracer):
+            yield
+    finally:
+        tracer.write_chrome_trace(path)
+
+
+@contextmanager
+def traced(name: str, category: str) -> Generator[None]:
+    tracers = _tracers.get()
+    if not tracers:
+        yield
+        return
+
+    for tracer in tracers:
+        tracer.emit(TraceEvent("start", name, category))
+    open_span = _OpenSpan()
+    token = _open_span.set(open_span)
+    usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.time()
+    error = None
+    try:
+        yield
+    except BaseException as exception:
+        error = type(exception).__name__
+        raise
+    finally:
+        end = time.time()
+        usage_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        _open_span.reset(token)
+        span = Span(
+            name=name,
+            category=category,
+            start=start,
+            end=end,
+            thread=threading.current_thread().name,
+            exit_code=open_span.exit_code,
+            child_usage=ChildUsage(
+                user_seconds=usage_after.ru_utime - usage_before.ru_utime,
+                system_seconds=usage_after.ru_stime - usage_before.ru_stime,
+                max_rss_kb=usage_after.ru_maxrss,
+            ),
+            error=error,
+        )
+        for tracer in tracers:
+            tracer.emit(TraceEvent("end", name, category, span))
+
+
+def record_exit_code(exit_code: int) -> None:
+    """Attach a program's exit code to the innermost span, keeping an earlier failure over a later success."""
+    open_span = _open_span.get()
+    if open_span is not None and not open_span.exit_code:
+        open_span.exit_code = exit_code
@@ -1,7 +1,7 @@
 from pl_run_program.run_program import run_program
 
-from ._constants import UV_PROGRAM
+from ._constants import uv_program
 
 
 def bump_package_version_patch() -> None:
-    run_program(UV_PROGRAM, ["version", "--bump", "patch"])
+    run_program(uv_program(), ["version", "--bump", "patch"])
@@ -1,31 +1,46 @@
 from pathlib import Path
+from typing import Annotated
 
 import typer
 from pl_tiny_clients.git_add_all import git_add_all
-from pl_tiny_clients.git_any_uncommitted_changes import git_any_uncommitted_changes
 from pl_tiny_clients.git_commit import git_commit
 from pl_tiny_clients.git_push import git_push
 from pl_user_io.display import display
 from pl_user_io.loading_spinner import loading_spinner
 
-from pl_ci_cd import check
+from pl_ci_cd._check import run_checks
+from pl_ci_cd._project import find_project
+from pl_ci_cd._trace import trace_file, traced
 
 
-def commit(directory: Path | None = None) -> None:
-    if directory is None:
-        directory = Path.cwd()
+def commit(
+    directory: Path | None = None,
+    trace: Annotated[
+        Path | None,
+        typer.Option(
+            help="Write a Chrome trace-event JSON file of the checks' and the commit's timing, exit codes, and child-process resource usage.",
+        ),
+    ] = None,
+) -> None:
+    with trace_file(trace), traced("commit", "commit"):
+        _commit(directory)
 
-    if not git_any_uncommitted_changes():
+
+def _commit(directory: Path | None) -> None:
+    project = find_project(directory or Path.cwd())
+
+    if not project.git_status:
         display("No changes to commit, exiting.")
         return
 
-    check(fix=True, directory=directory)
+    run_checks(project, fix=True)
 
-    git_add_all()
+    with traced("Commit", "commit"):
+        git_add_all()
 
-    git_commit(message="Commit")
+        git_commit(message="Commit")
 
-    with loading_spinner("Pushing changes"):
+    with loading_spinner("Pushing changes"), traced("Push", "commit"):
         git_push()
 
 
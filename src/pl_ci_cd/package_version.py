@@ -1,7 +1,7 @@
 from pl_run_program.run_simple_program import run_simple_program
 
-from ._constants import UV_PROGRAM
+from ._constants import uv_program
 
 
 def package_version() -> str:
-    return run_simple_program(UV_PROGRAM, ["version", "--short"]).strip()
+    return run_simple_program(uv_program(), ["version", "--short"]).strip()
@@ -7,7 +7,7 @@ from pl_run_program import run_simple_program
 from pl_tiny_clients.initialize_uv_project import UvProjectPath, initialize_uv_project
 
 from pl_ci_cd._check_types import check_types
-from pl_ci_cd._constants import UV_PROGRAM
+from pl_ci_cd._constants import uv_program
 from pl_ci_cd._run_unit_tests_and_coverage import run_unit_tests_and_coverage
 
 
@@ -15,7 +15,7 @@ def set_up_formatter(uv_project_path: UvProjectPath) -> None:
     """All subsequent calls to `format_code` should use `tmp_path` as the working directory."""
     ruff_version = importlib.metadata.version(ruff.__name__)
     run_simple_program(
-        UV_PROGRAM,
+        uv_program(),
         ["add", "--offline", f"ruff=={ruff_version}"],
         cwd=uv_project_path,
     )
@@ -24,7 +24,7 @@ def set_up_formatter(uv_project_path: UvProjectPath) -> None:
 def set_up_type_check(uv_project_path: UvProjectPath) -> None:
     pyright_version = importlib.metadata.version("pyright")
     run_simple_program(
-        UV_PROGRAM,
+        uv_program(),
         ["add", "--offline", f"pyright=={pyright_version}"],
         cwd=uv_project_path,
     )
@@ -34,7 +34,7 @@ def set_up_lint(uv_project_path: UvProjectPath) -> None:
     """All subsequent calls to `lint` should use `lint_path` as the working directory."""
     ruff_version = importlib.metadata.version(ruff.__name__)
     run_simple_program(
-        UV_PROGRAM,
+        uv_program(),
         ["add", "--offline", f"ruff=={ruff_version}"],
         cwd=uv_project_path,
     )
@@ -45,7 +45,7 @@ def set_up_run_unit_tests_and_coverage(uv_project_path: UvProjectPath) -> None:
     pytest_version = importlib.metadata.version("pytest")
     pytest_cov_version = importlib.metadata.version("pytest-cov")
     run_simple_program(
-        UV_PROGRAM,
+        uv_program(),
         [
             "add",
             "--offline",
@@ -0,0 +1,310 @@
+import contextlib
+import json
+import os
+import platform
+import tempfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from textwrap import dedent
+from typing import Annotated, TypedDict
+
+import typer
+from pl_run_program import run_simple_program
+from pl_tiny_clients.initialize_uv_project import UvProjectPath, initialize_uv_project
+from pl_user_io.display import display
+
+from pl_ci_cd._check import check
+from pl_ci_cd._constants import git_program
+from pl_ci_cd._ship import MAIN_BRANCH, ship
+from pl_ci_cd._trace import Tracer, tracing
+
+from ._set_up import (
+    set_up_formatter,
+    set_up_run_unit_tests_and_coverage,
+    set_up_type_check,
+)
+
+BENCHMARK_SIZES = (10, 1_000, 10_000)
+BENCHMARK_MODES = ("sequential", "parallel", "cached", "presync", "shard-tests")
+SHIP_BENCHMARK_MODES = ("ship-worktree", "ship-queue")
+_SYNTHETIC_PACKAGE = "synthetic"
+_MODULES_PER_PACKAGE = 100
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    modules: int
+    mode: str
+    # A stage label, or "check" for the whole run.
+    stage: str
+    seconds: float
+
+
+@dataclass(frozen=True)
+class Regression:
+    result: BenchmarkResult
+    baseline_seconds: float
+
+    def __str__(self) -> str:
+        result = self.result
+        return (
+            f"{result.stage} ({result.mode}, {result.modules} modules): "
+            f"{self.baseline_seconds:.2f}s -> {result.seconds:.2f}s"
+        )
+
+
+def benchmark(
+    output: Annotated[
+        Path, typer.Option(help="Where to write the results, as JSON.")
+    ] = Path("benchmark.json"),
+    size: Annotated[
+        list[int] | None,
+        typer.Option(
+            help=f"Number of modules in a synthetic project. Repeat for several sizes. Defaults to {', '.join(map(str, BENCHMARK_SIZES))}.",
+        ),
+    ] = None,
+    mode: Annotated[
+        list[str] | None,
+        typer.Option(
+            help=f"How `check` is run. Repeat for several modes. Defaults to all of: {', '.join(BENCHMARK_MODES)}.",
+        ),
+    ] = None,
+    baseline: Annotated[
+        Path | None,
+        typer.Option(
+            help="Results of an earlier run to compare against. Exits with an error if a stage got slower by more than `--tolerance`.",
+        ),
+    ] = None,
+    tolerance: Annotated[
+        float,
+        typer.Option(help="Allowed slowdown relative to the baseline, as a fraction."),
+    ] = 0.25,
+    ship_overhead: Annotated[
+        bool,
+        typer.Option(
+            help=f"Also time each phase of `ship --worktree` ({', '.join(SHIP_BENCHMARK_MODES)}) on a repository with as many files as each size, with `.ship/test` and `.ship/deploy` stubbed out.",
+        ),
+    ] = False,
+) -> None:
+    """Time each stage of `check` on synthetic projects of increasing size."""
+    results: list[BenchmarkResult] = []
+    for modules in size or BENCHMARK_SIZES:
+        with tempfile.TemporaryDirectory() as directory:
+            results += run_benchmark(
+                Path(directory) / "project", modules, tuple(mode or BENCHMARK_MODES)
+            )
+        if ship_overhead:
+            with tempfile.TemporaryDirectory() as directory:
+                results += run_ship_benchmark(Path(directory), modules)
+    write_results(output, results)
+    display(f"Wrote {len(results)} results to {output}.")
+
+    if baseline is not None:
+        regressions = compare_to_baseline(results, read_results(baseline), tolerance)
+        for regression in regressions:
+            display(f"Regression: {regression}")
+        if regressions:
+            raise typer.Exit(1)
+        display(f"No regressions against {baseline}.")
+
+
+def set_up_benchmark_project(project_path: Path, modules: int) -> UvProjectPath:
+    """
+    Create a uv project with `modules` modules, each fully covered by its own test, that passes every check.
+
+    Modules are grouped into packages of 100, and each imports the one before it, so type checking has
+    cross-module work to do.
+    """
+    uv_project_path = initialize_uv_project(project_path)
+    set_up_formatter(uv_project_path)
+    set_up_type_check(uv_project_path)
+    set_up_run_unit_tests_and_coverage(uv_project_path)
+
+    root = uv_project_path / _SYNTHETIC_PACKAGE
+    root.mkdir()
+    (root / "__init__.py").write_text("")
+    for index in range(modules):
+        package = root / f"pkg_{index // _MODULES_PER_PACKAGE}"
+        if index % _MODULES_PER_PACKAGE == 0:
+            package.mkdir()
+            (package / "__init__.py").write_text("")
+        (package / f"mod_{index}.py").write_text(_module_source(index))
+        (package / f"mod_{index}_test.py").write_text(_test_source(index))
+    return uv_project_path
+
+
+def run_benchmark(
+    project_path: Path, modules: int, modes: tuple[str, ...] = BENCHMARK_MODES
+) -> list[BenchmarkResult]:
+    """Time `check` and each of its stages on a synthetic project in each of `modes`."""
+    set_up_benchmark_project(project_path, modules)
+    results: list[BenchmarkResult] = []
+    for mode in modes:
+        tracer = Tracer()
+        if mode == "cached":
+            # Fill the cache first; only the run that finds every stage cached is timed.
+            check(directory=project_path)
+        with tracing(tracer):
+            check(directory=project_path, **_check_options(mode))
+        results += [
+            BenchmarkResult(modules, mode, span.name, span.duration)
+            for span in tracer.spans
+            if span.category == "check"
+        ]
+    return results
+
+
+def run_ship_benchmark(directory: Path, files: int) -> list[BenchmarkResult]:
+    """
+    Time each phase of shipping one worktree, plainly and through the merge queue, in a repository of `files` files.
+
+    `.ship/test` and `.ship/deploy` exit at once and pushes go to a bare repository in `directory`, so what is
+    timed is ship's own git and bookkeeping work.
+    """
+    repo = directory / "repo"
+    _set_up_ship_repo(repo, directory / "origin.git", files)
+    results: list[BenchmarkResult] = []
+    for mode in SHIP_BENCHMARK_MODES:
+        worktree = directory / mode
+        _git(repo, "worktree", "add", "-b", mode, str(worktree))
+        (worktree / f"{mode}.txt").write_text(f"{mode}\n")
+        tracer = Tracer()
+        # `git push` runs in the working directory.
+        with tracing(tracer), contextlib.chdir(repo):
+            ship(worktree=worktree, repo_dir=repo, queue=mode == "ship-queue")
+        results += [
+            BenchmarkResult(files, mode, span.name, span.duration)
+            for span in tracer.spans
+            if span.category == "ship"
+        ]
+    return results
+
+
+def write_results(path: Path, results: list[BenchmarkResult]) -> None:
+    path.write_text(
+        json.dumps(
+            {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "results": [asdict(result) for result in results],
+            },
+            indent=2,
+        )
+    )
+
+
+def read_results(path: Path) -> list[BenchmarkResult]:
+    return [
+        BenchmarkResult(**result) for result in json.loads(path.read_text())["results"]
+    ]
+
+
+def compare_to_baseline(
+    results: list[BenchmarkResult],
+    baseline: list[BenchmarkResult],
+    tolerance: float = 0.25,
+    noise_seconds: float = 0.1,
+) -> list[Regression]:
+    """
+    Results more than `tolerance` (a fraction) slower than the baseline.
+
+    Differences under `noise_seconds` are ignored, since short stages vary more than that between runs.
+    """
+    baseline_seconds = {
+        (result.modules, result.mode, result.stage): result.seconds
+        for result in baseline
+    }
+    regressions: list[Regression] = []
+    for result in results:
+        before = baseline_seconds.get((result.modules, result.mode, result.stage))
+        if (
+            before is not None
+            and result.seconds > before * (1 + tolerance)
+            and result.seconds - before >= noise_seconds
+        ):
+            regressions.append(Regression(result, before))
+    return regressions
+
+
+class _CheckOptions(TypedDict, total=False):
+    cache: bool
+    parallel: bool
+    presync: bool
+    shard_tests: bool
+
+
+def _check_options(mode: str) -> _CheckOptions:
+    options: dict[str, _CheckOptions] = {
+        "sequential": {"cache": False},
+        "parallel": {"cache": False, "parallel": True},
+        "cached": {},
+        "presync": {"cache": False, "presync": True},
+        "shard-tests": {"cache": False, "shard_tests": True},
+    }
+    return options[mode]
+
+
+def _set_up_ship_repo(repo: Path, origin: Path, files: int) -> None:
+    origin.mkdir(parents=True)
+    _git(origin, "init", "--bare", "-b", MAIN_BRANCH)
+    repo.mkdir()
+    _git(repo, "init", "-b", MAIN_BRANCH)
+    _git(repo, "config", "user.email", "benchmark@example.com")
+    _git(repo, "config", "user.name", "Benchmark")
+    for index in range(files):
+        directory = repo / f"dir_{index // _MODULES_PER_PACKAGE}"
+        directory.mkdir(exist_ok=True)
+        (directory / f"file_{index}.txt").write_text(f"{index}\n")
+    (repo / ".ship").mkdir()
+    for script in ("test", "deploy"):
+        (repo / ".ship" / script).write_text("#!/bin/sh\n")
+        (repo / ".ship" / script).chmod(0o755)
+    _git(repo, "add", "-A")
+    _git(repo, "commit", "-m", "initial")
+    _git(repo, "remote", "add", "origin", str(origin))
+    _git(repo, "push", "-u", "origin", MAIN_BRANCH)
+
+
+def _git(cwd: Path, *args: str) -> str:
+    return run_simple_program(git_program(), list(args), cwd=cwd)
+
+
+def _module_source(index: int) -> str:
+    if index % _MODULES_PER_PACKAGE == 0:
+        return dedent(f"""\
+            def value_{index}(x: int) -> int:
+                if x > {index}:
+                    return x - {index}
+                return x
+        """)
+    package = f"{_SYNTHETIC_PACKAGE}.pkg_{index // _MODULES_PER_PACKAGE}"
+    return dedent(f"""\
+        from {package}.mod_{index - 1} import value_{index - 1}
+
+
+        def value_{index}(x: int) -> int:
+            if x > {index}:
+                return x - {index}
+            return value_{index - 1}(x)
+    """)
+
+
+def _test_source(index: int) -> str:
+    package = f"{_SYNTHETIC_PACKAGE}.pkg_{index // _MODULES_PER_PACKAGE}"
+    return dedent(f"""\
+        from {package}.mod_{index} import value_{index}
+
+
+        def test_value_{index}() -> None:
+            assert value_{index}({index + 1}) == 1
+            assert value_{index}(0) == 0
+    """)
+
+
+def main() -> None:
+    typer.run(benchmark)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+from pathlib import Path
+
+from pl_ci_cd.testing.benchmark import (
+    BenchmarkResult,
+    Regression,
+    compare_to_baseline,
+    read_results,
+    run_benchmark,
+    run_ship_benchmark,
+    write_results,
+)
+
+from .constants import PYTEST_SLOW_MARKER
+
+
+def _result(stage: str, seconds: float) -> BenchmarkResult:
+    return BenchmarkResult(10, "sequential", stage, seconds)
+
+
+def test_results_round_trip(tmp_path: Path) -> None:
+    results = [_result("check", 1.5), _result("Formatter", 0.25)]
+
+    write_results(tmp_path / "results.json", results)
+
+    assert read_results(tmp_path / "results.json") == results
+
+
+def test_reports_stages_slower_than_the_baseline_by_more_than_the_tolerance() -> None:
+    baseline = [_result("check", 10.0), _result("Linter", 2.0)]
+    results = [_result("check", 12.4), _result("Linter", 2.6)]
+
+    assert compare_to_baseline(results, baseline, tolerance=0.25) == [
+        Regression(_result("Linter", 2.6), 2.0)
+    ]
+
+
+def test_ignores_differences_within_the_noise() -> None:
+    baseline = [_result("Formatter", 0.01)]
+    results = [_result("Formatter", 0.05)]
+
+    assert compare_to_baseline(results, baseline, noise_seconds=0.1) == []
+
+
+def test_ignores_results_missing_from_the_baseline() -> None:
+    assert compare_to_baseline([_result("check", 5.0)], []) == []
+
+
+def test_describes_regressions() -> None:
+    regression = Regression(_result("Linter", 2.6), 2.0)
+
+    assert str(regression) == "Linter (sequential, 10 modules): 2.00s -> 2.60s"
+
+
+@PYTEST_SLOW_MARKER
+def test_times_each_stage_of_check(tmp_path: Path) -> None:
+    results = run_benchmark(tmp_path / "project", 3, ("sequential", "cached"))
+
+    assert [(result.mode, result.stage) for result in results] == [
+        ("sequential", "check"),
+        ("sequential", "Formatter"),
+        ("sequential", "Linter"),
+        ("sequential", "Type checks"),
+        ("sequential", "Tests + Coverage"),
+        # Cached stages aren't run, so only the whole run is timed.
+        ("cached", "check"),
+    ]
+
+
+def test_times_each_phase_of_ship(tmp_path: Path) -> None:
+    results = run_ship_benchmark(tmp_path, 3)
+
+    assert [
+        (result.mode, result.stage)
+        for result in results
+        if result.stage in {"ship", "CI"}
+    ] == [
+        ("ship-worktree", "CI"),
+        ("ship-worktree", "ship"),
+        ("ship-queue", "CI"),
+        ("ship-queue", "ship"),
+    ]
+    assert all(result.modules == 3 for result in results)
@@ -0,0 +1,244 @@
+import os
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+from pl_run_program import run_simple_program
+
+from pl_ci_cd import _cache
+from pl_ci_cd._cache import CACHE_DIR_NAME, StageCache, StageInputs
+from pl_ci_cd._constants import git_program
+
+PYTHON_STAGE = StageInputs("python", frozenset({".py"}), ("ruff",))
+ALL_FILES_STAGE = StageInputs("all", None, ())
+
+
+def _set_up(tmp_path: Path) -> None:
+    (tmp_path / "module.py").write_text("x = 1\n")
+    (tmp_path / "data.txt").write_text("data\n")
+
+
+def _write_lock(tmp_path: Path, ruff_version: str) -> None:
+    (tmp_path / "uv.lock").write_text(
+        dedent(f"""\
+        [[package]]
+        name = "ruff"
+        version = "{ruff_version}"
+    """)
+    )
+
+
+def _age(path: Path, seconds: int) -> None:
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - seconds * 1_000_000_000))
+
+
+def test_key_is_stable_for_unchanged_inputs(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+
+    assert StageCache(tmp_path).key(PYTHON_STAGE) == StageCache(tmp_path).key(
+        PYTHON_STAGE
+    )
+
+
+def test_key_changes_when_a_selected_file_changes(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    before = StageCache(tmp_path).key(PYTHON_STAGE)
+
+    (tmp_path / "module.py").write_text("x = 2\n")
+
+    assert StageCache(tmp_path).key(PYTHON_STAGE) != before
+
+
+def test_key_ignores_files_outside_the_stage_suffixes(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    python_before = StageCache(tmp_path).key(PYTHON_STAGE)
+    all_before = StageCache(tmp_path).key(ALL_FILES_STAGE)
+
+    (tmp_path / "data.txt").write_text("other data\n")
+
+    assert StageCache(tmp_path).key(PYTHON_STAGE) == python_before
+    assert StageCache(tmp_path).key(ALL_FILES_STAGE) != all_before
+
+
+def test_key_ignores_coverage_data(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    before = StageCache(tmp_path).key(ALL_FILES_STAGE)
+
+    (tmp_path / ".coverage").write_text("coverage data")
+
+    assert StageCache(tmp_path).key(ALL_FILES_STAGE) == before
+
+
+def test_key_changes_when_locked_tool_version_changes(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    _write_lock(tmp_path, "0.15.1")
+    before = StageCache(tmp_path).key(PYTHON_STAGE)
+
+    _write_lock(tmp_path, "0.15.2")
+
+    assert StageCache(tmp_path).key(PYTHON_STAGE) != before
+
+
+def test_key_changes_when_a_path_dependency_changes(tmp_path: Path) -> None:
+    project, sibling = tmp_path / "project", tmp_path / "sibling"
+    project.mkdir()
+    sibling.mkdir()
+    (project / "module.py").write_text("x = 1\n")
+    (sibling / "library.py").write_text("y = 1\n")
+    (tmp_path / "library.whl").write_text("wheel\n")
+    (project / "uv.lock").write_text(
+        dedent("""\
+        [[package]]
+        name = "project"
+        source = { editable = "." }
+
+        [[package]]
+        name = "sibling"
+        source = { editable = "../sibling" }
+
+        [[package]]
+        name = "wheel"
+        source = { path = "../library.whl" }
+
+        [[package]]
+        name = "gone"
+        source = { directory = "../gone" }
+
+        [[package]]
+        name = "ruff"
+        source = { registry = "https://pypi.org/simple" }
+    """)
+    )
+    stage = StageInputs("python", None, (), path_dependencies=True)
+    before = StageCache(project).key(stage)
+    without_dependencies = StageCache(project).key(ALL_FILES_STAGE)
+
+    (sibling / "library.py").write_text("y = 2\n")
+    after_sibling = StageCache(project).key(stage)
+    (tmp_path / "library.whl").write_text("rebuilt\n")
+
+    assert len({before, after_sibling, StageCache(project).key(stage)}) == 3
+    assert StageCache(project).key(ALL_FILES_STAGE) == without_dependencies
+
+
+def test_key_changes_when_a_named_file_changes(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    stage = StageInputs("python", frozenset({".py"}), (), (".python-version",))
+    missing = StageCache(tmp_path).key(stage)
+
+    (tmp_path / ".python-version").write_text("3.12\n")
+    old_python = StageCache(tmp_path).key(stage)
+    (tmp_path / ".python-version").write_text("3.13\n")
+
+    assert len({missing, old_python, StageCache(tmp_path).key(stage)}) == 3
+
+
+def test_index_is_replaced_whole(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+
+    StageCache(tmp_path).key(PYTHON_STAGE)
+
+    assert sorted(path.name for path in (tmp_path / CACHE_DIR_NAME).iterdir()) == [
+        ".gitignore",
+        "index.json",
+    ]
+
+
+def test_key_differs_per_stage(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    other_stage = StageInputs("other", PYTHON_STAGE.suffixes, PYTHON_STAGE.tools)
+
+    assert StageCache(tmp_path).key(PYTHON_STAGE) != StageCache(tmp_path).key(
+        other_stage
+    )
+
+
+def test_unchanged_stat_reuses_stored_digest(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    module = tmp_path / "module.py"
+    _age(module, 60)
+    before = StageCache(tmp_path).key(PYTHON_STAGE)
+    stat = module.stat()
+
+    # Same size and mtime: like git's index, the file is not read again.
+    module.write_text("x = 2\n")
+    os.utime(module, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert StageCache(tmp_path).key(PYTHON_STAGE) == before
+
+
+def test_recently_modified_files_are_always_rehashed(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    module = tmp_path / "module.py"
+    before = StageCache(tmp_path).key(PYTHON_STAGE)
+    stat = module.stat()
+
+    module.write_text("x = 2\n")
+    os.utime(module, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert StageCache(tmp_path).key(PYTHON_STAGE) != before
+
+
+def test_corrupt_index_is_ignored(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    before = StageCache(tmp_path).key(PYTHON_STAGE)
+
+    (tmp_path / CACHE_DIR_NAME / "index.json").write_text("not json")
+
+    assert StageCache(tmp_path).key(PYTHON_STAGE) == before
+
+
+def test_records_passes_persistently(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    key = StageCache(tmp_path).key(PYTHON_STAGE)
+    assert not StageCache(tmp_path).has_passed(key)
+
+    StageCache(tmp_path).record_pass(key, PYTHON_STAGE)
+
+    assert StageCache(tmp_path).has_passed(key)
+    assert not StageCache(tmp_path).has_passed(
+        StageCache(tmp_path).key(ALL_FILES_STAGE)
+    )
+    assert (tmp_path / CACHE_DIR_NAME / ".gitignore").read_text() == "*\n"
+
+
+def test_evicts_entries_older_than_max_age(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    cache = StageCache(tmp_path)
+    cache.record_pass(cache.key(PYTHON_STAGE), PYTHON_STAGE)
+    _age(
+        tmp_path / CACHE_DIR_NAME / "passes" / cache.key(PYTHON_STAGE),
+        _cache.MAX_ENTRY_AGE_SECONDS + 60,
+    )
+
+    cache.record_pass(cache.key(ALL_FILES_STAGE), ALL_FILES_STAGE)
+
+    assert not cache.has_passed(cache.key(PYTHON_STAGE))
+    assert cache.has_passed(cache.key(ALL_FILES_STAGE))
+
+
+def test_evicts_oldest_entries_beyond_max_entries(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(_cache, "MAX_ENTRIES", 1)
+    _set_up(tmp_path)
+    cache = StageCache(tmp_path)
+    cache.record_pass(cache.key(PYTHON_STAGE), PYTHON_STAGE)
+    _age(tmp_path / CACHE_DIR_NAME / "passes" / cache.key(PYTHON_STAGE), 60)
+
+    cache.record_pass(cache.key(ALL_FILES_STAGE), ALL_FILES_STAGE)
+
+    assert not cache.has_passed(cache.key(PYTHON_STAGE))
+    assert cache.has_passed(cache.key(ALL_FILES_STAGE))
+
+
+def test_uses_git_to_skip_ignored_files(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    run_simple_program(git_program(), ["init"], cwd=tmp_path)
+    (tmp_path / ".gitignore").write_text("ignored.py\n")
+    before = StageCache(tmp_path).key(PYTHON_STAGE)
+
+    (tmp_path / "ignored.py").write_text("y = 1\n")
+
+    assert StageCache(tmp_path).key(PYTHON_STAGE) == before
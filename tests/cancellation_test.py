@@ -0,0 +1,163 @@
+import asyncio
+import contextlib
+import os
+import signal
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from pl_run_program import ProgramResult, program_at_path
+
+from pl_ci_cd._cancellation import (
+    CancellationScope,
+    cancellation_scope,
+    run_cancellable_program,
+    run_cancellable_program_async,
+)
+
+SLEEP_PROGRAM = program_at_path(Path("/usr/bin/sleep"))
+SHELL_PROGRAM = program_at_path(Path("/bin/sh"))
+# `sleep` is the shell's grandchild here, and holds the output pipe open until it is killed too.
+GRANDCHILD_ARGS = ["-c", "sleep 30 | cat"]
+
+
+def test_returns_output_and_return_code_like_run_program(tmp_path: Path) -> None:
+    (tmp_path / "file.txt").write_text("")
+
+    result = run_cancellable_program(
+        program_at_path(Path("/usr/bin/ls")), ["file.txt"], cwd=tmp_path
+    )
+
+    assert result == ProgramResult(stdout="file.txt\n", stderr="", returncode=0)
+
+
+def test_cancel_kills_running_programs() -> None:
+    scope = CancellationScope()
+    results: list[ProgramResult] = []
+
+    def _sleep() -> None:
+        with cancellation_scope(scope):
+            results.append(run_cancellable_program(SLEEP_PROGRAM, ["30"]))
+
+    thread = threading.Thread(target=_sleep)
+    thread.start()
+    while not scope.has_running_programs():
+        time.sleep(0.01)
+    scope.cancel()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert results[0].returncode < 0
+
+
+def test_cancel_kills_the_programs_children_too() -> None:
+    scope = CancellationScope()
+    results: list[ProgramResult] = []
+
+    def _sleep() -> None:
+        with cancellation_scope(scope):
+            results.append(run_cancellable_program(SHELL_PROGRAM, GRANDCHILD_ARGS))
+
+    thread = threading.Thread(target=_sleep)
+    thread.start()
+    while not scope.has_running_programs():
+        time.sleep(0.01)
+    time.sleep(0.2)
+    scope.cancel()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert results[0].returncode < 0
+
+
+def _interrupt_once_written(pid_file: Path) -> None:
+    """Send this process Ctrl-C's SIGINT once the program has written its child's pid."""
+    while not pid_file.exists() or not pid_file.read_text().strip():
+        time.sleep(0.01)
+    os.kill(os.getpid(), signal.SIGINT)
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        # "<pid> (<name>) <state> ...", where a zombie's state is "Z".
+        return Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_ctrl_c_kills_the_program_and_its_children(tmp_path: Path) -> None:
+    pid_file = tmp_path / "pid"
+    interrupter = threading.Thread(target=_interrupt_once_written, args=(pid_file,))
+    interrupter.start()
+
+    with pytest.raises(KeyboardInterrupt):
+        run_cancellable_program(
+            SHELL_PROGRAM, ["-c", f"sleep 30 & echo $! > {pid_file}; wait"]
+        )
+    interrupter.join()
+
+    pid = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while _is_running(pid) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not _is_running(pid)
+
+
+def test_programs_started_after_cancel_are_killed_immediately() -> None:
+    scope = CancellationScope()
+    scope.cancel()
+
+    with cancellation_scope(scope):
+        result = run_cancellable_program(SLEEP_PROGRAM, ["30"])
+
+    assert result.returncode < 0
+
+
+def test_programs_outside_the_scope_are_not_killed() -> None:
+    scope = CancellationScope()
+    with cancellation_scope(scope):
+        pass
+    scope.cancel()
+
+    result = run_cancellable_program(SLEEP_PROGRAM, ["0"])
+
+    assert result.returncode == 0
+
+
+def test_async_returns_output_and_return_code(tmp_path: Path) -> None:
+    (tmp_path / "file.txt").write_text("")
+
+    result = asyncio.run(
+        run_cancellable_program_async(
+            program_at_path(Path("/usr/bin/ls")), ["file.txt"], cwd=tmp_path
+        )
+    )
+
+    assert result == ProgramResult(stdout="file.txt\n", stderr="", returncode=0)
+
+
+def test_cancelling_the_scope_kills_async_programs() -> None:
+    scope = CancellationScope()
+    scope.cancel()
+
+    async def _sleep() -> ProgramResult:
+        with cancellation_scope(scope):
+            return await run_cancellable_program_async(SLEEP_PROGRAM, ["30"])
+
+    assert asyncio.run(_sleep()).returncode < 0
+
+
+def test_cancelling_the_task_kills_the_async_programs_children_too() -> None:
+    async def _cancel_after_start() -> float:
+        task = asyncio.create_task(
+            run_cancellable_program_async(SHELL_PROGRAM, GRANDCHILD_ARGS)
+        )
+        await asyncio.sleep(0.2)
+        start = time.monotonic()
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        return time.monotonic() - start
+
+    assert asyncio.run(_cancel_after_start()) < 5
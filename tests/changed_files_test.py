@@ -0,0 +1,122 @@
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+from pl_run_program import SimpleProgramError, run_simple_program
+
+from pl_ci_cd._changed_files import changed_python_files
+from pl_ci_cd._constants import git_program
+
+PYPROJECT = dedent("""\
+    [project]
+    name = "example"
+
+    [tool.ruff]
+    line-length = 88
+""")
+
+
+def _git(cwd: Path, *args: str) -> str:
+    return run_simple_program(git_program(), list(args), cwd=cwd)
+
+
+def _set_up(tmp_path: Path) -> None:
+    (tmp_path / "pyproject.toml").write_text(PYPROJECT)
+    (tmp_path / "unchanged.py").write_text("x = 1\n")
+    (tmp_path / "modified.py").write_text("x = 1\n")
+    (tmp_path / "deleted.py").write_text("x = 1\n")
+    _git(tmp_path, "init", "-b", "main")
+    _git(tmp_path, "add", "-A")
+    _git(
+        tmp_path,
+        "-c",
+        "user.name=Test",
+        "-c",
+        "user.email=t@example.com",
+        "commit",
+        "-m",
+        "initial",
+    )
+
+
+def test_returns_modified_and_untracked_python_files(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "modified.py").write_text("x = 2\n")
+    (tmp_path / "untracked.py").write_text("x = 1\n")
+    (tmp_path / "notes.txt").write_text("not python\n")
+    (tmp_path / "deleted.py").unlink()
+
+    assert changed_python_files(tmp_path, "HEAD") == [
+        Path("modified.py"),
+        Path("untracked.py"),
+    ]
+
+
+def test_includes_files_committed_since_the_ref(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "modified.py").write_text("x = 2\n")
+    _git(
+        tmp_path,
+        "-c",
+        "user.name=Test",
+        "-c",
+        "user.email=t@example.com",
+        "commit",
+        "-am",
+        "change",
+    )
+
+    assert changed_python_files(tmp_path, "HEAD~1") == [Path("modified.py")]
+
+
+def test_paths_are_relative_to_directory(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "pyproject.toml").write_text(PYPROJECT)
+    (project / "module.py").write_text("x = 1\n")
+    (tmp_path / "modified.py").write_text("x = 2\n")
+
+    assert changed_python_files(project, "HEAD") == [Path("module.py")]
+
+
+def test_returns_none_when_ruff_config_changes(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "pyproject.toml").write_text(
+        PYPROJECT.replace("line-length = 88", "line-length = 100")
+    )
+
+    assert changed_python_files(tmp_path, "HEAD") is None
+
+
+def test_ignores_pyproject_changes_outside_ruff_config(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "pyproject.toml").write_text(
+        PYPROJECT.replace('name = "example"', 'name = "renamed"')
+    )
+
+    assert changed_python_files(tmp_path, "HEAD") == []
+
+
+def test_returns_none_when_extended_ruff_config_is_added(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "copied").mkdir()
+    (tmp_path / "copied" / "pyproject.toml").write_text(PYPROJECT)
+    _git(tmp_path, "add", "-A")
+
+    assert changed_python_files(tmp_path, "HEAD") is None
+
+
+def test_returns_none_when_ruff_toml_changes(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "ruff.toml").write_text("line-length = 100\n")
+    _git(tmp_path, "add", "-A")
+
+    assert changed_python_files(tmp_path, "HEAD") is None
+
+
+def test_raises_for_unknown_ref(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+
+    with pytest.raises(SimpleProgramError):
+        changed_python_files(tmp_path, "no-such-ref")
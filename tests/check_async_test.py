@@ -0,0 +1,199 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import pytest
+from pl_run_program import program_at_path
+
+from pl_ci_cd._check_async import check_async
+from pl_ci_cd._check_format import FormatCheckError, check_format, check_format_async
+from pl_ci_cd._check_types import TypeCheckError, check_types_async
+from pl_ci_cd._failed_tests import load_failed_tests
+from pl_ci_cd._fix import fix
+from pl_ci_cd._lint import lint, lint_async
+from pl_ci_cd._pyright_session import PyrightSession, TypeDiagnostic
+from pl_ci_cd._run_unit_tests_and_coverage import (
+    CoverageOrTestsError,
+    run_unit_tests_and_coverage_async,
+)
+from pl_ci_cd._tool_environment import ToolCommand, ToolEnvironment
+from pl_ci_cd._trace import Tracer, tracing
+
+SH_PROGRAM = program_at_path(Path("/bin/sh"))
+# Prints no lint diagnostics for `ruff check` and nothing for `ruff format`.
+PASSING_RUFF = "if [ $1 = check ]; then echo '[]'; fi"
+
+
+@dataclass(frozen=True)
+class _ShellTools(ToolEnvironment):
+    """Runs a shell script in place of each tool, with the tool's arguments as `$1`, `$2`, and so on."""
+
+    scripts: tuple[tuple[str, str], ...] = ()
+
+    def command(self, tool: str, args: list[str], directory: Path) -> ToolCommand:
+        del directory
+        script = dict(self.scripts).get(tool, "exit 0")
+        return ToolCommand(SH_PROGRAM, ["-c", script, tool, *args], {})
+
+
+def _tools(**scripts: str) -> _ShellTools:
+    return _ShellTools(scripts=tuple({"ruff": PASSING_RUFF, **scripts}.items()))
+
+
+def _project(tmp_path: Path) -> Path:
+    (tmp_path / "pyproject.toml").write_text("")
+    return tmp_path
+
+
+def test_runs_each_check_in_order(tmp_path: Path) -> None:
+    tracer = Tracer()
+
+    with tracing(tracer):
+        asyncio.run(check_async(_project(tmp_path), tools=_tools()))
+
+    assert [span.name for span in tracer.spans] == [
+        "Formatter",
+        "Linter",
+        "Type checks",
+        "Tests + Coverage",
+    ]
+
+
+def test_fix_fixes_before_the_other_checks(tmp_path: Path) -> None:
+    tracer = Tracer()
+
+    with tracing(tracer):
+        asyncio.run(
+            check_async(_project(tmp_path), fix=True, parallel=True, tools=_tools())
+        )
+
+    assert tracer.spans[0].name == "Fixer"
+    assert {span.name for span in tracer.spans[1:]} == {
+        "Type checks",
+        "Tests + Coverage",
+    }
+
+
+def test_raises_lint_failures(tmp_path: Path) -> None:
+    diagnostic = (
+        '[{"filename": "a.py", "location": {"row": 1, "column": 1}, '
+        '"end_location": {"row": 1, "column": 2}, "code": "F821", '
+        '"message": "Undefined name", "fix": null}]'
+    )
+    tools = _tools(ruff=f"if [ $1 = check ]; then echo '{diagnostic}'; exit 1; fi")
+
+    with pytest.raises(RuntimeError, match="Linting failed. Output:\na.py:1:1: F821"):
+        asyncio.run(check_async(_project(tmp_path), tools=tools))
+
+    with pytest.raises(RuntimeError, match="Linting failed"):
+        asyncio.run(check_async(_project(tmp_path), fix=True, tools=tools))
+
+
+def test_parallel_kills_the_other_checks_at_the_first_failure(tmp_path: Path) -> None:
+    pid_file = tmp_path / "pid"
+    tools = _tools(
+        # Fails only once the tests are running, so there is something to kill.
+        pyright=f"until [ -s {pid_file} ]; do sleep 0.01; done; echo 'error: bad type'; exit 1",
+        pytest=f"echo $$ > {pid_file}; exec sleep 30",
+    )
+    start = time.monotonic()
+
+    with pytest.raises(TypeCheckError, match="error: bad type"):
+        asyncio.run(check_async(_project(tmp_path), parallel=True, tools=tools))
+
+    assert time.monotonic() - start < 10
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid_file.read_text()), 0)
+
+
+def test_cancelling_kills_the_running_program(tmp_path: Path) -> None:
+    pid_file = tmp_path / "pid"
+    tools = _tools(pytest=f"echo $$ > {pid_file}; exec sleep 30")
+
+    def _wait_for_tests_to_start() -> None:
+        while not pid_file.exists() or not pid_file.read_text():
+            time.sleep(0.01)
+
+    async def _cancel_once_tests_start() -> None:
+        task = asyncio.create_task(check_async(_project(tmp_path), tools=tools))
+        await asyncio.to_thread(_wait_for_tests_to_start)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(_cancel_once_tests_start())
+
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid_file.read_text()), 0)
+
+
+def test_formatting_failures_raise(tmp_path: Path) -> None:
+    tools = _tools(ruff="echo 'error: Failed to parse a.py' >&2; exit 2")
+
+    with pytest.raises(FormatCheckError, match="Formatting failed"):
+        asyncio.run(check_format_async(tmp_path, fix=True, tools=tools))
+
+
+def test_nothing_runs_for_no_paths(tmp_path: Path) -> None:
+    tools = _tools(ruff="exit 2")
+
+    async def _check_no_paths() -> bool:
+        await check_format_async(tmp_path, fix=False, paths=[], tools=tools)
+        return (await lint_async(tmp_path, paths=[], tools=tools)).passed
+
+    assert asyncio.run(_check_no_paths())
+
+
+def test_the_sync_api_works_inside_a_running_event_loop(tmp_path: Path) -> None:
+    (tmp_path / "a.py").write_text("x = 1\n")
+    tools = _tools()
+
+    async def _check_from_a_coroutine() -> bool:
+        check_format(tmp_path, fix=False, tools=tools)
+        return (
+            lint(tmp_path, tools=tools).passed
+            and fix(tmp_path, tools=tools).lint.passed
+        )
+
+    assert asyncio.run(_check_from_a_coroutine())
+
+
+def test_test_failures_raise(tmp_path: Path) -> None:
+    tools = _tools(pytest="echo '1 failed'; exit 1")
+
+    with pytest.raises(CoverageOrTestsError, match="1 failed"):
+        asyncio.run(run_unit_tests_and_coverage_async(tmp_path, tools))
+
+
+def test_test_failures_are_remembered(tmp_path: Path) -> None:
+    (tmp_path / "a_test.py").write_text("")
+    report = (
+        '<testsuites><testcase file="a_test.py" classname="a_test" name="test_a">'
+        "<failure /></testcase></testsuites>"
+    )
+    tools = _tools(pytest=f"echo '{report}' > ${{4#--junitxml=}}; exit 1")
+
+    with pytest.raises(CoverageOrTestsError):
+        asyncio.run(run_unit_tests_and_coverage_async(tmp_path, tools))
+
+    assert load_failed_tests(tmp_path) == ["a_test.py::test_a"]
+
+
+class _FakeSession(PyrightSession):
+    def __init__(self, diagnostics: list[TypeDiagnostic]) -> None:
+        super().__init__(Path())
+        self._fake_diagnostics = diagnostics
+
+    def diagnostics(self) -> list[TypeDiagnostic]:
+        return self._fake_diagnostics
+
+
+def test_type_checks_through_a_session(tmp_path: Path) -> None:
+    error = TypeDiagnostic(Path("a.py"), 1, 1, "error", "Bad type", None)
+    warning = TypeDiagnostic(Path("a.py"), 2, 1, "warning", "Unused", None)
+
+    asyncio.run(check_types_async(tmp_path, session=_FakeSession([warning])))
+    with pytest.raises(TypeCheckError, match="1 error"):
+        asyncio.run(check_types_async(tmp_path, session=_FakeSession([error, warning])))
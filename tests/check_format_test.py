@@ -43,3 +43,20 @@ def test_check_format_check_fails_for_unformatted_code(tmp_path: Path) -> None:
         check_format(tmp_path, False)
 
     assert "Format check failed" in str(exc_info.value)
+
+
+def test_check_format_only_checks_given_paths(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "formatted.py").write_text("x = 1 + 2\n")
+    (tmp_path / "unformatted.py").write_text("x=1+2")
+
+    check_format(tmp_path, False, paths=[Path("formatted.py")])
+
+
+def test_check_format_does_nothing_for_no_paths(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "unformatted.py").write_text("x=1+2")
+
+    check_format(tmp_path, True, paths=[])
+
+    assert (tmp_path / "unformatted.py").read_text() == "x=1+2"
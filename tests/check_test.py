@@ -1,18 +1,45 @@
 import contextlib
+import json
 from pathlib import Path
 from textwrap import dedent
 
 import pytest
-from pl_mocks_and_fakes import mock_for
-from pl_user_io.testing import assert_displayed, assert_loading_spinner_displayed
+from pl_mocks_and_fakes import mock_for, stub
+from pl_run_program import ProgramResult, run_simple_program
+from pl_user_io.testing import (
+    assert_displayed,
+    assert_displayed_in_order,
+    assert_loading_spinner_displayed,
+    assert_not_displayed,
+    user_io_fake,
+)
 
+from pl_ci_cd import _check
+from pl_ci_cd._cache import CACHE_DIR_NAME
 from pl_ci_cd._check import check
 from pl_ci_cd._check_format import FormatCheckError
 from pl_ci_cd._check_types import TypeCheckError, check_types
+from pl_ci_cd._constants import git_program
+from pl_ci_cd._failed_tests import load_failed_tests, record_failed_tests
+from pl_ci_cd._monorepo import run_project_check
+from pl_ci_cd._resources import DEFAULT_STAGE_WEIGHTS, ResourceConfigError, Resources
 from pl_ci_cd._run_unit_tests_and_coverage import (
     CoverageOrTestsError,
+    run_failed_tests,
     run_unit_tests_and_coverage,
 )
+from pl_ci_cd._sharded_tests import (
+    collect_test_ids,
+    combine_coverage,
+    run_pytest_shard,
+)
+from pl_ci_cd._stages import Stage
+from pl_ci_cd._test_impact import (
+    IMPACT_MAP_NAME,
+    export_coverage,
+    run_pytest_with_test_contexts,
+)
+from pl_ci_cd._tool_environment import UV_RUN, ToolEnvironment
 from pl_ci_cd.testing._set_up import set_up_check
 
 
@@ -62,7 +89,9 @@ def test_lints_code_when_fix_true(tmp_path: Path) -> None:
     check(fix=True, directory=tmp_path)
 
     assert_loading_spinner_displayed("Linter")
-    assert (tmp_path / "test.py").read_text() == "\nx = 1\n"
+    # Formatted after the fix, rather than left with the blank line the removed import leaves.
+    assert (tmp_path / "test.py").read_text() == "x = 1\n"
+    assert_displayed("Fixed 1 file(s): test.py")
 
 
 def test_checks_format_when_fix_false__pass(tmp_path: Path) -> None:
@@ -123,7 +152,7 @@ def test_passes_project_directory_to_type_checks(tmp_path: Path) -> None:
 
     check(fix=True, directory=tmp_path)
 
-    mock_for(check_types).assert_called_once_with(tmp_path)
+    mock_for(check_types).assert_called_once_with(tmp_path, UV_RUN)
 
 
 def test_checks_types__pass(tmp_path: Path) -> None:
@@ -153,7 +182,7 @@ def test_passes_project_directory_to_pytest(tmp_path: Path) -> None:
 
     check(fix=True, directory=tmp_path)
 
-    mock_for(run_unit_tests_and_coverage).assert_called_once_with(tmp_path)
+    mock_for(run_unit_tests_and_coverage).assert_called_once_with(tmp_path, UV_RUN)
 
 
 def test_runs_pytest__pass(tmp_path: Path) -> None:
@@ -187,3 +216,354 @@ def test_runs_pytest__fail(tmp_path: Path) -> None:
         check(fix=True, directory=tmp_path)
 
     assert_displayed("✗ Tests + Coverage")
+
+
+def test_runs_tests_that_failed_last_time_first(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "a_test.py").write_text("def test_a():\n    assert False\n")
+    record_failed_tests(tmp_path, ["a_test.py::test_a"])
+    stub(run_failed_tests)(ProgramResult("1 failed", "", 1))
+
+    with pytest.raises(CoverageOrTestsError, match="failed last time still fail"):
+        check(fix=True, directory=tmp_path)
+
+    assert_displayed("Re-running 1 test(s) that failed last time.")
+    mock_for(run_failed_tests).assert_called_once_with(
+        tmp_path, UV_RUN, ["a_test.py::test_a"]
+    )
+    mock_for(run_unit_tests_and_coverage).assert_not_called()
+
+
+def test_runs_every_test_once_the_failed_ones_pass(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "a_test.py").write_text("def test_a():\n    assert True\n")
+    record_failed_tests(tmp_path, ["a_test.py::test_a", "gone_test.py::test_b"])
+    stub(run_failed_tests)(ProgramResult("1 passed", "", 0))
+
+    check(fix=True, directory=tmp_path)
+
+    mock_for(run_failed_tests).assert_called_once_with(
+        tmp_path, UV_RUN, ["a_test.py::test_a"]
+    )
+    mock_for(run_unit_tests_and_coverage).assert_called_once_with(tmp_path, UV_RUN)
+    assert load_failed_tests(tmp_path) == []
+
+
+@pytest.mark.parametrize("returncode", [4, 5])
+def test_runs_every_test_when_the_failed_ones_no_longer_exist(
+    tmp_path: Path, returncode: int
+) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "a_test.py").write_text("def test_renamed():\n    assert True\n")
+    record_failed_tests(tmp_path, ["a_test.py::test_a"])
+    stub(run_failed_tests)(
+        ProgramResult("", "not found: a_test.py::test_a", returncode)
+    )
+
+    check(fix=True, directory=tmp_path)
+
+    assert_displayed("Tests that failed last time no longer exist. Running every test.")
+    mock_for(run_unit_tests_and_coverage).assert_called_once_with(tmp_path, UV_RUN)
+    assert load_failed_tests(tmp_path) == []
+
+
+def test_parallel__pass(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("x = 1 + 2\n")
+
+    check(directory=tmp_path, parallel=True)
+
+    assert_displayed(
+        "Running in parallel: Formatter, Linter, Type checks, Tests + Coverage"
+    )
+    assert_loading_spinner_displayed("Formatter")
+    assert_loading_spinner_displayed("Linter")
+    assert_loading_spinner_displayed("Type checks")
+    assert_loading_spinner_displayed("Tests + Coverage")
+
+
+def test_parallel__fail(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("x=1+2\n")
+
+    with pytest.raises(FormatCheckError):
+        check(directory=tmp_path, parallel=True)
+
+    assert_displayed("✗ Formatter")
+
+
+def test_parallel_with_fix_formats_and_lints_before_other_checks(
+    tmp_path: Path,
+) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("import os\nx=1+2\n")
+
+    check(fix=True, directory=tmp_path, parallel=True)
+
+    assert_displayed_in_order(
+        "✓ Formatter",
+        "✓ Linter",
+        "Running in parallel: Type checks, Tests + Coverage",
+    )
+    assert (tmp_path / "test.py").read_text() == "x = 1 + 2\n"
+
+
+def test_rejects_an_invalid_resource_budget(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    pyproject = tmp_path / "pyproject.toml"
+    pyproject.write_text(
+        pyproject.read_text() + "\n[tool.pl-ci-cd.resources]\ncpus = 0\n"
+    )
+
+    with pytest.raises(ResourceConfigError, match="`cpus`"):
+        check(directory=tmp_path, parallel=True)
+
+
+def test_skips_checks_that_already_passed_for_the_same_inputs(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("x = 1 + 2\n")
+    check(directory=tmp_path)
+
+    check(directory=tmp_path)
+
+    assert_displayed("✓ Formatter (cached pass)")
+    assert_displayed("✓ Linter (cached pass)")
+    assert_displayed("✓ Type checks (cached pass)")
+    assert_displayed("✓ Tests + Coverage (cached pass)")
+    mock_for(check_types).assert_called_once_with(tmp_path, UV_RUN)
+
+
+def test_reruns_checks_when_inputs_change(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("x = 1 + 2\n")
+    check(directory=tmp_path)
+
+    (tmp_path / "test.py").write_text("x=1+2\n")
+
+    with pytest.raises(FormatCheckError):
+        check(directory=tmp_path)
+
+
+def test_does_not_cache_failures(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    mock_for(check_types).side_effect = TypeCheckError("Type check failed")
+    with pytest.raises(TypeCheckError):
+        check(directory=tmp_path)
+
+    with pytest.raises(TypeCheckError):
+        check(directory=tmp_path)
+
+    assert mock_for(check_types).call_count == 2
+
+
+def test_no_cache_reruns_every_check(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    check(directory=tmp_path)
+
+    check(directory=tmp_path, cache=False)
+
+    assert_not_displayed("cached pass")
+    assert mock_for(check_types).call_count == 2
+
+
+def test_fix_caches_the_fixed_result(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("x=1+2\n")
+    check(fix=True, directory=tmp_path)
+
+    check(directory=tmp_path)
+
+    assert_displayed("✓ Formatter (cached pass)")
+
+
+def test_parallel_skips_cached_passes(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    check(directory=tmp_path)
+    user_io_fake().clear_output()
+
+    check(directory=tmp_path, parallel=True)
+
+    assert_not_displayed("Running in parallel")
+    assert_displayed("✓ Tests + Coverage (cached pass)")
+
+
+def _commit_all(tmp_path: Path) -> None:
+    run_simple_program(git_program(), ["init"], cwd=tmp_path)
+    run_simple_program(git_program(), ["add", "-A"], cwd=tmp_path)
+    run_simple_program(
+        git_program(),
+        [
+            "-c",
+            "user.name=Test",
+            "-c",
+            "user.email=t@example.com",
+            "commit",
+            "-m",
+            "initial",
+        ],
+        cwd=tmp_path,
+    )
+
+
+def test_since_only_checks_changed_files(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "old.py").write_text("x=1+2\n")
+    _commit_all(tmp_path)
+    (tmp_path / "new.py").write_text("y = 1 + 2\n")
+
+    check(directory=tmp_path, since="HEAD")
+
+    assert_displayed("1 Python file(s) changed since HEAD.")
+    assert (tmp_path / "old.py").read_text() == "x=1+2\n"
+
+
+def test_since_fails_for_changed_files(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    _commit_all(tmp_path)
+    (tmp_path / "new.py").write_text("y=1+2\n")
+
+    with pytest.raises(FormatCheckError):
+        check(directory=tmp_path, since="HEAD")
+
+
+def test_since_does_not_cache_partial_passes(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "old.py").write_text("x=1+2\n")
+    _commit_all(tmp_path)
+    check(directory=tmp_path, since="HEAD")
+
+    with pytest.raises(FormatCheckError):
+        check(directory=tmp_path)
+
+
+def test_since_checks_every_file_when_ruff_config_changes(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "old.py").write_text("x=1+2\n")
+    _commit_all(tmp_path)
+    with (tmp_path / "pyproject.toml").open("a") as pyproject:
+        pyproject.write("\n[tool.ruff]\nline-length = 100\n")
+
+    with pytest.raises(FormatCheckError):
+        check(directory=tmp_path, since="HEAD")
+
+    assert_displayed("Ruff configuration changed since HEAD, checking every file.")
+
+
+def test_presync_runs_tools_from_the_synced_environment(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("x=1+2\n")
+
+    check(fix=True, directory=tmp_path, presync=True)
+
+    assert_loading_spinner_displayed("Environment")
+    assert (tmp_path / "test.py").read_text() == "x = 1 + 2\n"
+    mock_for(check_types).assert_called_once_with(
+        tmp_path, ToolEnvironment(tmp_path / ".venv")
+    )
+
+
+def test_test_impact_runs_tests_through_the_impact_map(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    stub(export_coverage)(json.dumps({"meta": {"branch_coverage": False}, "files": {}}))
+
+    check(fix=True, directory=tmp_path, test_impact=True)
+
+    assert_displayed("No per-test coverage is recorded, running every test.")
+    mock_for(run_pytest_with_test_contexts).assert_called_once_with(
+        tmp_path, UV_RUN, None
+    )
+    mock_for(run_unit_tests_and_coverage).assert_not_called()
+    assert (tmp_path / CACHE_DIR_NAME / IMPACT_MAP_NAME).exists()
+
+
+def test_shard_tests_runs_tests_in_shards(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    stub(collect_test_ids)(
+        ProgramResult(
+            "a_test.py::test_1\na_test.py::test_2\na_test.py::test_3\n", "", 0
+        )
+    )
+
+    check(fix=True, directory=tmp_path, shard_tests=True, test_workers=2)
+
+    assert mock_for(run_pytest_shard).call_count == 2
+    mock_for(combine_coverage).assert_called_once()
+    mock_for(run_unit_tests_and_coverage).assert_not_called()
+
+
+def test_shard_tests_weighs_the_tests_stage_per_shard(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    _set_up(tmp_path)
+    weights: dict[str, Resources] = {}
+
+    def _record_weights(stages: list[Stage], *_args: object) -> None:
+        weights.update((stage.label, stage.weight) for stage in stages)
+
+    monkeypatch.setattr(_check, "run_stages_in_parallel", _record_weights)
+
+    check(directory=tmp_path, parallel=True, shard_tests=True, test_workers=3)
+
+    tests = DEFAULT_STAGE_WEIGHTS["tests"]
+    assert weights["Tests + Coverage"] == Resources(tests[0] * 3, tests[1] * 3)
+    assert weights["Type checks"] == Resources(*DEFAULT_STAGE_WEIGHTS["types"])
+
+
+def test_test_impact_and_shard_tests_are_exclusive(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="can't be used together"):
+        check(directory=tmp_path, test_impact=True, shard_tests=True)
+
+
+def test_writes_a_trace_of_each_stage(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    trace = tmp_path / "trace.json"
+
+    check(fix=True, directory=tmp_path, cache=False, trace=trace)
+
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert [event["name"] for event in events if event["ph"] == "X"] == [
+        "check",
+        "Formatter",
+        "Linter",
+        "Type checks",
+        "Tests + Coverage",
+    ]
+
+
+def test_stream_shows_output_live_and_logs_it(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("x=1\n")
+
+    with pytest.raises(FormatCheckError, match="Full output in .*ruff-format.log"):
+        check(directory=tmp_path, stream=True)
+
+    assert_displayed("ruff-format: Would reformat: test.py")
+    log = tmp_path / CACHE_DIR_NAME / "logs" / "ruff-format.log"
+    assert "Would reformat: test.py" in log.read_text()
+
+
+def test_all_checks_changed_projects_with_the_same_options(tmp_path: Path) -> None:
+    for project in ("a", "b"):
+        (tmp_path / project).mkdir()
+        (tmp_path / project / "pyproject.toml").write_text("")
+    _commit_all(tmp_path)
+    (tmp_path / "a" / "module.py").write_text("x = 1\n")
+
+    check(directory=tmp_path, all_projects=True, since="HEAD", fix=True, test_workers=2)
+
+    mock_for(run_project_check).assert_called_once_with(
+        tmp_path / "a",
+        [
+            "--fix",
+            "--no-parallel",
+            "--cache",
+            "--no-presync",
+            "--no-test-impact",
+            "--no-shard-tests",
+            "--no-stream",
+            "--since",
+            "HEAD",
+            "--test-workers",
+            "2",
+        ],
+    )
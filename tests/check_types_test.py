@@ -4,6 +4,7 @@ import pytest
 from pl_tiny_clients.initialize_uv_project import initialize_uv_project
 
 from pl_ci_cd._check_types import TypeCheckError, check_types
+from pl_ci_cd._pyright_session import PyrightSession
 from pl_ci_cd.testing._set_up import set_up_type_check
 
 from .constants import PYTEST_SLOW_MARKER
@@ -35,3 +36,20 @@ def test_check_types_fails_for_invalid_types(tmp_path: Path) -> None:
         check_types(tmp_path)
 
     assert "Type check failed" in str(exc_info.value)
+
+
+def test_check_types_with_session_reports_errors_after_changes(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("x: int = 1 + 2\n")
+
+    with PyrightSession(tmp_path) as session:
+        check_types(tmp_path, session=session)
+
+        (tmp_path / "test.py").write_text("x: int = 'string'\n")
+
+        with pytest.raises(TypeCheckError) as exc_info:
+            check_types(tmp_path, session=session)
+
+    assert "Type check failed. 1 error(s):\ntest.py:1:10 - error:" in str(
+        exc_info.value
+    )
@@ -0,0 +1,70 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from pl_ci_cd import _ci_ledger
+from pl_ci_cd._ci_ledger import CiLedger
+
+
+def _script(tmp_path: Path, body: str) -> Path:
+    script = tmp_path / "test"
+    script.write_text(body)
+    return script
+
+
+def test_remembers_trees_that_passed(tmp_path: Path) -> None:
+    ledger = CiLedger(tmp_path, _script(tmp_path, "pytest"))
+
+    ledger.record("abc")
+
+    assert ledger.has_passed("abc")
+    assert not ledger.has_passed("def")
+    assert CiLedger(tmp_path, _script(tmp_path, "pytest")).has_passed("abc")
+
+
+def test_forgets_passes_when_the_script_changes(tmp_path: Path) -> None:
+    CiLedger(tmp_path, _script(tmp_path, "pytest")).record("abc")
+
+    assert not CiLedger(tmp_path, _script(tmp_path, "pytest -x")).has_passed("abc")
+
+
+def test_keeps_only_the_most_recent_passes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(_ci_ledger, "MAX_LEDGER_ENTRIES", 2)
+    ledger = CiLedger(tmp_path, _script(tmp_path, "pytest"))
+
+    ledger.record("first")
+    ledger.record("second")
+    ledger.record("first")
+    ledger.record("third")
+
+    assert ledger.has_passed("first")
+    assert ledger.has_passed("third")
+    assert not ledger.has_passed("second")
+
+
+def test_ignores_an_unreadable_ledger(tmp_path: Path) -> None:
+    ledger = CiLedger(tmp_path, _script(tmp_path, "pytest"))
+    ledger.record("abc")
+    (tmp_path / "pl-ci-cd" / "ci-ledger.json").write_text("{not json")
+
+    assert not ledger.has_passed("abc")
+
+
+def test_keeps_passes_recorded_at_the_same_time(tmp_path: Path) -> None:
+    script = _script(tmp_path, "pytest")
+    trees = [f"tree-{number}" for number in range(20)]
+    threads = [
+        threading.Thread(target=CiLedger(tmp_path, script).record, args=(tree,))
+        for tree in trees
+    ]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ledger = CiLedger(tmp_path, script)
+    assert all(ledger.has_passed(tree) for tree in trees)
@@ -1,10 +1,11 @@
 import contextlib
+import json
 from pathlib import Path
 
 import pytest
-from pl_mocks_and_fakes import mock_for, stub
+from pl_mocks_and_fakes import mock_for
+from pl_run_program import run_simple_program
 from pl_tiny_clients.git_add_all import git_add_all
-from pl_tiny_clients.git_any_uncommitted_changes import git_any_uncommitted_changes
 from pl_tiny_clients.git_commit import git_commit
 from pl_tiny_clients.git_push import git_push
 from pl_user_io.testing import (
@@ -13,6 +14,7 @@ from pl_user_io.testing import (
     stub_str_input,
 )
 
+from pl_ci_cd._constants import git_program
 from pl_ci_cd.commit import commit
 from pl_ci_cd.testing import set_up_check
 
@@ -30,10 +32,25 @@ def _set_up(
     has_uncommitted: bool = True,
     manually_entered_message: str = "fixed bug",
 ) -> None:
-    stub(git_any_uncommitted_changes)(has_uncommitted)
     stub_str_input(manually_entered_message, "Enter your commit message:")
 
     set_up_check(tmp_path)
+    run_simple_program(git_program(), ["init"], cwd=tmp_path)
+    if not has_uncommitted:
+        run_simple_program(git_program(), ["add", "-A"], cwd=tmp_path)
+        run_simple_program(
+            git_program(),
+            [
+                "-c",
+                "user.name=Test",
+                "-c",
+                "user.email=t@example.com",
+                "commit",
+                "-m",
+                "initial",
+            ],
+            cwd=tmp_path,
+        )
 
 
 def test_uses_current_working_directory_if_directory_not_passed(tmp_path: Path) -> None:
@@ -46,6 +63,24 @@ def test_uses_current_working_directory_if_directory_not_passed(tmp_path: Path)
     assert (tmp_path / "test.py").read_text() == "x = 1 + 2\n"
 
 
+def test_writes_a_trace_of_the_checks_and_the_commit(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    trace = tmp_path / "trace.json"
+
+    commit(directory=tmp_path, trace=trace)
+
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert [event["name"] for event in events if event["ph"] == "X"][:3] == [
+        "commit",
+        "check",
+        "Formatter",
+    ]
+    assert [event["name"] for event in events if event["ph"] == "X"][-2:] == [
+        "Commit",
+        "Push",
+    ]
+
+
 def test_exits_if_no_changes_to_commit(tmp_path: Path) -> None:
     _set_up(tmp_path, has_uncommitted=False)
 
@@ -2,8 +2,10 @@ import pytest
 
 PYTEST_SLOW_MARKER = pytest.mark.slow
 PYTEST_INTEGRATION_MARKER = pytest.mark.integration
+PYTEST_NONDETERMINISTIC_MARKER = pytest.mark.nondeterministic
 
 PYTEST_INTEGRATION_TEST_MARKERS = [
     PYTEST_SLOW_MARKER,
     PYTEST_INTEGRATION_MARKER,
+    PYTEST_NONDETERMINISTIC_MARKER,
 ]
@@ -0,0 +1,371 @@
+import json
+import os
+import socket
+import threading
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from io import StringIO
+from pathlib import Path
+from unittest.mock import ANY
+
+import pytest
+from pl_mocks_and_fakes import mock_for
+from pl_user_io.testing import assert_displayed
+
+from pl_ci_cd._cache import StageCache
+from pl_ci_cd._check import check
+from pl_ci_cd._check_types import check_types
+from pl_ci_cd._daemon import (
+    DaemonError,
+    HotState,
+    hot_state_for,
+    is_serving,
+    serve,
+    using_hot_state,
+)
+from pl_ci_cd._daemon_client import check_main, forward, socket_path
+from pl_ci_cd._pyright_session import PyrightSession
+from pl_ci_cd._tool_environment import UV_RUN
+from pl_ci_cd.testing._set_up import set_up_check
+
+IDLE_TIMEOUT_SECONDS = 0.3
+
+
+@contextmanager
+def _daemon(project_root: Path) -> Generator[None]:
+    thread = threading.Thread(target=serve, args=(project_root, IDLE_TIMEOUT_SECONDS))
+    thread.start()
+    try:
+        while not is_serving(socket_path(project_root)):
+            time.sleep(0.01)
+        yield
+    finally:
+        thread.join()
+
+
+def _forward(command: str, args: list[str], cwd: Path) -> tuple[int | None, str]:
+    output = StringIO()
+    exit_code = forward(command, args, cwd, output)
+    return exit_code, output.getvalue()
+
+
+def test_forwards_commands_and_their_output(tmp_path: Path) -> None:
+    set_up_check(tmp_path)
+
+    with _daemon(tmp_path):
+        exit_code, output = _forward("check", ["--help"], tmp_path)
+
+    assert exit_code == 0
+    assert "Run all CI checks" in output
+
+
+def test_runs_checks_with_the_hot_state(tmp_path: Path) -> None:
+    set_up_check(tmp_path)
+
+    with _daemon(tmp_path):
+        exit_code, _ = _forward("check", ["--no-cache"], tmp_path)
+
+    assert exit_code == 0
+    mock_for(check_types).assert_called_once_with(tmp_path, UV_RUN, ANY)
+
+
+def test_finds_the_daemon_from_a_subdirectory(tmp_path: Path) -> None:
+    set_up_check(tmp_path)
+    (tmp_path / "sub").mkdir()
+
+    with _daemon(tmp_path):
+        exit_code, _ = _forward("check", ["--no-cache"], tmp_path / "sub")
+
+    assert exit_code == 0
+
+
+def test_finds_the_daemon_from_the_directory_option(tmp_path: Path) -> None:
+    set_up_check(tmp_path)
+
+    with _daemon(tmp_path):
+        exit_code, output = _forward(
+            "check", ["--directory", str(tmp_path), "--help"], Path("/")
+        )
+        exit_code_with_equals, _ = _forward(
+            "check", [f"--directory={tmp_path}", "--help"], Path("/")
+        )
+
+    assert exit_code == exit_code_with_equals == 0
+    assert "Run all CI checks" in output
+
+
+def test_returns_failing_exit_codes(tmp_path: Path) -> None:
+    set_up_check(tmp_path)
+    (tmp_path / "test.py").write_text("x=1+2\n")
+
+    with _daemon(tmp_path):
+        failed, _ = _forward("check", ["--no-fix"], tmp_path)
+        bad_usage, usage_output = _forward("check", ["--bogus"], tmp_path)
+        unknown, _ = _forward("deploy", [], tmp_path)
+
+    assert failed == 1
+    assert_displayed("FormatCheckError")
+    assert bad_usage == 2
+    assert "--bogus" in usage_output
+    assert unknown == 2
+    assert_displayed("Unknown command: deploy")
+
+
+def test_keeps_serving_until_idle(tmp_path: Path) -> None:
+    set_up_check(tmp_path)
+
+    with _daemon(tmp_path):
+        pass
+
+    assert_displayed(f"Serving checks for {tmp_path}")
+    assert_displayed("No requests for 0.3s, shutting down.")
+    assert not socket_path(tmp_path).exists()
+
+
+def test_refuses_to_serve_a_project_twice(tmp_path: Path) -> None:
+    set_up_check(tmp_path)
+
+    with _daemon(tmp_path), pytest.raises(DaemonError, match="already serving"):
+        serve(tmp_path, IDLE_TIMEOUT_SECONDS)
+
+
+def test_replaces_a_stale_socket(tmp_path: Path) -> None:
+    set_up_check(tmp_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(str(socket_path(tmp_path)))
+
+    with _daemon(tmp_path):
+        exit_code, _ = _forward("check", ["--help"], tmp_path)
+
+    assert exit_code == 0
+
+
+def test_check_serve_starts_a_daemon(tmp_path: Path) -> None:
+    set_up_check(tmp_path)
+
+    check(directory=tmp_path, serve_checks=True, idle_timeout=IDLE_TIMEOUT_SECONDS)
+
+    assert_displayed(f"Serving checks for {tmp_path}")
+
+
+def test_check_script_forwards_to_the_daemon(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    set_up_check(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["check", "--help"])
+
+    with _daemon(tmp_path), pytest.raises(SystemExit) as exit_info:
+        check_main()
+
+    assert exit_info.value.code == 0
+    assert "Run all CI checks" in capsys.readouterr().out
+
+
+def test_check_script_runs_check_without_a_daemon(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    set_up_check(tmp_path)
+    monkeypatch.setattr(
+        "sys.argv",
+        ["check", "--directory", str(tmp_path), "--serve", "--idle-timeout", "0.3"],
+    )
+
+    with pytest.raises(SystemExit):
+        check_main()
+
+    assert_displayed(f"Serving checks for {tmp_path}")
+
+
+def test_forward_returns_none_without_a_daemon(tmp_path: Path) -> None:
+    set_up_check(tmp_path)
+
+    assert forward("check", [], tmp_path) is None
+    assert forward("check", [], Path("/")) is None
+
+
+def test_forward_reports_a_daemon_that_exits_mid_request(tmp_path: Path) -> None:
+    set_up_check(tmp_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(socket_path(tmp_path)))
+        server.listen()
+
+        def _exit_after_output() -> None:
+            connection, _ = server.accept()
+            with connection:
+                connection.makefile("r").readline()
+                connection.sendall(b'{"output": "partial\\n"}\n')
+
+        thread = threading.Thread(target=_exit_after_output)
+        thread.start()
+        exit_code, output = _forward("check", [], tmp_path)
+        thread.join()
+    socket_path(tmp_path).unlink()
+
+    assert exit_code == 1
+    assert output == "partial\nThe check daemon exited before finishing the request.\n"
+
+
+def test_hot_state_is_only_for_its_project(tmp_path: Path) -> None:
+    state = HotState(tmp_path, StageCache(tmp_path), PyrightSession(tmp_path))
+
+    assert hot_state_for(tmp_path) is None
+    with using_hot_state(state):
+        assert hot_state_for(tmp_path) is state
+        assert hot_state_for(tmp_path / "other") is None
+
+
+def test_puts_the_socket_in_the_runtime_directory(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    runtime_dir = tmp_path / "run"
+    runtime_dir.mkdir(mode=0o700)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(runtime_dir))
+
+    assert socket_path(tmp_path).parent == runtime_dir
+
+
+def test_puts_the_socket_in_a_private_directory_without_a_runtime_directory(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+
+    directory = socket_path(tmp_path).parent
+
+    assert directory.stat().st_uid == os.getuid()
+    assert directory.stat().st_mode & 0o777 == 0o700
+
+
+def test_refuses_a_socket_directory_others_can_use(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    set_up_check(tmp_path)
+    runtime_dir = tmp_path / "run"
+    runtime_dir.mkdir()
+    runtime_dir.chmod(0o777)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(runtime_dir))
+
+    assert forward("check", [], tmp_path) is None
+    with pytest.raises(DaemonError, match="only its owner"):
+        serve(tmp_path, IDLE_TIMEOUT_SECONDS)
+
+
+def _another_user(_connection: socket.socket) -> int:
+    return os.getuid() + 1
+
+
+def test_the_daemon_refuses_other_users(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    set_up_check(tmp_path)
+    monkeypatch.setattr("pl_ci_cd._daemon.peer_uid", _another_user)
+
+    with _daemon(tmp_path):
+        exit_code, output = _forward("check", ["--help"], tmp_path)
+
+    assert exit_code == 1
+    assert "Run all CI checks" not in output
+    assert_displayed(f"Refused a connection from user {os.getuid() + 1}.")
+
+
+def test_forward_ignores_a_daemon_of_another_user(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    set_up_check(tmp_path)
+    monkeypatch.setattr("pl_ci_cd._daemon_client.peer_uid", _another_user)
+
+    with _daemon(tmp_path):
+        assert forward("check", ["--help"], tmp_path) is None
+
+
+def test_runs_requests_in_the_clients_environment(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    set_up_check(tmp_path)
+    seen: list[str | None] = []
+
+    def _record_environment(_name: str, _args: list[str]) -> int:
+        seen.append(os.environ.get("PL_CI_CD_CLIENT"))
+        return 0
+
+    monkeypatch.setattr("pl_ci_cd._daemon._run_command", _record_environment)
+    with (
+        _daemon(tmp_path),
+        socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client,
+    ):
+        client.connect(str(socket_path(tmp_path)))
+        with client.makefile("rw", encoding="utf-8") as stream:
+            stream.write(_request(tmp_path, {**os.environ, "PL_CI_CD_CLIENT": "yes"}))
+            stream.flush()
+            assert json.loads(stream.readline()) == {"exit_code": 0}
+
+    assert seen == ["yes"]
+    assert "PL_CI_CD_CLIENT" not in os.environ
+
+
+def _request(cwd: Path, env: dict[str, str]) -> str:
+    return (
+        json.dumps({"command": "check", "args": [], "cwd": str(cwd), "env": env}) + "\n"
+    )
+
+
+def test_keeps_running_a_request_whose_client_went_away(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    set_up_check(tmp_path)
+    finished = threading.Event()
+
+    def _print_twice(_name: str, _args: list[str]) -> int:
+        print("one")
+        print("two")
+        finished.set()
+        return 0
+
+    monkeypatch.setattr("pl_ci_cd._daemon._run_command", _print_twice)
+
+    with _daemon(tmp_path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(str(socket_path(tmp_path)))
+            client.sendall(_request(tmp_path, dict(os.environ)).encode())
+        assert finished.wait(timeout=5)
+
+
+def test_forward_sends_its_environment(tmp_path: Path) -> None:
+    set_up_check(tmp_path)
+    requests: list[dict[str, object]] = []
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(socket_path(tmp_path)))
+        server.listen()
+
+        def _answer() -> None:
+            connection, _ = server.accept()
+            with connection:
+                requests.append(json.loads(connection.makefile("r").readline()))
+                connection.sendall(b'{"exit_code": 0}\n')
+
+        thread = threading.Thread(target=_answer)
+        thread.start()
+        forward("check", [], tmp_path)
+        thread.join()
+    socket_path(tmp_path).unlink()
+
+    assert requests[0]["env"] == dict(os.environ)
+
+
+def test_drops_a_client_that_sends_nothing(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    set_up_check(tmp_path)
+    monkeypatch.setattr("pl_ci_cd._daemon.REQUEST_TIMEOUT_SECONDS", 0.1)
+
+    with (
+        _daemon(tmp_path),
+        socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as silent,
+    ):
+        silent.connect(str(socket_path(tmp_path)))
+        exit_code, output = _forward("check", ["--help"], tmp_path)
+
+    assert exit_code == 0
+    assert "Run all CI checks" in output
+    assert_displayed("Dropped a client that sent no request for 0.1s.")
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import pytest
+
+from pl_ci_cd._cache import CACHE_DIR_NAME
+from pl_ci_cd._failed_tests import (
+    FAILED_TESTS_NAME,
+    load_failed_tests,
+    record_failed_tests,
+)
+
+
+def test_remembers_failed_tests(tmp_path: Path) -> None:
+    (tmp_path / "a_test.py").write_text("")
+
+    record_failed_tests(tmp_path, ["a_test.py::test_2", "a_test.py::test_1"])
+
+    assert load_failed_tests(tmp_path) == ["a_test.py::test_1", "a_test.py::test_2"]
+
+
+def test_forgets_failed_tests_after_a_passing_run(tmp_path: Path) -> None:
+    (tmp_path / "a_test.py").write_text("")
+    record_failed_tests(tmp_path, ["a_test.py::test_1"])
+
+    record_failed_tests(tmp_path, [])
+
+    assert load_failed_tests(tmp_path) == []
+    assert not (tmp_path / CACHE_DIR_NAME / FAILED_TESTS_NAME).exists()
+
+
+def test_leaves_out_tests_whose_file_is_gone(tmp_path: Path) -> None:
+    record_failed_tests(tmp_path, ["gone_test.py::test_1"])
+
+    assert load_failed_tests(tmp_path) == []
+
+
+@pytest.mark.parametrize("contents", ["not json", "1"])
+def test_unreadable_failed_tests_are_ignored(tmp_path: Path, contents: str) -> None:
+    (tmp_path / CACHE_DIR_NAME).mkdir()
+    (tmp_path / CACHE_DIR_NAME / FAILED_TESTS_NAME).write_text(contents)
+
+    assert load_failed_tests(tmp_path) == []
@@ -0,0 +1,82 @@
+from pathlib import Path
+
+import pytest
+from pl_tiny_clients.initialize_uv_project import initialize_uv_project
+
+from pl_ci_cd._fix import MAX_FIX_PASSES, FixError, fix
+from pl_ci_cd.testing._set_up import set_up_formatter, set_up_lint
+
+
+def _set_up(tmp_path: Path) -> None:
+    uv_project_path = initialize_uv_project(project_path=tmp_path)
+    set_up_formatter(uv_project_path)
+    set_up_lint(uv_project_path)
+
+
+def test_applies_lint_fixes_and_then_formats(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("import os\nx=1\n")
+    (tmp_path / "clean.py").write_text("x = 1\n")
+
+    result = fix(tmp_path)
+
+    assert (tmp_path / "test.py").read_text() == "x = 1\n"
+    assert result.rewritten == [Path("test.py")]
+    assert result.lint.passed
+    # The second pass only confirms the rewritten file is stable.
+    assert result.passes == 2
+
+
+def test_reports_unfixable_violations(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("import os\nx=undefined_var\n")
+
+    result = fix(tmp_path)
+
+    assert not result.lint.passed
+    assert [diagnostic.code for diagnostic in result.lint.diagnostics] == ["F821"]
+    assert (tmp_path / "test.py").read_text() == "x = undefined_var\n"
+
+
+def test_leaves_stable_files_alone_after_one_pass(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("x = 1\n")
+
+    result = fix(tmp_path)
+
+    assert result.rewritten == []
+    assert result.passes == 1
+
+
+def test_only_fixes_given_paths(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "given.py").write_text("x=1\n")
+    (tmp_path / "other.py").write_text("x=1\n")
+
+    result = fix(tmp_path, paths=[Path("given.py")])
+
+    assert result.rewritten == [Path("given.py")]
+    assert (tmp_path / "other.py").read_text() == "x=1\n"
+
+
+def test_does_nothing_for_no_paths(tmp_path: Path) -> None:
+    result = fix(tmp_path, paths=[])
+
+    assert result.rewritten == []
+    assert result.lint.passed
+
+
+def test_raises_if_files_never_settle(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("x = 1\n")
+
+    def _keep_changing(directory: Path, **_kwargs: object) -> None:
+        with (directory / "test.py").open("a") as file:
+            file.write("x = 1\n")
+
+    monkeypatch.setattr("pl_ci_cd._fix.check_format", _keep_changing)
+
+    with pytest.raises(FixError, match=f"after {MAX_FIX_PASSES} passes"):
+        fix(tmp_path)
@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import pytest
+from pl_run_program import run_simple_program
+
+from pl_ci_cd._constants import git_program
+from pl_ci_cd._git_session import (
+    GitQueryError,
+    GitSession,
+    git_session,
+    git_sessions,
+)
+
+
+def _git(cwd: Path, *args: str) -> str:
+    return run_simple_program(git_program(), list(args), cwd=cwd).strip()
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    _git(tmp_path, "init", "-b", "main")
+    _git(tmp_path, "config", "user.email", "test@example.com")
+    _git(tmp_path, "config", "user.name", "Test")
+    (tmp_path / "a.py").write_text("a = 1\n")
+    _git(tmp_path, "add", "-A")
+    _git(tmp_path, "commit", "-m", "initial")
+    return tmp_path
+
+
+def test_resolves_revisions_as_they_change(repo: Path) -> None:
+    with git_sessions():
+        session = git_session(repo)
+        assert session.resolve("HEAD") == _git(repo, "rev-parse", "HEAD")
+
+        (repo / "b.py").write_text("b = 1\n")
+        _git(repo, "add", "-A")
+        _git(repo, "commit", "-m", "second")
+
+        assert session.resolve("HEAD") == _git(repo, "rev-parse", "HEAD")
+        assert session.resolve("main^{tree}") == _git(repo, "rev-parse", "HEAD^{tree}")
+
+
+def test_raises_for_unknown_revisions(repo: Path) -> None:
+    with git_sessions(), pytest.raises(GitQueryError, match="'nope' does not name"):
+        git_session(repo).resolve("nope")
+
+
+def test_reads_the_current_branch(repo: Path) -> None:
+    session = GitSession(repo)
+    assert session.current_branch() == "main"
+
+    _git(repo, "checkout", "--detach")
+
+    assert session.current_branch() == ""
+
+
+def test_knows_a_worktrees_directories(
+    repo: Path, tmp_path_factory: pytest.TempPathFactory
+) -> None:
+    worktree = tmp_path_factory.mktemp("worktrees") / "feature"
+    _git(repo, "worktree", "add", "-b", "feature", str(worktree))
+
+    session = GitSession(worktree)
+
+    assert session.common_dir == (repo / ".git").resolve()
+    assert session.git_dir.parent == (repo / ".git" / "worktrees").resolve()
+    assert session.current_branch() == "feature"
+
+
+def test_working_tree_includes_uncommitted_changes_without_staging_them(
+    repo: Path,
+) -> None:
+    (repo / "b.py").write_text("b = 1\n")
+    session = GitSession(repo)
+
+    tree = session.working_tree()
+
+    _git(repo, "add", "-A")
+    assert tree == _git(repo, "write-tree")
+    _git(repo, "reset")
+    assert _git(repo, "status", "--porcelain") == "?? b.py"
+
+
+def test_shares_one_session_per_worktree(repo: Path) -> None:
+    with git_sessions():
+        assert git_session(repo) is git_session(repo / ".")
+
+
+def test_needs_an_enclosing_git_sessions(repo: Path) -> None:
+    with pytest.raises(RuntimeError, match="inside git_sessions"):
+        git_session(repo)
@@ -0,0 +1,88 @@
+import subprocess
+import sys
+
+import pl_ci_cd
+from pl_ci_cd._check import check
+from pl_ci_cd._ship import ship
+
+from .constants import PYTEST_NONDETERMINISTIC_MARKER
+
+# What the `check` and `commit` scripts may spend importing before they forward to a daemon.
+CLIENT_IMPORT_BUDGET_MICROSECONDS = 100_000
+# Dependencies that take most of that budget when imported, which only the checks themselves need.
+HEAVY_MODULES = {"asyncio", "pl_run_program", "pl_user_io", "subprocess", "typer"}
+
+
+def _import_times(module: str) -> dict[str, int]:
+    """Import `module` in a fresh interpreter and return the cumulative import time of each module it loaded, in μs."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def _own_modules(times: dict[str, int]) -> set[str]:
+    return {name for name in times if name.split(".")[0] == "pl_ci_cd"}
+
+
+def test_importing_the_package_loads_no_submodules() -> None:
+    times = _import_times("pl_ci_cd")
+
+    assert _own_modules(times) == {"pl_ci_cd"}
+    assert not HEAVY_MODULES & times.keys()
+
+
+def test_the_client_scripts_load_only_the_client() -> None:
+    times = _import_times("pl_ci_cd._daemon_client")
+
+    assert _own_modules(times) == {"pl_ci_cd", "pl_ci_cd._daemon_client"}
+    assert not HEAVY_MODULES & times.keys()
+
+
+# Wall-clock time depends on the machine and how busy it is.
+@PYTEST_NONDETERMINISTIC_MARKER
+def test_the_client_scripts_stay_within_the_import_budget() -> None:
+    times = _import_times("pl_ci_cd._daemon_client")
+
+    assert (
+        times["pl_ci_cd"] + times["pl_ci_cd._daemon_client"]
+        < CLIENT_IMPORT_BUDGET_MICROSECONDS
+    )
+
+
+def test_ship_does_not_load_the_checks() -> None:
+    assert _own_modules(_import_times("pl_ci_cd._ship")) == {
+        "pl_ci_cd",
+        "pl_ci_cd._cache",
+        "pl_ci_cd._ci_ledger",
+        "pl_ci_cd._constants",
+        "pl_ci_cd._git_session",
+        "pl_ci_cd._in_memory_rebase",
+        "pl_ci_cd._merge_queue",
+        "pl_ci_cd._project",
+        "pl_ci_cd._ship",
+        "pl_ci_cd._ship_jobs",
+        "pl_ci_cd._tool_environment",
+        "pl_ci_cd._trace",
+    }
+
+
+def test_the_set_up_helpers_do_not_load_the_benchmark() -> None:
+    times = _import_times("pl_ci_cd.testing")
+
+    assert not {"pl_ci_cd._check", "pl_ci_cd._ship", "typer"} & times.keys()
+
+
+def test_exports_are_imported_on_first_access() -> None:
+    assert pl_ci_cd.check is check
+    assert pl_ci_cd.ship is ship
+    assert "check" in dir(pl_ci_cd)
@@ -0,0 +1,116 @@
+from pathlib import Path
+
+import pytest
+from pl_run_program import run_simple_program
+
+from pl_ci_cd._constants import git_program
+from pl_ci_cd._git_session import GitSession
+from pl_ci_cd._in_memory_rebase import rebase_in_memory, replay
+
+MAIN = "main"
+
+
+def _git(cwd: Path, *args: str) -> str:
+    return run_simple_program(git_program(), list(args), cwd=cwd).strip()
+
+
+def _commit(cwd: Path, files: dict[str, str], message: str) -> None:
+    for name, content in files.items():
+        (cwd / name).write_text(content)
+    _git(cwd, "add", "-A")
+    _git(cwd, "commit", "-m", message)
+
+
+@pytest.fixture
+def worktree(tmp_path: Path) -> Path:
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init", "-b", MAIN)
+    _git(repo, "config", "user.email", "test@example.com")
+    _git(repo, "config", "user.name", "Test")
+    _commit(repo, {"items.py": 'items = ["a"]\n', "other.py": "x = 1\n"}, "initial")
+    worktree = tmp_path / "worktree"
+    _git(repo, "worktree", "add", "-b", "feature", str(worktree))
+    return worktree
+
+
+def test_replays_the_branch_onto_main(worktree: Path) -> None:
+    _commit(worktree, {"feature.py": "f = 1\n"}, "Add feature\n\nWith a body.")
+    _git(
+        worktree,
+        "-c",
+        "user.name=Someone Else",
+        "-c",
+        "user.email=else@example.com",
+        "commit",
+        "--allow-empty",
+        "-m",
+        "Second",
+    )
+    _commit(worktree.parent / "repo", {"other.py": "x = 2\n"}, "main moves on")
+
+    assert rebase_in_memory(GitSession(worktree), MAIN)
+
+    assert _git(worktree, "rev-parse", "HEAD~2") == _git(worktree, "rev-parse", MAIN)
+    assert _git(worktree, "log", "--format=%an|%s", f"{MAIN}..HEAD").splitlines() == [
+        "Someone Else|Second",
+        "Test|Add feature",
+    ]
+    assert _git(worktree, "log", "-1", "--format=%b", "HEAD~1") == "With a body."
+    assert (worktree / "other.py").read_text() == "x = 2\n"
+    assert (worktree / "feature.py").read_text() == "f = 1\n"
+    assert _git(worktree, "status", "--porcelain") == ""
+
+
+def test_only_rewrites_files_that_main_changed(worktree: Path) -> None:
+    _commit(worktree, {"feature.py": "f = 1\n"}, "Add feature")
+    before = (worktree / "feature.py").stat().st_mtime_ns
+    _commit(worktree.parent / "repo", {"other.py": "x = 2\n"}, "main moves on")
+
+    assert rebase_in_memory(GitSession(worktree), MAIN)
+
+    assert (worktree / "feature.py").stat().st_mtime_ns == before
+
+
+def test_does_nothing_when_already_on_main(worktree: Path) -> None:
+    _commit(worktree, {"feature.py": "f = 1\n"}, "Add feature")
+    head = _git(worktree, "rev-parse", "HEAD")
+
+    assert rebase_in_memory(GitSession(worktree), MAIN)
+
+    assert _git(worktree, "rev-parse", "HEAD") == head
+
+
+def test_leaves_a_conflicting_branch_alone(worktree: Path) -> None:
+    _commit(worktree, {"items.py": 'items = ["a", "c"]\n'}, "Add c")
+    head = _git(worktree, "rev-parse", "HEAD")
+    _commit(worktree.parent / "repo", {"items.py": 'items = ["a", "b"]\n'}, "Add b")
+
+    assert not rebase_in_memory(GitSession(worktree), MAIN)
+
+    assert _git(worktree, "rev-parse", "HEAD") == head
+    assert (worktree / "items.py").read_text() == 'items = ["a", "c"]\n'
+
+
+def test_leaves_a_branch_alone_when_an_earlier_commit_conflicts(worktree: Path) -> None:
+    _commit(worktree, {"items.py": 'items = ["a", "c"]\n'}, "Add c")
+    _commit(worktree, {"items.py": 'items = ["a"]\n'}, "Drop c")
+    head = _git(worktree, "rev-parse", "HEAD")
+    _commit(worktree.parent / "repo", {"items.py": 'items = ["a", "b"]\n'}, "Add b")
+
+    assert not rebase_in_memory(GitSession(worktree), MAIN)
+
+    assert _git(worktree, "rev-parse", "HEAD") == head
+
+
+def test_replay_touches_no_branch(worktree: Path) -> None:
+    _commit(worktree, {"feature.py": "f = 1\n"}, "Add feature")
+    head = _git(worktree, "rev-parse", "HEAD")
+    _commit(worktree.parent / "repo", {"other.py": "x = 2\n"}, "main moves on")
+
+    tip = replay(GitSession(worktree.parent / "repo"), head, MAIN)
+
+    assert tip is not None
+    assert _git(worktree, "rev-parse", f"{tip}~1") == _git(worktree, "rev-parse", MAIN)
+    assert _git(worktree, "rev-parse", "HEAD") == head
+    assert _git(worktree, "show", f"{tip}:feature.py") == "f = 1"
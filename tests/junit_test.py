@@ -0,0 +1,18 @@
+from pl_ci_cd._junit import parse_junit_failures
+
+REPORT = """\
+<?xml version="1.0"?>
+<testsuites><testsuite name="pytest">
+<testcase file="tests/a_test.py" classname="tests.a_test" name="test_pass" time="0.1" />
+<testcase file="tests/a_test.py" classname="tests.a_test.TestA" name="test_fail" time="0.1"><failure message="x" /></testcase>
+<testcase file="tests/b_test.py" classname="tests.b_test" name="test_error" time="0.1"><error message="x" /></testcase>
+<testcase classname="conftest" name="test_without_file" time="0.1"><failure message="x" /></testcase>
+</testsuite></testsuites>
+"""
+
+
+def test_parses_failed_and_errored_tests() -> None:
+    assert parse_junit_failures(REPORT) == [
+        "tests/a_test.py::TestA::test_fail",
+        "tests/b_test.py::test_error",
+    ]
@@ -2,9 +2,10 @@ from pathlib import Path
 from textwrap import dedent
 
 import pytest
+from pl_run_program import ProgramResult
 from pl_tiny_clients.initialize_uv_project import initialize_uv_project
 
-from pl_ci_cd._lint import LintError, lint
+from pl_ci_cd._lint import LintDiagnostic, LintError, lint
 from pl_ci_cd.testing._set_up import set_up_lint
 
 
@@ -52,6 +53,10 @@ def test_lint_fails_for_warnings(tmp_path: Path) -> None:
     result = lint(tmp_path)
 
     assert not result.passed
+    assert (
+        "Selection `PLW0244` has no effect because preview is not enabled."
+        in result.warnings
+    )
     assert "warning" in result.output
 
 
@@ -93,14 +98,92 @@ def test_lint_raises_on_ruff_exit_code_2(tmp_path: Path) -> None:
     assert "stderr" in str(exc_info.value)
 
 
-def test_lint_returns_full_formatted_output(tmp_path: Path) -> None:
+def test_lint_returns_all_checks_passed_output(tmp_path: Path) -> None:
     _set_up(tmp_path)
     valid_code = "x = 1 + 2\n"
     (tmp_path / "test.py").write_text(valid_code)
 
     result = lint(tmp_path)
 
+    assert result.output == "All checks passed!"
+
+
+def test_lint_returns_typed_diagnostics(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("import os\nx = undefined_var\n")
+
+    result = lint(tmp_path)
+
+    assert result.diagnostics == [
+        LintDiagnostic(
+            Path("test.py"), 1, 8, 1, 10, "F401", "`os` imported but unused", True
+        ),
+        LintDiagnostic(
+            Path("test.py"),
+            2,
+            5,
+            2,
+            18,
+            "F821",
+            "Undefined name `undefined_var`",
+            False,
+        ),
+    ]
     assert result.output == dedent("""\
-        stdout: All checks passed!
+        test.py:1:8: F401 [*] `os` imported but unused
+        test.py:2:5: F821 Undefined name `undefined_var`""")
+
+
+def test_lint_counts_diagnostics_per_rule(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text("import os\nimport sys\nx = undefined_var\n")
+
+    result = lint(tmp_path)
+
+    assert result.counts_by_rule() == {"F401": 2, "F821": 1}
+
+
+def test_lint_output_lists_the_first_diagnostics_and_counts_the_rest(
+    tmp_path: Path,
+) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test.py").write_text(
+        "".join(f"import m{i}\n" for i in range(60)) + "x = undefined_var\n"
+    )
+
+    result = lint(tmp_path)
+
+    lines = result.output.splitlines()
+    assert len(lines) == 51
+    assert lines[-1] == "... and 11 more: F401 (10), F821 (1)"
+
+
+def test_lint_raises_on_unreadable_output(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def _run_ruff(*_args: object, **_kwargs: object) -> ProgramResult:
+        return ProgramResult("not json", "", 1)
+
+    monkeypatch.setattr("pl_ci_cd._lint.run_cancellable_program", _run_ruff)
+
+    with pytest.raises(LintError, match="unreadable output"):
+        lint(tmp_path)
+
+
+def test_lint_only_lints_given_paths(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "valid.py").write_text("x = 1 + 2\n")
+    (tmp_path / "invalid.py").write_text("import os\nx = 1\n")
+
+    result = lint(tmp_path, paths=[Path("valid.py")])
+
+    assert result.passed
+
 
-        stderr: """)
+def test_lint_passes_for_no_paths(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "invalid.py").write_text("import os\nx = 1\n")
+
+    result = lint(tmp_path, paths=[])
+
+    assert result.passed
@@ -0,0 +1,126 @@
+from pathlib import Path
+
+import pytest
+from pl_mocks_and_fakes import mock_for
+from pl_run_program import ProgramResult, run_simple_program
+from pl_user_io.testing import assert_displayed
+
+from pl_ci_cd._constants import git_program
+from pl_ci_cd._monorepo import (
+    ProjectChecksError,
+    affected_projects,
+    check_projects,
+    discover_projects,
+    run_project_check,
+)
+
+
+def _git(cwd: Path, *args: str) -> None:
+    run_simple_program(git_program(), list(args), cwd=cwd)
+
+
+def _set_up(tmp_path: Path) -> None:
+    for project in ("a", "b", "b/nested"):
+        (tmp_path / project).mkdir(parents=True)
+        (tmp_path / project / "pyproject.toml").write_text("")
+        (tmp_path / project / "main.py").write_text("x = 1\n")
+    (tmp_path / "README.md").write_text("")
+    _git(tmp_path, "init", "-b", "main")
+    _git(tmp_path, "add", "-A")
+    _git(
+        tmp_path,
+        "-c",
+        "user.name=Test",
+        "-c",
+        "user.email=t@example.com",
+        "commit",
+        "-m",
+        "initial",
+    )
+
+
+def test_discovers_every_project(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "ignored").mkdir()
+    (tmp_path / "ignored" / "pyproject.toml").write_text("")
+    (tmp_path / ".gitignore").write_text("ignored/\n")
+
+    assert discover_projects(tmp_path) == [Path("a"), Path("b"), Path("b/nested")]
+
+
+def test_changed_files_belong_to_their_innermost_project() -> None:
+    projects = [Path(), Path("a"), Path("b"), Path("b/nested")]
+
+    assert affected_projects(projects, [Path("b/nested/main.py")]) == [Path("b/nested")]
+    assert affected_projects(projects, [Path("b/main.py"), Path("README.md")]) == [
+        Path(),
+        Path("b"),
+    ]
+    assert affected_projects(projects[1:], [Path("README.md")]) == []
+
+
+def test_checks_every_project_with_the_given_arguments(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+
+    results = check_projects(tmp_path, ["--no-cache"], workers=2)
+
+    assert [result.project for result in results] == [
+        Path("a"),
+        Path("b"),
+        Path("b/nested"),
+    ]
+    assert sorted(call.args for call in mock_for(run_project_check).call_args_list) == [
+        (tmp_path / "a", ["--no-cache"]),
+        (tmp_path / "b", ["--no-cache"]),
+        (tmp_path / "b/nested", ["--no-cache"]),
+    ]
+    assert_displayed("Checking 3 project(s).")
+    assert_displayed("Checked 3 project(s): 3 passed, 0 failed.")
+
+
+def test_only_checks_projects_changed_since_a_ref(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "b" / "main.py").write_text("x = 2\n")
+
+    results = check_projects(tmp_path, [], since="HEAD")
+
+    assert [result.project for result in results] == [Path("b")]
+
+
+def test_checks_nothing_if_no_project_changed(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+
+    assert check_projects(tmp_path, [], since="HEAD") == []
+
+    assert_displayed("No projects changed since HEAD.")
+    mock_for(run_project_check).assert_not_called()
+
+
+def test_checks_nothing_without_projects(tmp_path: Path) -> None:
+    assert check_projects(tmp_path, []) == []
+
+    assert_displayed(f"No projects found under {tmp_path}.")
+
+
+def test_raises_with_the_tail_of_each_failure_after_every_project_ran(
+    tmp_path: Path,
+) -> None:
+    _set_up(tmp_path)
+
+    def _check(directory: Path, check_args: list[str]) -> ProgramResult:
+        del check_args
+        if directory.name == "a":
+            return ProgramResult("\n".join(f"line {i}" for i in range(100)), "", 1)
+        return ProgramResult("", "", 0)
+
+    mock_for(run_project_check).side_effect = _check
+
+    with pytest.raises(ProjectChecksError) as exc_info:
+        check_projects(tmp_path, [])
+
+    assert mock_for(run_project_check).call_count == 3
+    message = str(exc_info.value)
+    assert message.startswith("1 of 3 project(s) failed.\n\na:\nline 50\n")
+    assert "line 49\n" not in message
+    assert_displayed("✗ a (")
+    assert_displayed("Checked 3 project(s): 2 passed, 1 failed.")
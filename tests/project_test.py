@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import pytest
+from pl_run_program import run_simple_program
+
+from pl_ci_cd._constants import git_program
+from pl_ci_cd._project import ProjectContext, find_project
+
+
+def test_finds_the_nearest_project(tmp_path: Path) -> None:
+    (tmp_path / "pyproject.toml").write_text("")
+    (tmp_path / "sub").mkdir()
+
+    assert find_project(tmp_path / "sub").root == tmp_path
+
+
+def test_raises_outside_a_project(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError, match="Could not find `pyproject.toml`"):
+        find_project(tmp_path)
+
+
+def test_reads_the_tool_config(tmp_path: Path) -> None:
+    (tmp_path / "pyproject.toml").write_text(
+        '[project]\nname = "x"\n\n[tool.pl-ci-cd]\nworkers = 2\n'
+    )
+
+    project = ProjectContext(tmp_path)
+
+    assert project.pyproject["project"] == {"name": "x"}
+    assert project.tool_config == {"workers": 2}
+
+
+def test_has_no_config_without_a_pyproject(tmp_path: Path) -> None:
+    assert ProjectContext(tmp_path).tool_config == {}
+
+
+def test_snapshots_the_git_status_once(tmp_path: Path) -> None:
+    run_simple_program(git_program(), ["init"], cwd=tmp_path)
+    project = ProjectContext(tmp_path)
+    assert project.git_status == []
+
+    (tmp_path / "new.py").write_text("")
+
+    assert project.git_status == []
+    assert ProjectContext(tmp_path).git_status == ["?? new.py"]
+
+
+def test_has_no_git_status_outside_a_repository(tmp_path: Path) -> None:
+    assert ProjectContext(tmp_path).git_status is None
@@ -0,0 +1,325 @@
+import json
+import sys
+import time
+from pathlib import Path
+from textwrap import dedent
+from typing import cast
+
+import pytest
+
+from pl_ci_cd._pyright_session import (
+    PyrightSession,
+    PyrightSessionError,
+    TypeDiagnostic,
+)
+from pl_ci_cd._tool_environment import ToolEnvironment
+
+# Reports one diagnostic per line containing "error", "warning", or "hint" in each source
+# file it is asked about, and logs every message it receives to `server.log`. Files named
+# `excluded.py` are left out of the project, as pyright leaves out those its config excludes.
+FAKE_LANGSERVER = dedent("""\
+    import hashlib, json, os, pathlib, subprocess, sys
+    from urllib.parse import unquote, urlparse
+
+    MODE = {mode!r}
+    log = open({log!r}, "a")
+    root = None
+
+    def read():
+        length = None
+        while (line := sys.stdin.buffer.readline()) not in (b"\\r\\n", b""):
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        if length is None:
+            sys.exit(0)
+        return json.loads(sys.stdin.buffer.read(length))
+
+    def send(message):
+        body = json.dumps(dict(jsonrpc="2.0", **message)).encode()
+        sys.stdout.buffer.write(b"Content-Length: %d\\r\\n\\r\\n" % len(body) + body)
+        sys.stdout.buffer.flush()
+
+    def diagnose(path):
+        severities = {{"error": 1, "warning": 2, "hint": 4}}
+        diagnostics = []
+        for number, line in enumerate(path.read_text().splitlines()):
+            for word, severity in severities.items():
+                if word in line:
+                    diagnostics.append({{
+                        "range": {{"start": {{"line": number, "character": 0}}, "end": {{"line": number, "character": 1}}}},
+                        "severity": severity,
+                        "message": line,
+                        "code": "reportFake",
+                    }})
+        return diagnostics
+
+    def report(params):
+        path = pathlib.Path(unquote(urlparse(params["textDocument"]["uri"]).path))
+        if path.name == "excluded.py":
+            return {{"kind": "full", "items": []}}
+        result_id = hashlib.sha256(path.read_bytes()).hexdigest()
+        if params["previousResultId"] == result_id:
+            return {{"kind": "unchanged", "resultId": result_id}}
+        return {{"kind": "full", "resultId": result_id, "items": diagnose(path)}}
+
+    while True:
+        message = read()
+        log.write(json.dumps(message) + "\\n")
+        log.flush()
+        method = message.get("method")
+        if method == "initialize":
+            if MODE == "exit_on_start":
+                sys.exit(1)
+            if MODE == "mute":
+                continue
+            root = pathlib.Path(unquote(urlparse(message["params"]["rootUri"]).path))
+            send({{"id": message["id"], "result": {{"capabilities": {{}}}}}})
+            if MODE == "crash":
+                sys.exit(1)
+            if MODE == "orphan":
+                # Holds the server's output open for as long as it lives.
+                subprocess.Popen(["sleep", "30"])
+        elif method == "workspace/didChangeConfiguration":
+            send({{"id": "progress", "method": "window/workDoneProgress/create", "params": {{"token": "t"}}}})
+            send({{"id": "config", "method": "workspace/configuration", "params": {{"items": [{{"section": "python.analysis"}}, {{"section": "python"}}]}}}})
+            if MODE == "silent":
+                continue
+            sources = sorted(root.glob("*.py"))
+            if not sources:
+                send({{"method": "window/logMessage", "params": {{"type": 3, "message": "No source files found."}}}})
+            for path in sources:
+                send({{"method": "textDocument/publishDiagnostics", "params": {{"uri": path.as_uri(), "diagnostics": diagnose(path)}}}})
+        elif method == "textDocument/diagnostic":
+            send({{"id": message["id"], "result": report(message["params"])}})
+        elif method == "shutdown":
+            send({{"id": message["id"], "result": None}})
+        elif method == "exit":
+            sys.exit(0)
+""")
+
+
+def _set_up(tmp_path: Path, mode: str = "normal") -> tuple[Path, Path]:
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "pyproject.toml").write_text("")
+    venv = tmp_path / "venv"
+    (venv / "bin").mkdir(parents=True)
+    log = tmp_path / "server.log"
+    server = venv / "bin" / "pyright-langserver"
+    server.write_text(
+        f"#!{sys.executable}\n" + FAKE_LANGSERVER.format(mode=mode, log=str(log))
+    )
+    server.chmod(0o755)
+    return project, log
+
+
+def _session(
+    tmp_path: Path, project: Path, timeout_seconds: float = 10
+) -> PyrightSession:
+    return PyrightSession(
+        project,
+        ToolEnvironment(tmp_path / "venv"),
+        timeout_seconds=timeout_seconds,
+    )
+
+
+def _received(log: Path, method: str) -> list[dict[str, object]]:
+    messages = [json.loads(line) for line in log.read_text().splitlines()]
+    return [message for message in messages if message.get("method") == method]
+
+
+def test_reports_errors_and_warnings_but_not_hints(tmp_path: Path) -> None:
+    project, _ = _set_up(tmp_path)
+    (project / "module.py").write_text("ok\nerror here\nwarning here\nhint here\n")
+
+    with _session(tmp_path, project) as session:
+        diagnostics = session.diagnostics()
+
+    assert diagnostics == [
+        TypeDiagnostic(Path("module.py"), 2, 1, "error", "error here", "reportFake"),
+        TypeDiagnostic(
+            Path("module.py"), 3, 1, "warning", "warning here", "reportFake"
+        ),
+    ]
+    assert str(diagnostics[0]) == "module.py:2:1 - error: error here (reportFake)"
+
+
+def test_answers_configuration_with_workspace_diagnostic_mode(tmp_path: Path) -> None:
+    project, log = _set_up(tmp_path)
+    (project / "module.py").write_text("ok\n")
+
+    with _session(tmp_path, project) as session:
+        session.diagnostics()
+
+    responses = [
+        json.loads(line)
+        for line in log.read_text().splitlines()
+        if json.loads(line).get("id") == "config"
+    ]
+    assert responses[0]["result"] == [{"diagnosticMode": "workspace"}, {}]
+
+
+def test_unchanged_files_are_answered_from_the_session(tmp_path: Path) -> None:
+    project, log = _set_up(tmp_path)
+    (project / "module.py").write_text("error here\n")
+
+    with _session(tmp_path, project) as session:
+        first = session.diagnostics()
+        second = session.diagnostics()
+
+    assert first == second
+    assert _received(log, "initialize") != []
+    assert _received(log, "workspace/didChangeWatchedFiles") == []
+
+
+def test_only_changed_files_are_sent_to_the_server(tmp_path: Path) -> None:
+    project, log = _set_up(tmp_path)
+    (project / "changed.py").write_text("error here\n")
+    (project / "unchanged.py").write_text("error here\n")
+
+    with _session(tmp_path, project) as session:
+        session.diagnostics()
+        (project / "changed.py").write_text("fixed\n")
+        diagnostics = session.diagnostics()
+
+    assert [str(diagnostic.path) for diagnostic in diagnostics] == ["unchanged.py"]
+    (notification,) = _received(log, "workspace/didChangeWatchedFiles")
+    assert notification["params"] == {
+        "changes": [{"uri": (project / "changed.py").as_uri(), "type": 2}]
+    }
+
+
+def test_diagnostics_are_pulled_with_the_previous_result_id(tmp_path: Path) -> None:
+    project, log = _set_up(tmp_path)
+    (project / "changed.py").write_text("error here\n")
+    (project / "unchanged.py").write_text("error here\n")
+
+    with _session(tmp_path, project) as session:
+        session.diagnostics()
+        (project / "changed.py").write_text("warning here\n")
+        diagnostics = session.diagnostics()
+
+    assert [diagnostic.message for diagnostic in diagnostics] == [
+        "warning here",
+        "error here",
+    ]
+    pulls = [
+        cast("dict[str, object]", pull["params"])
+        for pull in _received(log, "textDocument/diagnostic")
+    ]
+    assert [pull["previousResultId"] is None for pull in pulls] == [
+        True,
+        True,
+        False,
+        False,
+    ]
+
+
+def test_files_left_out_of_the_project_have_no_diagnostics(tmp_path: Path) -> None:
+    project, _ = _set_up(tmp_path)
+    (project / "excluded.py").write_text("error here\n")
+    (project / "module.py").write_text("error here\n")
+
+    with _session(tmp_path, project) as session:
+        diagnostics = session.diagnostics()
+
+    assert [str(diagnostic.path) for diagnostic in diagnostics] == ["module.py"]
+
+
+def test_restarts_when_files_are_added_or_removed(tmp_path: Path) -> None:
+    project, log = _set_up(tmp_path)
+    (project / "deleted.py").write_text("error here\n")
+    (project / "kept.py").write_text("error here\n")
+
+    with _session(tmp_path, project) as session:
+        session.diagnostics()
+        (project / "deleted.py").unlink()
+        (project / "created.py").write_text("new error\n")
+        diagnostics = session.diagnostics()
+
+    assert [str(diagnostic.path) for diagnostic in diagnostics] == [
+        "created.py",
+        "kept.py",
+    ]
+    assert len(_received(log, "initialize")) == 2
+
+
+def test_restarts_when_config_changes(tmp_path: Path) -> None:
+    project, log = _set_up(tmp_path)
+    (project / "module.py").write_text("error here\n")
+
+    with _session(tmp_path, project) as session:
+        session.diagnostics()
+        (project / "pyproject.toml").write_text("[tool.pyright]\n")
+        diagnostics = session.diagnostics()
+
+    assert len(diagnostics) == 1
+    assert len(_received(log, "initialize")) == 2
+    assert len(_received(log, "shutdown")) == 2
+
+
+def test_empty_project_has_no_diagnostics(tmp_path: Path) -> None:
+    project, _ = _set_up(tmp_path)
+
+    with _session(tmp_path, project) as session:
+        assert session.diagnostics() == []
+
+
+def test_raises_if_server_exits(tmp_path: Path) -> None:
+    project, _ = _set_up(tmp_path, mode="crash")
+
+    with (
+        _session(tmp_path, project) as session,
+        pytest.raises(PyrightSessionError, match="exited"),
+    ):
+        session.diagnostics()
+
+
+def test_raises_if_server_exits_before_initializing(tmp_path: Path) -> None:
+    project, _ = _set_up(tmp_path, mode="exit_on_start")
+
+    with (
+        _session(tmp_path, project) as session,
+        pytest.raises(PyrightSessionError, match="exited before answering"),
+    ):
+        session.diagnostics()
+
+
+def test_raises_if_server_does_not_answer_in_time(tmp_path: Path) -> None:
+    project, _ = _set_up(tmp_path, mode="mute")
+
+    with (
+        _session(tmp_path, project, timeout_seconds=0.5) as session,
+        pytest.raises(PyrightSessionError, match="did not answer"),
+    ):
+        session.diagnostics()
+
+
+def test_raises_if_the_project_is_not_loaded_in_time(tmp_path: Path) -> None:
+    project, _ = _set_up(tmp_path, mode="silent")
+    (project / "module.py").write_text("error here\n")
+
+    with (
+        _session(tmp_path, project, timeout_seconds=0.5) as session,
+        pytest.raises(PyrightSessionError, match="did not find the project's files"),
+    ):
+        session.diagnostics()
+
+
+def test_close_without_start_does_nothing(tmp_path: Path) -> None:
+    project, _ = _set_up(tmp_path)
+
+    _session(tmp_path, project).close()
+
+
+def test_close_kills_what_the_server_started(tmp_path: Path) -> None:
+    project, _ = _set_up(tmp_path, mode="orphan")
+    (project / "module.py").write_text("error here\n")
+    session = _session(tmp_path, project)
+    session.diagnostics()
+
+    start = time.monotonic()
+    session.close()
+
+    assert time.monotonic() - start < 3
@@ -0,0 +1,94 @@
+import math
+from pathlib import Path
+
+import pytest
+
+from pl_ci_cd import _resources
+from pl_ci_cd._resources import (
+    ResourceConfigError,
+    Resources,
+    detect_resources,
+    load_resource_config,
+)
+
+
+def test_defaults_to_detected_budget_and_default_weights() -> None:
+    config = load_resource_config({})
+
+    assert config.budget == detect_resources()
+    assert config.weights["types"] == Resources(1.0, 1536.0)
+    assert config.weights["format"] == Resources(1.0, 256.0)
+
+
+def test_reads_budget_and_stage_weights() -> None:
+    config = load_resource_config(
+        {
+            "resources": {
+                "cpus": 4,
+                "memory-mb": 8192,
+                "stages": {"types": {"memory-mb": 3072}, "tests": {"cpus": 2.5}},
+            }
+        }
+    )
+
+    assert config.budget == Resources(4.0, 8192.0)
+    assert config.weights["types"] == Resources(1.0, 3072.0)
+    assert config.weights["tests"] == Resources(2.5, 1024.0)
+    assert config.weights["lint"] == Resources(1.0, 256.0)
+
+
+@pytest.mark.parametrize(
+    ("tool_config", "message"),
+    [
+        ({"resources": 4}, r"\[tool.pl-ci-cd.resources\] must be a table"),
+        ({"resources": {"cpus": 0}}, "`cpus` .* must be a positive number, not 0"),
+        ({"resources": {"memory-mb": "8G"}}, "`memory-mb` .* not '8G'"),
+        ({"resources": {"cpus": True}}, "`cpus` .* not True"),
+        (
+            {"resources": {"stages": {"types": {"cpus": -1}}}},
+            r"\[tool.pl-ci-cd.resources.stages.types\]",
+        ),
+        (
+            {"resources": {"stages": {"docs": {}}}},
+            "Unknown stage\\(s\\) .*: docs. Known stages: format, lint, types, tests",
+        ),
+    ],
+)
+def test_rejects_invalid_config(tool_config: dict[str, object], message: str) -> None:
+    with pytest.raises(ResourceConfigError, match=message):
+        load_resource_config(tool_config)
+
+
+def test_detects_the_cgroup_memory_limit(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    memory_max = tmp_path / "memory.max"
+    memory_max.write_text(f"{64 * 2**20}\n")
+    monkeypatch.setattr(_resources, "_CGROUP_MEMORY_MAX", memory_max)
+
+    assert detect_resources().memory_mb == 64.0
+
+
+def test_ignores_an_unlimited_cgroup(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    memory_max = tmp_path / "memory.max"
+    memory_max.write_text("max\n")
+    monkeypatch.setattr(_resources, "_CGROUP_MEMORY_MAX", memory_max)
+    monkeypatch.setattr(_resources, "_MEMINFO", tmp_path / "meminfo")
+    (tmp_path / "meminfo").write_text("MemTotal: 4096 kB\nMemAvailable: 2048 kB\n")
+
+    assert detect_resources().memory_mb == 2.0
+
+
+def test_is_unlimited_where_nothing_is_known(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(_resources, "_CGROUP_MEMORY_MAX", tmp_path / "missing")
+    monkeypatch.setattr(_resources, "_MEMINFO", tmp_path / "meminfo")
+    (tmp_path / "meminfo").write_text("MemTotal: 4096 kB\n")
+
+    resources = detect_resources()
+
+    assert resources.memory_mb == math.inf
+    assert resources.cpus >= 1
@@ -4,10 +4,13 @@ from textwrap import dedent
 import pytest
 from pl_tiny_clients.initialize_uv_project import initialize_uv_project
 
+from pl_ci_cd._failed_tests import load_failed_tests
 from pl_ci_cd._run_unit_tests_and_coverage import (
     CoverageOrTestsError,
+    run_failed_tests,
     run_unit_tests_and_coverage,
 )
+from pl_ci_cd._tool_environment import UV_RUN
 from pl_ci_cd.testing._set_up import set_up_run_unit_tests_and_coverage
 
 from .constants import PYTEST_SLOW_MARKER
@@ -95,3 +98,25 @@ def test_run_unit_tests_and_coverage__coverage_file_written_to_directory(
     run_unit_tests_and_coverage(tmp_path)
 
     assert (tmp_path / ".coverage").exists()
+
+
+def test_remembers_failed_tests_for_the_next_run(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test_ok.py").write_text(
+        dedent("""\
+        def test_ok(): assert False
+    """)
+    )
+
+    with pytest.raises(CoverageOrTestsError):
+        run_unit_tests_and_coverage(tmp_path)
+
+    assert load_failed_tests(tmp_path) == ["test_ok.py::test_ok"]
+    assert run_failed_tests(tmp_path, UV_RUN, ["test_ok.py::test_ok"]).returncode == 1
+
+
+def test_a_renamed_failed_test_is_not_found(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    (tmp_path / "test_ok.py").write_text("def test_renamed(): assert False\n")
+
+    assert run_failed_tests(tmp_path, UV_RUN, ["test_ok.py::test_ok"]).returncode == 4
@@ -0,0 +1,198 @@
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+from pl_mocks_and_fakes import mock_for, stub
+from pl_run_program import ProgramResult
+
+from pl_ci_cd._cache import CACHE_DIR_NAME
+from pl_ci_cd._run_unit_tests_and_coverage import CoverageOrTestsError, write_args_file
+from pl_ci_cd._sharded_tests import (
+    DURATIONS_NAME,
+    balance_shards,
+    collect_test_ids,
+    combine_coverage,
+    load_durations,
+    parse_junit_durations,
+    run_pytest_shard,
+    run_sharded_unit_tests_and_coverage,
+    save_durations,
+)
+from pl_ci_cd._tool_environment import UV_RUN, ToolEnvironment
+
+COLLECTED = dedent("""\
+    tests/a_test.py::test_1
+    tests/a_test.py::test_2
+    tests/b_test.py::TestB::test_3[x]
+
+    3 tests collected in 0.01s
+""")
+
+
+def _junit_report(*cases: tuple[str, str, str, float]) -> str:
+    testcases = "".join(
+        f'<testcase file="{file}" classname="{classname}" name="{name}" time="{time}" />'
+        for file, classname, name, time in cases
+    )
+    return f'<?xml version="1.0"?><testsuites><testsuite name="pytest">{testcases}</testsuite></testsuites>'
+
+
+def test_balances_longest_tests_first() -> None:
+    durations = {"a": 5.0, "b": 4.0, "c": 3.0, "d": 3.0, "e": 1.0}
+
+    shards = balance_shards(["a", "b", "c", "d", "e"], durations, 2)
+
+    assert shards == [["a", "d"], ["b", "c", "e"]]
+
+
+def test_assumes_the_median_duration_for_unrecorded_tests() -> None:
+    durations = {"a": 10.0, "b": 1.0, "c": 2.0, "d": 3.0}
+
+    shards = balance_shards(["a", "b", "c", "d", "new"], durations, 2)
+
+    assert shards == [["a"], ["b", "c", "d", "new"]]
+
+
+def test_never_makes_more_shards_than_tests() -> None:
+    assert balance_shards(["a", "b"], {}, 8) == [["a"], ["b"]]
+    assert balance_shards([], {}, 8) == []
+
+
+def test_parses_test_ids_and_durations_from_junit_reports() -> None:
+    report = _junit_report(
+        ("tests/a_test.py", "tests.a_test", "test_1", 0.5),
+        ("tests/b_test.py", "tests.b_test.TestB", "test_3[x]", 2),
+    )
+
+    assert parse_junit_durations(report) == {
+        "tests/a_test.py::test_1": 0.5,
+        "tests/b_test.py::TestB::test_3[x]": 2.0,
+    }
+
+
+def test_skips_junit_cases_without_a_file() -> None:
+    report = (
+        '<testsuite><testcase classname="" name="collection" time="0" /></testsuite>'
+    )
+
+    assert parse_junit_durations(report) == {}
+
+
+def test_durations_round_trip(tmp_path: Path) -> None:
+    save_durations(tmp_path / DURATIONS_NAME, {"a": 1.5})
+
+    assert load_durations(tmp_path / DURATIONS_NAME) == {"a": 1.5}
+
+
+@pytest.mark.parametrize("contents", ["not json", "[]", '{"a": "slow"}'])
+def test_unreadable_durations_are_ignored(tmp_path: Path, contents: str) -> None:
+    (tmp_path / DURATIONS_NAME).write_text(contents)
+
+    assert load_durations(tmp_path / DURATIONS_NAME) == {}
+
+
+def _write_junit_reports(
+    directory: Path, tools: ToolEnvironment, index: int, test_ids: list[str]
+) -> ProgramResult:
+    del tools
+    report = _junit_report(
+        *(
+            (
+                test.partition("::")[0],
+                test.partition("::")[0].removesuffix(".py").replace("/", "."),
+                test.rpartition("::")[2],
+                1.0,
+            )
+            for test in test_ids
+        )
+    )
+    shards_dir = directory / CACHE_DIR_NAME / "shards"
+    (shards_dir / f"shard-{index}.xml").write_text(report)
+    (shards_dir / f".coverage.{index}").write_text("")
+    return ProgramResult("", "", 0)
+
+
+def test_runs_each_shard_and_combines_coverage(tmp_path: Path) -> None:
+    stub(collect_test_ids)(ProgramResult(COLLECTED, "", 0))
+    mock_for(run_pytest_shard).side_effect = _write_junit_reports
+
+    run_sharded_unit_tests_and_coverage(tmp_path, workers=2)
+
+    calls = mock_for(run_pytest_shard).call_args_list
+    assert sorted(tuple(call.args[3]) for call in calls) == [
+        ("tests/a_test.py::test_1", "tests/b_test.py::TestB::test_3[x]"),
+        ("tests/a_test.py::test_2",),
+    ]
+    shards_dir = tmp_path / CACHE_DIR_NAME / "shards"
+    mock_for(combine_coverage).assert_called_once_with(
+        tmp_path,
+        UV_RUN,
+        [str(shards_dir / ".coverage.0"), str(shards_dir / ".coverage.1")],
+    )
+    assert load_durations(tmp_path / CACHE_DIR_NAME / DURATIONS_NAME) == {
+        "tests/a_test.py::test_1": 1.0,
+        "tests/a_test.py::test_2": 1.0,
+        "tests/b_test.py::test_3[x]": 1.0,
+    }
+
+
+def test_defaults_to_one_shard_per_cpu(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("os.cpu_count", lambda: 2)
+    stub(collect_test_ids)(ProgramResult(COLLECTED, "", 0))
+
+    run_sharded_unit_tests_and_coverage(tmp_path)
+
+    assert mock_for(run_pytest_shard).call_count == 2
+
+
+def test_removes_files_from_earlier_runs(tmp_path: Path) -> None:
+    shards_dir = tmp_path / CACHE_DIR_NAME / "shards"
+    shards_dir.mkdir(parents=True)
+    (shards_dir / ".coverage.7").write_text("")
+
+    run_sharded_unit_tests_and_coverage(tmp_path)
+
+    assert not (shards_dir / ".coverage.7").exists()
+
+
+def test_raises_if_collection_fails(tmp_path: Path) -> None:
+    stub(collect_test_ids)(ProgramResult("", "ImportError", 2))
+
+    with pytest.raises(CoverageOrTestsError, match="Collecting tests failed"):
+        run_sharded_unit_tests_and_coverage(tmp_path)
+
+
+def test_raises_if_a_shard_fails(tmp_path: Path) -> None:
+    stub(collect_test_ids)(ProgramResult(COLLECTED, "", 0))
+    mock_for(run_pytest_shard).side_effect = [
+        ProgramResult("", "", 0),
+        ProgramResult("1 failed", "", 1),
+    ]
+
+    with pytest.raises(CoverageOrTestsError, match="1 failed"):
+        run_sharded_unit_tests_and_coverage(tmp_path, workers=2)
+
+    mock_for(combine_coverage).assert_not_called()
+
+
+def test_raises_if_combined_coverage_is_below_100(tmp_path: Path) -> None:
+    stub(combine_coverage)(ProgramResult("TOTAL 90%", "", 2))
+
+    with pytest.raises(CoverageOrTestsError, match="TOTAL 90%"):
+        run_sharded_unit_tests_and_coverage(tmp_path)
+
+
+def test_passes_test_ids_through_an_args_file(tmp_path: Path) -> None:
+    args_file = tmp_path / "shard-0.args"
+
+    arg = write_args_file(
+        args_file, ["tests/a_test.py::test_1", "tests/a_test.py::test_2"]
+    )
+
+    assert arg == f"@{args_file}"
+    assert args_file.read_text().splitlines() == [
+        "tests/a_test.py::test_1",
+        "tests/a_test.py::test_2",
+    ]
@@ -0,0 +1,132 @@
+from pathlib import Path
+
+import pytest
+
+from pl_ci_cd import _ship_jobs
+from pl_ci_cd._ship_jobs import (
+    DONE,
+    FAILED,
+    QUEUED,
+    SUPERSEDED,
+    ShipJob,
+    ShipJobs,
+    run_jobs,
+)
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self.commits: list[str] = []
+
+    def __call__(self, job: ShipJob) -> None:
+        self.commits.append(job.commit)
+
+
+def _statuses(jobs: ShipJobs) -> list[tuple[str, str]]:
+    return [(job.commit, job.status) for job in jobs.all()]
+
+
+def test_runs_only_the_newest_of_several_queued_jobs(tmp_path: Path) -> None:
+    jobs = ShipJobs(tmp_path)
+    jobs.add("first")
+    jobs.add("second")
+    newest = jobs.add("third")
+    recorder = _Recorder()
+
+    run_jobs(jobs, recorder)
+
+    assert recorder.commits == ["third"]
+    assert _statuses(jobs) == [
+        ("first", SUPERSEDED),
+        ("second", SUPERSEDED),
+        ("third", DONE),
+    ]
+    assert jobs.all()[0].message == f"Superseded by {newest.id}."
+
+
+def test_records_why_a_job_failed(tmp_path: Path) -> None:
+    jobs = ShipJobs(tmp_path)
+    jobs.add("commit")
+
+    def _fail(_job: ShipJob) -> None:
+        msg = "Deploy failed with return code 1."
+        raise RuntimeError(msg)
+
+    run_jobs(jobs, _fail)
+
+    [job] = jobs.all()
+    assert job.status == FAILED
+    assert job.message == "Deploy failed with return code 1."
+    assert job.finished_at is not None
+
+
+def test_reruns_a_job_whose_worker_died(tmp_path: Path) -> None:
+    jobs = ShipJobs(tmp_path)
+    jobs.add("commit")
+    jobs.claim_newest()
+    recorder = _Recorder()
+
+    run_jobs(jobs, recorder)
+
+    assert recorder.commits == ["commit"]
+    assert _statuses(jobs) == [("commit", DONE)]
+
+
+def test_leaves_jobs_to_the_worker_already_running(tmp_path: Path) -> None:
+    jobs = ShipJobs(tmp_path)
+    jobs.add("commit")
+    recorder = _Recorder()
+
+    with jobs.worker_lock() as acquired:
+        assert acquired
+        run_jobs(jobs, recorder)
+
+    assert recorder.commits == []
+    assert _statuses(jobs) == [("commit", QUEUED)]
+
+
+class _JobArrivesLate(ShipJobs):
+    """Jobs whose only job shows up just after the worker last looked for one."""
+
+    def __init__(self, git_common_dir: Path) -> None:
+        super().__init__(git_common_dir)
+        self.looked = False
+
+    def claim_newest(self) -> ShipJob | None:
+        if not self.looked:
+            self.looked = True
+            return None
+        return super().claim_newest()
+
+
+def test_runs_a_job_queued_while_the_worker_was_finishing(tmp_path: Path) -> None:
+    jobs = _JobArrivesLate(tmp_path)
+    jobs.add("commit")
+    recorder = _Recorder()
+
+    run_jobs(jobs, recorder)
+
+    assert recorder.commits == ["commit"]
+
+
+def test_keeps_only_the_most_recent_finished_jobs(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(_ship_jobs, "MAX_FINISHED_JOBS", 1)
+    jobs = ShipJobs(tmp_path)
+    for commit in ("first", "second"):
+        jobs.add(commit)
+        run_jobs(jobs, _Recorder())
+
+    jobs.add("third")
+
+    assert _statuses(jobs) == [("second", DONE), ("third", QUEUED)]
+
+
+def test_skips_jobs_pruned_while_listing(tmp_path: Path) -> None:
+    jobs = ShipJobs(tmp_path)
+    jobs.add("kept")
+    # Listed like a job, but gone by the time it is read, as a job a worker just pruned.
+    (jobs.directory / "0-pruned.json").symlink_to(tmp_path / "pruned.json")
+
+    assert _statuses(jobs) == [("kept", QUEUED)]
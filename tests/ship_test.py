@@ -1,3 +1,5 @@
+import json
+import subprocess
 from collections.abc import Callable
 from dataclasses import dataclass
 from pathlib import Path
@@ -6,17 +8,23 @@ import pytest
 from pl_mocks_and_fakes import mock_for
 from pl_run_program import run_simple_program
 from pl_tiny_clients.git_push import git_push
-from pl_user_io.testing.user_io_fake import assert_displayed_in_order
+from pl_user_io.testing.user_io_fake import assert_displayed, assert_displayed_in_order
 
-from pl_ci_cd._constants import GIT_PROGRAM
-from pl_ci_cd.ship import fix_with_agent, ship
+from pl_ci_cd._ci_ledger import CiLedger
+from pl_ci_cd._constants import git_program
+from pl_ci_cd._git_session import GitSession
+from pl_ci_cd._merge_queue import FAILED, SHIPPED, MergeQueue, QueueEntry, reload
+from pl_ci_cd._ship import fix_with_agent, ship
+from pl_ci_cd._ship_jobs import DONE, ShipJobs, start_worker
+from pl_ci_cd._ship_jobs import FAILED as JOB_FAILED
+from pl_ci_cd._ship_worker import run_worker
 
 MAIN = "main"
 TOUCH = "/usr/bin/touch"
 
 
 def _git(cwd: Path, *args: str) -> str:
-    return run_simple_program(GIT_PROGRAM, list(args), cwd=cwd)
+    return run_simple_program(git_program(), list(args), cwd=cwd)
 
 
 @dataclass
@@ -116,6 +124,16 @@ def test_errors_if_deploy_script_missing(worktree_fixture: WorktreeFixture) -> N
         worktree_fixture.run_ship()
 
 
+def test_errors_outside_a_git_repository(tmp_path: Path) -> None:
+    ship_dir = tmp_path / ".ship"
+    ship_dir.mkdir()
+    _write_script(ship_dir / "test", "")
+    _write_script(ship_dir / "deploy", "")
+
+    with pytest.raises(RuntimeError, match="not in a git repository"):
+        ship(repo_dir=tmp_path)
+
+
 def test_worktree_merges_changes_into_main(worktree_fixture: WorktreeFixture) -> None:
     (worktree_fixture.worktree_dir / "feature.py").write_text('print("hello")\n')
 
@@ -156,6 +174,30 @@ def test_worktree_displays_progress_for_each_phase(
     )
 
 
+def test_worktree_traces_each_phase(
+    tmp_path: Path, worktree_fixture: WorktreeFixture
+) -> None:
+    (worktree_fixture.worktree_dir / "feature.py").write_text('print("hello")\n')
+    trace = tmp_path / "trace.json"
+
+    ship(
+        worktree=worktree_fixture.worktree_dir,
+        repo_dir=worktree_fixture.repo_dir,
+        trace=trace,
+    )
+
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert [event["name"] for event in events if event["ph"] == "X"] == [
+        "ship",
+        "Commit",
+        "Rebase",
+        "CI",
+        "Merge",
+        "Push",
+        "Deploy",
+    ]
+
+
 def test_worktree_ci_failure_unstages_changes_without_modifying_main(
     tmp_path: Path, worktree_fixture: WorktreeFixture
 ) -> None:
@@ -341,3 +383,494 @@ def test_displays_progress_without_rebase_or_merge(
         "Deploying",
         "Shipped.",
     )
+
+
+def _queue(repo_dir: Path) -> MergeQueue:
+    return MergeQueue(repo_dir / ".git")
+
+
+def _queue_worktree(
+    repo_dir: Path, tmp_path: Path, branch: str, files: dict[str, str]
+) -> QueueEntry:
+    """Queue a committed worktree the way another `ship --queue` process would."""
+    worktree = tmp_path / branch
+    _git(repo_dir, "worktree", "add", "-b", branch, str(worktree))
+    for name, content in files.items():
+        (worktree / name).write_text(content)
+    _git(worktree, "add", "-A")
+    _git(worktree, "commit", "-m", "Commit")
+    return _queue(repo_dir).enqueue(worktree, branch, _head(worktree))
+
+
+def _head(worktree: Path) -> str:
+    return _git(worktree, "rev-parse", "HEAD").strip()
+
+
+def _set_ci(repo_dir: Path, body: str) -> None:
+    _write_script(repo_dir / ".ship" / "test", body)
+    _git(repo_dir, "add", "-A")
+    _git(repo_dir, "commit", "-m", "set test script")
+
+
+def _ship_queued(fixture: WorktreeFixture) -> None:
+    ship(worktree=fixture.worktree_dir, repo_dir=fixture.repo_dir, queue=True)
+
+
+def test_queue_needs_a_worktree(main_fixture: MainFixture) -> None:
+    with pytest.raises(RuntimeError, match="`--queue` needs `--worktree`"):
+        ship(repo_dir=main_fixture.repo_dir, queue=True)
+
+
+def test_queue_errors_if_repo_dir_is_dirty(worktree_fixture: WorktreeFixture) -> None:
+    (worktree_fixture.repo_dir / "dirty.txt").write_text("uncommitted\n")
+
+    with pytest.raises(RuntimeError, match="Commit or stash changes first"):
+        _ship_queued(worktree_fixture)
+
+
+def test_queue_ships_a_lone_worktree(worktree_fixture: WorktreeFixture) -> None:
+    (worktree_fixture.worktree_dir / "feature.py").write_text('print("hello")\n')
+
+    _ship_queued(worktree_fixture)
+
+    assert (worktree_fixture.repo_dir / "feature.py").exists()
+    assert _git(worktree_fixture.repo_dir, "rev-parse", "HEAD") == _git(
+        worktree_fixture.worktree_dir, "rev-parse", "HEAD"
+    )
+    assert_displayed_in_order(
+        "Queued feature for the merge train.",
+        "Merge train: feature",
+        "Running CI",
+        f"Fast-forward merging feature into {MAIN}",
+        "Shipped.",
+    )
+    assert _queue(worktree_fixture.repo_dir).pending() == []
+
+
+def test_queue_runs_ci_once_for_a_train(
+    tmp_path: Path, worktree_fixture: WorktreeFixture
+) -> None:
+    ci_runs = tmp_path / "ci_runs.txt"
+    _set_ci(worktree_fixture.repo_dir, f"echo run >> {ci_runs}")
+    other = _queue_worktree(
+        worktree_fixture.repo_dir, tmp_path, "other", {"other.py": "x = 1\n"}
+    )
+    (worktree_fixture.worktree_dir / "feature.py").write_text('print("hello")\n')
+
+    _ship_queued(worktree_fixture)
+
+    assert (worktree_fixture.repo_dir / "other.py").exists()
+    assert (worktree_fixture.repo_dir / "feature.py").exists()
+    assert ci_runs.read_text() == "run\n"
+    assert_displayed_in_order(
+        "Merge train: other, feature",
+        f"Fast-forward merging other, feature into {MAIN}",
+    )
+    assert reload(other).status == SHIPPED
+    mock_for(git_push).assert_called_once()
+
+
+def test_queue_bisects_a_failing_train_and_ships_the_rest(
+    tmp_path: Path, worktree_fixture: WorktreeFixture
+) -> None:
+    _set_ci(worktree_fixture.repo_dir, "test ! -e broken.py")
+    first = _queue_worktree(
+        worktree_fixture.repo_dir, tmp_path, "first", {"first.py": "x = 1\n"}
+    )
+    breaking = _queue_worktree(
+        worktree_fixture.repo_dir, tmp_path, "breaking", {"broken.py": "x = 1\n"}
+    )
+    (breaking.worktree / "notes.txt").write_text("untracked\n")
+    (worktree_fixture.worktree_dir / "feature.py").write_text('print("hello")\n')
+
+    _ship_queued(worktree_fixture)
+
+    assert (worktree_fixture.repo_dir / "first.py").exists()
+    assert (worktree_fixture.repo_dir / "feature.py").exists()
+    assert not (worktree_fixture.repo_dir / "broken.py").exists()
+    assert reload(first).status == SHIPPED
+    rejected = reload(breaking)
+    assert rejected.status == FAILED
+    assert "CI failed with breaking" in rejected.message
+    # The train ran CI in a scratch worktree, so the other agents' worktrees are as they left them.
+    assert _head(breaking.worktree) == breaking.commit
+    assert _git(breaking.worktree, "status", "--porcelain") == "?? notes.txt\n"
+    assert _head(first.worktree) == first.commit
+    assert_displayed_in_order(
+        "Merge train: first, breaking, feature",
+        "Bisecting: running CI on the train up to first",
+        "Bisecting: running CI on the train up to breaking",
+        "✗ breaking",
+        f"Fast-forward merging first into {MAIN}",
+        "Merge train: feature",
+        f"Fast-forward merging feature into {MAIN}",
+    )
+    assert mock_for(git_push).call_count == 2
+
+
+def test_queue_keeps_ci_fixes_for_the_prefix_a_bisect_ships(
+    tmp_path: Path, worktree_fixture: WorktreeFixture
+) -> None:
+    _set_ci(worktree_fixture.repo_dir, "echo fixed > ci_fix.txt\ntest ! -e broken.py")
+    first, second, third = (
+        _queue_worktree(
+            worktree_fixture.repo_dir, tmp_path, name, {f"{name}.py": "x = 1\n"}
+        )
+        for name in ("first", "second", "third")
+    )
+    (worktree_fixture.worktree_dir / "broken.py").write_text("x = 1\n")
+
+    with pytest.raises(RuntimeError, match="CI failed with feature"):
+        _ship_queued(worktree_fixture)
+
+    assert [reload(entry).status for entry in (first, second, third)] == [
+        SHIPPED,
+        SHIPPED,
+        SHIPPED,
+    ]
+    assert _head(worktree_fixture.repo_dir) == reload(third).commit
+    shipped_files = _git(
+        worktree_fixture.repo_dir, "ls-tree", "--name-only", "HEAD"
+    ).split()
+    assert "ci_fix.txt" in shipped_files
+    assert "broken.py" not in shipped_files
+    assert_displayed_in_order(
+        "Bisecting: running CI on the train up to second",
+        "Bisecting: running CI on the train up to third",
+        f"Fast-forward merging first, second, third into {MAIN}",
+    )
+
+
+def test_queue_rejects_the_train_when_ci_raises(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, worktree_fixture: WorktreeFixture
+) -> None:
+    def _raise(_train: list[QueueEntry], _ci: object, _scratch: Path) -> int:
+        msg = "disk full"
+        raise OSError(msg)
+
+    monkeypatch.setattr("pl_ci_cd._ship._passing_prefix", _raise)
+    main_head = _git(worktree_fixture.repo_dir, "rev-parse", "HEAD")
+    other = _queue_worktree(
+        worktree_fixture.repo_dir, tmp_path, "other", {"other.py": "x = 1\n"}
+    )
+    (worktree_fixture.worktree_dir / "feature.py").write_text('print("hello")\n')
+
+    with pytest.raises(OSError, match="disk full"):
+        _ship_queued(worktree_fixture)
+
+    assert _git(worktree_fixture.repo_dir, "rev-parse", "HEAD") == main_head
+    rejected = reload(other)
+    assert rejected.status == FAILED
+    assert rejected.message == "The merge train failed: disk full"
+    assert "feature.py" in _git(worktree_fixture.worktree_dir, "status", "--porcelain")
+    assert _queue(worktree_fixture.repo_dir).pending() == []
+    mock_for(git_push).assert_not_called()
+
+
+def test_queue_rejects_an_entry_whose_ship_exited(
+    tmp_path: Path, worktree_fixture: WorktreeFixture
+) -> None:
+    orphan = _queue_worktree(
+        worktree_fixture.repo_dir, tmp_path, "orphan", {"orphan.py": "x = 1\n"}
+    )
+    exited = subprocess.Popen(["/bin/true"])
+    exited.wait()
+    orphan.owner = exited.pid
+    orphan.save()
+    (worktree_fixture.worktree_dir / "feature.py").write_text('print("hello")\n')
+
+    _ship_queued(worktree_fixture)
+
+    rejected = reload(orphan)
+    assert rejected.status == FAILED
+    assert rejected.message == "The `ship` that queued orphan is no longer running."
+    assert not (worktree_fixture.repo_dir / "orphan.py").exists()
+    assert (worktree_fixture.repo_dir / "feature.py").exists()
+
+
+def test_queue_rejects_an_entry_whose_worktree_was_removed(
+    tmp_path: Path, worktree_fixture: WorktreeFixture
+) -> None:
+    removed = _queue_worktree(
+        worktree_fixture.repo_dir, tmp_path, "removed", {"removed.py": "x = 1\n"}
+    )
+    _git(worktree_fixture.repo_dir, "worktree", "remove", str(removed.worktree))
+    (worktree_fixture.worktree_dir / "feature.py").write_text('print("hello")\n')
+
+    _ship_queued(worktree_fixture)
+
+    rejected = reload(removed)
+    assert rejected.status == FAILED
+    assert rejected.message == f"The worktree {removed.worktree} no longer exists."
+    assert (worktree_fixture.repo_dir / "feature.py").exists()
+
+
+def test_queue_rejects_the_branch_that_breaks_ci(
+    worktree_fixture: WorktreeFixture,
+) -> None:
+    _set_ci(worktree_fixture.repo_dir, "test ! -e broken.py")
+    main_head = _git(worktree_fixture.repo_dir, "rev-parse", "HEAD")
+    (worktree_fixture.worktree_dir / "broken.py").write_text("x = 1\n")
+
+    with pytest.raises(RuntimeError, match="CI failed with feature"):
+        _ship_queued(worktree_fixture)
+
+    assert _git(worktree_fixture.repo_dir, "rev-parse", "HEAD") == main_head
+    assert "broken.py" in _git(worktree_fixture.worktree_dir, "status", "--porcelain")
+    mock_for(git_push).assert_not_called()
+
+
+def test_queue_rejects_a_branch_that_conflicts_with_the_train(
+    tmp_path: Path, worktree_fixture: WorktreeFixture
+) -> None:
+    other = _queue_worktree(
+        worktree_fixture.repo_dir, tmp_path, "other", {"items.py": 'items = ["b"]\n'}
+    )
+    (worktree_fixture.worktree_dir / "items.py").write_text('items = ["c"]\n')
+
+    with pytest.raises(RuntimeError, match="conflicted"):
+        _ship_queued(worktree_fixture)
+
+    assert reload(other).status == SHIPPED
+    assert (worktree_fixture.repo_dir / "items.py").read_text() == 'items = ["b"]\n'
+    assert "items.py" in _git(worktree_fixture.worktree_dir, "status", "--porcelain")
+
+
+def test_queue_rejects_the_train_when_deploy_fails(
+    worktree_fixture: WorktreeFixture,
+) -> None:
+    _write_script(worktree_fixture.deploy_script, "exit 1")
+    _git(worktree_fixture.repo_dir, "add", "-A")
+    _git(worktree_fixture.repo_dir, "commit", "-m", "set deploy script")
+    (worktree_fixture.worktree_dir / "feature.py").write_text('print("hello")\n')
+
+    with pytest.raises(RuntimeError, match="Deploy failed"):
+        _ship_queued(worktree_fixture)
+
+
+def test_queue_rejects_a_lone_branch_that_conflicts_with_main(
+    worktree_fixture: WorktreeFixture,
+) -> None:
+    _create_rebase_conflict(worktree_fixture.repo_dir, worktree_fixture.worktree_dir)
+    main_head = _git(worktree_fixture.repo_dir, "rev-parse", "HEAD")
+
+    with pytest.raises(RuntimeError, match="conflicted"):
+        _ship_queued(worktree_fixture)
+
+    assert _git(worktree_fixture.repo_dir, "rev-parse", "HEAD") == main_head
+    mock_for(fix_with_agent).assert_not_called()
+    mock_for(git_push).assert_not_called()
+
+
+def _reship_same_tree(
+    main_fixture: MainFixture, ci_runs: Path, *, force_ci: bool
+) -> None:
+    _set_ci(main_fixture.repo_dir, f"echo run >> {ci_runs}")
+    (main_fixture.repo_dir / "feature.py").write_text('print("hello")\n')
+    main_fixture.run_ship()
+    _git(main_fixture.repo_dir, "reset", "--mixed", "HEAD~1")
+
+    ship(repo_dir=main_fixture.repo_dir, force_ci=force_ci)
+
+
+def test_skips_ci_for_a_tree_that_already_passed(
+    tmp_path: Path, main_fixture: MainFixture
+) -> None:
+    ci_runs = tmp_path / "ci_runs.txt"
+
+    _reship_same_tree(main_fixture, ci_runs, force_ci=False)
+
+    assert ci_runs.read_text() == "run\n"
+    assert_displayed("Skipping CI: tree")
+    assert _git(main_fixture.repo_dir, "status", "--porcelain") == ""
+
+
+def test_force_ci_runs_ci_for_a_tree_that_already_passed(
+    tmp_path: Path, main_fixture: MainFixture
+) -> None:
+    ci_runs = tmp_path / "ci_runs.txt"
+
+    _reship_same_tree(main_fixture, ci_runs, force_ci=True)
+
+    assert ci_runs.read_text() == "run\nrun\n"
+
+
+def test_records_the_tree_with_ci_fixes_as_passing(
+    worktree_fixture: WorktreeFixture,
+) -> None:
+    _set_ci(worktree_fixture.repo_dir, "echo fixed > messy.py")
+    (worktree_fixture.worktree_dir / "messy.py").write_text("messy\n")
+
+    worktree_fixture.run_ship()
+
+    ledger = CiLedger(
+        worktree_fixture.repo_dir / ".git",
+        worktree_fixture.repo_dir / ".ship" / "test",
+    )
+    assert ledger.has_passed(
+        _git(worktree_fixture.repo_dir, "rev-parse", "HEAD^{tree}").strip()
+    )
+
+
+def test_stages_the_tree_only_to_hash_uncommitted_changes(
+    monkeypatch: pytest.MonkeyPatch, worktree_fixture: WorktreeFixture
+) -> None:
+    def _no_staging(_session: GitSession) -> str:
+        msg = "staged a committed tree"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr(GitSession, "working_tree", _no_staging)
+    (worktree_fixture.worktree_dir / "feature.py").write_text('print("hello")\n')
+
+    worktree_fixture.run_ship()
+
+    assert (worktree_fixture.repo_dir / "feature.py").exists()
+
+
+def test_runs_ci_again_for_a_tree_that_failed(
+    tmp_path: Path, main_fixture: MainFixture
+) -> None:
+    ci_runs = tmp_path / "ci_runs.txt"
+    _set_ci(main_fixture.repo_dir, f"echo run >> {ci_runs}\nexit 1")
+    (main_fixture.repo_dir / "feature.py").write_text('print("hello")\n')
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="CI failed"):
+            main_fixture.run_ship()
+
+    assert ci_runs.read_text() == "run\nrun\n"
+
+
+def test_worktree_rebase_leaves_files_main_did_not_change_alone(
+    worktree_fixture: WorktreeFixture,
+) -> None:
+    feature = worktree_fixture.worktree_dir / "feature.py"
+    feature.write_text('print("hello")\n')
+    (worktree_fixture.repo_dir / "other.py").write_text("x = 1\n")
+    _git(worktree_fixture.repo_dir, "add", "-A")
+    _git(worktree_fixture.repo_dir, "commit", "-m", "main moves on")
+    before = feature.stat().st_mtime_ns
+
+    worktree_fixture.run_ship()
+
+    assert feature.stat().st_mtime_ns == before
+    assert (worktree_fixture.worktree_dir / "other.py").read_text() == "x = 1\n"
+    assert (worktree_fixture.repo_dir / "feature.py").exists()
+
+
+def test_worktree_rebases_in_the_worktree_only_on_conflict(
+    worktree_fixture: WorktreeFixture,
+) -> None:
+    _create_rebase_conflict(worktree_fixture.repo_dir, worktree_fixture.worktree_dir)
+    _stub_agent(lambda _prompt: None)
+
+    with pytest.raises(RuntimeError, match="irreconcilable"):
+        worktree_fixture.run_ship()
+
+    assert_displayed("The rebase conflicts. Rebasing in the worktree to resolve it...")
+
+
+def _add_origin(tmp_path: Path, repo_dir: Path) -> Path:
+    origin = tmp_path / "origin.git"
+    _git(tmp_path, "init", "--bare", str(origin))
+    _git(repo_dir, "remote", "add", "origin", str(origin))
+    return origin
+
+
+def _ship_detached(
+    tmp_path: Path, worktree_fixture: WorktreeFixture, deploy: str
+) -> Path:
+    """Ship the worktree with `--detach` and a deploy script running `deploy`, returning `origin`."""
+    origin = _add_origin(tmp_path, worktree_fixture.repo_dir)
+    _write_script(worktree_fixture.deploy_script, deploy)
+    _git(worktree_fixture.repo_dir, "add", "-A")
+    _git(worktree_fixture.repo_dir, "commit", "-m", "set deploy script")
+    (worktree_fixture.worktree_dir / "feature.py").write_text('print("hello")\n')
+
+    ship(
+        worktree=worktree_fixture.worktree_dir,
+        repo_dir=worktree_fixture.repo_dir,
+        detach=True,
+    )
+    return origin
+
+
+def test_detach_hands_push_and_deploy_to_the_worker(
+    tmp_path: Path, worktree_fixture: WorktreeFixture
+) -> None:
+    marker = tmp_path / "deployed.txt"
+    origin = _ship_detached(tmp_path, worktree_fixture, f"{TOUCH} {marker}")
+
+    assert_displayed_in_order(
+        f"Fast-forward merging feature into {MAIN}",
+        "Pushing and deploying in the background as job",
+        "Queued for shipping.",
+    )
+    mock_for(start_worker).assert_called_once()
+    mock_for(git_push).assert_not_called()
+    assert not marker.exists()
+
+    run_worker(worktree_fixture.repo_dir)
+
+    assert marker.exists()
+    [job] = ShipJobs(worktree_fixture.repo_dir / ".git").all()
+    assert job.status == DONE
+    assert job.commit == _git(worktree_fixture.repo_dir, "rev-parse", MAIN).strip()
+    assert _git(origin, "rev-parse", MAIN) == _git(
+        worktree_fixture.repo_dir, "rev-parse", MAIN
+    )
+
+
+def test_the_worker_ships_the_commit_it_was_given_after_main_moves_on(
+    tmp_path: Path, worktree_fixture: WorktreeFixture
+) -> None:
+    deployed = tmp_path / "deployed.txt"
+    origin = _ship_detached(tmp_path, worktree_fixture, f"cat feature.py > {deployed}")
+    [job] = ShipJobs(worktree_fixture.repo_dir / ".git").all()
+    (worktree_fixture.repo_dir / "feature.py").write_text('print("later")\n')
+    _git(worktree_fixture.repo_dir, "commit", "-am", "main moves on")
+    (worktree_fixture.repo_dir / "feature.py").write_text("uncommitted\n")
+
+    run_worker(worktree_fixture.repo_dir)
+
+    assert deployed.read_text() == 'print("hello")\n'
+    assert _git(origin, "rev-parse", MAIN).strip() == job.commit
+    assert len(_git(worktree_fixture.repo_dir, "worktree", "list").splitlines()) == 2
+
+
+def test_the_worker_fails_a_job_whose_commit_main_no_longer_contains(
+    tmp_path: Path, worktree_fixture: WorktreeFixture
+) -> None:
+    marker = tmp_path / "deployed.txt"
+    origin = _ship_detached(tmp_path, worktree_fixture, f"{TOUCH} {marker}")
+    _git(worktree_fixture.repo_dir, "reset", "--hard", "HEAD~1")
+
+    run_worker(worktree_fixture.repo_dir)
+
+    [job] = ShipJobs(worktree_fixture.repo_dir / ".git").all()
+    assert job.status == JOB_FAILED
+    assert job.message == f"{MAIN} no longer contains {job.commit[:12]}."
+    assert not marker.exists()
+    assert _git(origin, "branch") == ""
+
+
+def test_status_shows_background_jobs(main_fixture: MainFixture) -> None:
+    jobs = ShipJobs(main_fixture.repo_dir / ".git")
+    jobs.add("a" * 40)
+    jobs.add("b" * 40)
+    jobs.claim_newest()
+
+    ship(repo_dir=main_fixture.repo_dir, status=True)
+
+    assert_displayed_in_order(
+        f"running     {'b' * 12}  queued ",
+        f"superseded  {'a' * 12}  queued ",
+        ", finished ",
+        "Superseded by ",
+    )
+
+
+def test_status_without_jobs(main_fixture: MainFixture) -> None:
+    ship(repo_dir=main_fixture.repo_dir, status=True)
+
+    assert_displayed("No background ship jobs.")
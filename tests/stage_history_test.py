@@ -0,0 +1,52 @@
+from pathlib import Path
+
+import pytest
+
+from pl_ci_cd._cache import CACHE_DIR_NAME
+from pl_ci_cd._stage_history import STAGE_HISTORY_NAME, StageHistory, format_eta
+
+
+def test_weights_recent_runs_more(tmp_path: Path) -> None:
+    history = StageHistory(tmp_path)
+
+    history.record("Tests", 10.0, passed=True)
+    history.record("Tests", 20.0, passed=False)
+
+    stats = history.stats("Tests")
+    assert stats is not None
+    assert stats.runs == 2
+    assert round(stats.seconds, 3) == 13.0
+    assert round(stats.failure_rate, 3) == 0.545
+
+
+def test_is_kept_between_runs(tmp_path: Path) -> None:
+    StageHistory(tmp_path).record("Tests", 10.0, passed=True)
+
+    assert StageHistory(tmp_path).stats("Tests") == StageHistory(tmp_path).stats(
+        "Tests"
+    )
+    assert StageHistory(tmp_path).stats("Linter") is None
+
+
+@pytest.mark.parametrize("contents", ["not json", "[]", '{"Tests": {"runs": 1}}'])
+def test_unreadable_history_is_ignored(tmp_path: Path, contents: str) -> None:
+    (tmp_path / CACHE_DIR_NAME).mkdir()
+    (tmp_path / CACHE_DIR_NAME / STAGE_HISTORY_NAME).write_text(contents)
+
+    assert StageHistory(tmp_path).stats("Tests") is None
+
+
+def test_stages_that_never_fail_still_have_a_priority(tmp_path: Path) -> None:
+    history = StageHistory(tmp_path)
+    for _ in range(100):
+        history.record("Tests", 1.0, passed=True)
+
+    assert round(history.priority("Tests")) == 1000
+
+
+@pytest.mark.parametrize(
+    ("seconds", "expected"),
+    [(0.2, "<1s"), (12.4, "~12s"), (125.0, "~2m05s")],
+)
+def test_formats_estimates(seconds: float, expected: str) -> None:
+    assert format_eta(seconds) == expected
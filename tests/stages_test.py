@@ -0,0 +1,316 @@
+import os
+import signal
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+from pl_run_program import program_at_path
+from pl_user_io.testing import (
+    assert_displayed,
+    assert_displayed_in_order,
+    assert_loading_spinner_displayed,
+)
+
+from pl_ci_cd._cache import StageCache, StageInputs
+from pl_ci_cd._cancellation import run_cancellable_program
+from pl_ci_cd._resources import Resources
+from pl_ci_cd._stage_history import StageHistory
+from pl_ci_cd._stages import (
+    Stage,
+    prioritize,
+    run_stages_in_order,
+    run_stages_in_parallel,
+)
+
+SLEEP_PROGRAM = program_at_path(Path("/usr/bin/sleep"))
+PYTHON_INPUTS = StageInputs("python", frozenset({".py"}), ())
+
+
+def _pass() -> None:
+    pass
+
+
+def _fail() -> None:
+    msg = "stage failed"
+    raise RuntimeError(msg)
+
+
+def _sleep() -> None:
+    result = run_cancellable_program(SLEEP_PROGRAM, ["30"])
+    if result.returncode != 0:
+        msg = "sleep was killed"
+        raise RuntimeError(msg)
+
+
+def test_in_order_runs_stages_one_after_another() -> None:
+    calls: list[str] = []
+
+    run_stages_in_order(
+        [
+            Stage("First", lambda: calls.append("first")),
+            Stage("Second", lambda: calls.append("second")),
+        ]
+    )
+
+    assert calls == ["first", "second"]
+    assert_displayed_in_order("✓ First", "✓ Second")
+
+
+def test_in_order_stops_at_first_failure() -> None:
+    calls: list[str] = []
+
+    with pytest.raises(RuntimeError, match="stage failed"):
+        run_stages_in_order(
+            [Stage("First", _fail), Stage("Second", lambda: calls.append("second"))]
+        )
+
+    assert calls == []
+    assert_displayed("✗ First")
+
+
+def test_in_parallel_reports_each_stage() -> None:
+    run_stages_in_parallel([Stage("First", _pass), Stage("Second", _pass)])
+
+    assert_displayed("Running in parallel: First, Second")
+    assert_loading_spinner_displayed("First")
+    assert_loading_spinner_displayed("Second")
+
+
+def test_in_parallel_cancels_running_stages_on_first_failure() -> None:
+    with pytest.raises(RuntimeError, match="stage failed"):
+        run_stages_in_parallel([Stage("Sleeper", _sleep), Stage("Failer", _fail)])
+
+    assert_displayed_in_order("✗ Failer", "- Sleeper (cancelled)")
+
+
+def test_in_parallel_kills_running_stages_on_ctrl_c() -> None:
+    def _interrupt() -> None:
+        time.sleep(0.2)
+        os.kill(os.getpid(), signal.SIGINT)
+
+    threading.Thread(target=_interrupt).start()
+    start = time.monotonic()
+
+    with pytest.raises(KeyboardInterrupt):
+        run_stages_in_parallel([Stage("First", _sleep), Stage("Second", _sleep)])
+
+    assert time.monotonic() - start < 5
+
+
+def test_records_how_long_stages_take_and_whether_they_fail(tmp_path: Path) -> None:
+    history = StageHistory(tmp_path)
+
+    with pytest.raises(RuntimeError):
+        run_stages_in_order(
+            [Stage("First", _pass), Stage("Second", _fail)], history=history
+        )
+
+    first = history.stats("First")
+    second = history.stats("Second")
+    assert first is not None
+    assert first.failure_rate < 0.5
+    assert second is not None
+    assert second.failure_rate > 0.5
+
+
+def test_shows_how_long_stages_usually_take(tmp_path: Path) -> None:
+    history = StageHistory(tmp_path)
+    history.record("First", 12.0, passed=True)
+    history.record("Second", 3.0, passed=True)
+
+    run_stages_in_parallel(
+        [Stage("First", _pass), Stage("Second", _pass), Stage("Third", _pass)],
+        history=history,
+    )
+    assert_displayed("Running in parallel: First, Second, Third\n")
+
+    history.record("First", 12.0, passed=True)
+    run_stages_in_parallel(
+        [Stage("First", _pass), Stage("Second", _pass)], history=history
+    )
+    assert_displayed("Running in parallel: First, Second (~9s)")
+
+    run_stages_in_order([Stage("First", _pass)], history=history)
+    assert_loading_spinner_displayed("First (~7s)")
+
+
+def test_in_parallel_records_failures(tmp_path: Path) -> None:
+    history = StageHistory(tmp_path)
+
+    with pytest.raises(RuntimeError):
+        run_stages_in_parallel([Stage("Failer", _fail)], history=history)
+
+    failer = history.stats("Failer")
+    assert failer is not None
+    assert failer.failure_rate > 0.5
+
+
+def test_prioritizes_stages_likely_to_fail_soon(tmp_path: Path) -> None:
+    history = StageHistory(tmp_path)
+    history.record("Slow", 60.0, passed=False)
+    history.record("Fast", 1.0, passed=False)
+    history.record("Reliable", 1.0, passed=True)
+    stages = [
+        Stage("Slow", _pass),
+        Stage("Reliable", _pass),
+        Stage("Fast", _pass),
+        Stage("New", _pass),
+    ]
+
+    assert [stage.label for stage in prioritize(stages, history)] == [
+        "New",
+        "Fast",
+        "Reliable",
+        "Slow",
+    ]
+
+
+class _ConcurrencyProbe:
+    """Stage bodies that record how many of them ran at once."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._running = 0
+        self.most_at_once = 0
+
+    def stage(self, label: str, weight: Resources) -> Stage:
+        return Stage(label, self._run, weight=weight)
+
+    def _run(self) -> None:
+        with self._lock:
+            self._running += 1
+            self.most_at_once = max(self.most_at_once, self._running)
+        # Long enough for the other stages to start if the budget let them.
+        threading.Event().wait(0.05)
+        with self._lock:
+            self._running -= 1
+
+
+def test_in_parallel_starts_stages_only_within_budget() -> None:
+    probe = _ConcurrencyProbe()
+    heavy = Resources(1, 3000)
+    light = Resources(1, 100)
+
+    run_stages_in_parallel(
+        [
+            probe.stage("Heavy", heavy),
+            probe.stage("Also heavy", heavy),
+            probe.stage("Light", light),
+        ],
+        budget=Resources(4, 4000),
+    )
+
+    assert probe.most_at_once == 2
+    assert_displayed("✓ Heavy")
+    assert_displayed("✓ Also heavy")
+    assert_displayed("✓ Light")
+
+
+def test_in_parallel_times_stages_from_when_they_start(tmp_path: Path) -> None:
+    history = StageHistory(tmp_path)
+
+    def _wait() -> None:
+        threading.Event().wait(0.2)
+
+    run_stages_in_parallel(
+        [Stage("First", _wait, weight=Resources(2, 0)), Stage("Second", _wait)],
+        history=history,
+        budget=Resources(2, 1000),
+    )
+
+    second = history.stats("Second")
+    assert second is not None
+    assert second.seconds < 0.35
+
+
+def test_in_parallel_runs_a_stage_bigger_than_the_budget_alone() -> None:
+    probe = _ConcurrencyProbe()
+
+    run_stages_in_parallel(
+        [
+            probe.stage("Huge", Resources(8, 100)),
+            probe.stage("Small", Resources(1, 100)),
+        ],
+        budget=Resources(2, 1000),
+    )
+
+    assert probe.most_at_once == 1
+    assert_displayed_in_order("✓ Huge", "✓ Small")
+
+
+def test_in_parallel_skips_waiting_stages_after_a_failure() -> None:
+    calls: list[str] = []
+
+    with pytest.raises(RuntimeError, match="stage failed"):
+        run_stages_in_parallel(
+            [
+                Stage("Failer", _fail),
+                Stage("Waiter", lambda: calls.append("waiter")),
+            ],
+            budget=Resources(1, 1000),
+        )
+
+    assert calls == []
+    assert_displayed_in_order("✗ Failer", "- Waiter (cancelled)")
+
+
+@pytest.mark.parametrize("runner", [run_stages_in_order, run_stages_in_parallel])
+def test_a_file_edited_while_a_stage_runs_is_not_recorded_as_passing(
+    tmp_path: Path, runner: Callable[[list[Stage], StageCache], None]
+) -> None:
+    module = tmp_path / "module.py"
+    module.write_text("x = 1\n")
+    cache = StageCache(tmp_path)
+
+    calls: list[str] = []
+
+    def _edit() -> None:
+        module.write_text("x = 2\n")
+
+    runner([Stage("Edited", _edit, PYTHON_INPUTS)], cache)
+    runner([Stage("Edited", lambda: calls.append("rerun"), PYTHON_INPUTS)], cache)
+
+    assert calls == ["rerun"]
+
+
+def test_a_stage_that_rewrites_its_inputs_records_what_it_leaves_behind(
+    tmp_path: Path,
+) -> None:
+    module = tmp_path / "module.py"
+    module.write_text("x=1\n")
+    cache = StageCache(tmp_path)
+
+    def _fix() -> None:
+        module.write_text("x = 1\n")
+
+    fixer = Stage("Fixer", _fix, PYTHON_INPUTS, rewrites_inputs=True)
+
+    run_stages_in_order([fixer], cache)
+
+    assert cache.has_passed(cache.key(PYTHON_INPUTS))
+
+
+def test_in_order_keys_each_stage_after_the_stages_before_it_ran(
+    tmp_path: Path,
+) -> None:
+    module = tmp_path / "module.py"
+    module.write_text("x=1\n")
+    cache = StageCache(tmp_path)
+    cache.record_pass(cache.key(PYTHON_INPUTS), PYTHON_INPUTS)
+    calls: list[str] = []
+
+    def _fix() -> None:
+        module.write_text("x = 1\n")
+
+    run_stages_in_order(
+        [
+            Stage("Fixer", _fix, rewrites_inputs=True),
+            Stage("Checker", lambda: calls.append("checker"), PYTHON_INPUTS),
+        ],
+        cache,
+    )
+
+    assert calls == ["checker"]
+    assert cache.has_passed(cache.key(PYTHON_INPUTS))
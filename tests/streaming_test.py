@@ -0,0 +1,94 @@
+import asyncio
+from pathlib import Path
+
+from pl_run_program import program_at_path
+from pl_user_io.testing import assert_displayed, assert_not_displayed
+
+from pl_ci_cd._cancellation import (
+    run_cancellable_program,
+    run_cancellable_program_async,
+)
+from pl_ci_cd._streaming import TAIL_LINES, streaming_log_dir, streaming_output
+
+SH_PROGRAM = program_at_path(Path("/bin/sh"))
+
+
+def _run(script: str, log_name: str | None = "tool") -> tuple[str, str, int]:
+    result = run_cancellable_program(SH_PROGRAM, ["-c", script], log_name=log_name)
+    return result.stdout, result.stderr, result.returncode
+
+
+def test_displays_output_as_it_arrives_and_logs_it(tmp_path: Path) -> None:
+    with streaming_output(tmp_path):
+        stdout, stderr, returncode = _run("echo out; echo err >&2; exit 3")
+
+    assert_displayed("tool: out")
+    assert_displayed("tool: err")
+    assert sorted((tmp_path / "tool.log").read_text().splitlines()) == ["err", "out"]
+    assert stdout == f"[Full output in {tmp_path / 'tool.log'}]\nout\n"
+    assert stderr == "err\n"
+    assert returncode == 3
+
+
+def test_keeps_only_the_tail_of_long_output(tmp_path: Path) -> None:
+    script = "i=0; while [ $i -lt 60 ]; do echo $i; echo e$i >&2; i=$((i+1)); done"
+
+    with streaming_output(tmp_path):
+        stdout, stderr, _ = _run(script)
+
+    assert stdout.splitlines()[0] == (
+        f"[Full output in {tmp_path / 'tool.log'}; 10 earlier line(s) omitted]"
+    )
+    assert stdout.splitlines()[1:] == [str(i) for i in range(10, 60)]
+    assert stderr.splitlines() == [
+        "[10 earlier line(s) omitted]",
+        *(f"e{i}" for i in range(10, 60)),
+    ]
+    assert len((tmp_path / "tool.log").read_text().splitlines()) == 120
+    assert TAIL_LINES == 50
+
+
+def test_cuts_long_lines_in_the_tail(tmp_path: Path) -> None:
+    with streaming_output(tmp_path):
+        stdout, _, _ = _run("printf '%2000s\\n' x")
+
+    assert stdout.splitlines()[1].endswith("… (line cut)")
+    assert len(stdout.splitlines()[1]) < 1100
+    assert len((tmp_path / "tool.log").read_text()) == 2001
+
+
+def test_buffers_programs_without_a_log_name(tmp_path: Path) -> None:
+    with streaming_output(tmp_path):
+        stdout, _, _ = _run("echo out", log_name=None)
+
+    assert stdout == "out\n"
+    assert_not_displayed("out")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_buffers_output_outside_streaming_output() -> None:
+    stdout, _, _ = _run("echo out")
+
+    assert stdout == "out\n"
+    assert streaming_log_dir() is None
+
+
+def test_creates_the_log_directory(tmp_path: Path) -> None:
+    with streaming_output(tmp_path / "logs") as log_dir:
+        assert streaming_log_dir() == log_dir
+
+    assert log_dir.is_dir()
+
+
+def test_streams_async_programs(tmp_path: Path) -> None:
+    with streaming_output(tmp_path):
+        result = asyncio.run(
+            run_cancellable_program_async(
+                SH_PROGRAM, ["-c", "echo out; echo err >&2"], log_name="tool"
+            )
+        )
+
+    assert_displayed("tool: out")
+    assert_displayed("tool: err")
+    assert result.stdout == f"[Full output in {tmp_path / 'tool.log'}]\nout\n"
+    assert result.stderr == "err\n"
@@ -0,0 +1,509 @@
+import json
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+from pl_mocks_and_fakes import mock_for, stub
+from pl_run_program import ProgramResult
+from pl_user_io.testing import assert_displayed
+
+from pl_ci_cd._cache import CACHE_DIR_NAME, StageCache
+from pl_ci_cd._failed_tests import load_failed_tests, record_failed_tests
+from pl_ci_cd._run_unit_tests_and_coverage import (
+    CoverageOrTestsError,
+    junit_report_args,
+)
+from pl_ci_cd._test_impact import (
+    IMPACT_MAP_NAME,
+    FileCoverage,
+    ImpactMap,
+    export_coverage,
+    load_impact_map,
+    merge_coverage,
+    parse_coverage_json,
+    run_impacted_unit_tests_and_coverage,
+    run_pytest_with_test_contexts,
+    save_impact_map,
+    select_tests,
+)
+from pl_ci_cd._tool_environment import UV_RUN
+
+TEST_ADD = "tests/math_test.py::test_add"
+TEST_SUBTRACT = "tests/math_test.py::test_subtract"
+TEST_CONSTANTS = "tests/other_test.py::test_constants"
+
+
+def _coverage_report(
+    files: dict[str, dict[int, list[str]]],
+    missing: dict[str, list[int]] | None = None,
+    *,
+    branch_coverage: bool = False,
+) -> str:
+    """Build a `coverage json --show-contexts` report, with the contexts pytest-cov records."""
+    missing = missing or {}
+    return json.dumps(
+        {
+            "meta": {"branch_coverage": branch_coverage, "show_contexts": True},
+            "files": {
+                file: {
+                    "executed_lines": sorted(lines),
+                    "missing_lines": missing.get(file, []),
+                    "excluded_lines": [],
+                    "contexts": {
+                        str(line): [f"{test}|run" if test else test for test in tests]
+                        for line, tests in lines.items()
+                    },
+                }
+                for file, lines in files.items()
+            },
+        }
+    )
+
+
+def _write_project(tmp_path: Path) -> None:
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "math_utils.py").write_text(
+        dedent("""\
+        def add(x, y):
+            return x + y
+
+        def subtract(x, y):
+            return x - y
+    """)
+    )
+    (tmp_path / "src" / "constants.py").write_text("ANSWER = 42\n")
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "math_test.py").write_text(
+        dedent("""\
+        from math_utils import add, subtract
+
+        def test_add():
+            assert add(1, 2) == 3
+
+        def test_subtract():
+            assert subtract(2, 1) == 1
+    """)
+    )
+    (tmp_path / "tests" / "other_test.py").write_text(
+        dedent("""\
+        from constants import ANSWER
+
+        def test_constants():
+            assert ANSWER == 42
+    """)
+    )
+
+
+# Module bodies (like `def` lines) run on import, outside any test.
+MATH_TESTS_RUN = {
+    "src/math_utils.py": {1: [""], 2: [TEST_ADD], 4: [""], 5: [TEST_SUBTRACT]},
+    "tests/math_test.py": {
+        1: [""],
+        3: [""],
+        4: [TEST_ADD],
+        6: [""],
+        7: [TEST_SUBTRACT],
+    },
+}
+FULL_RUN = {
+    **MATH_TESTS_RUN,
+    "src/constants.py": {1: [""]},
+    "tests/other_test.py": {1: [""], 3: [""], 4: [TEST_CONSTANTS]},
+}
+
+
+def _record_full_run(tmp_path: Path) -> ImpactMap:
+    impact_map = parse_coverage_json(
+        _coverage_report(FULL_RUN), StageCache(tmp_path).file_digests()
+    )
+    save_impact_map(tmp_path / CACHE_DIR_NAME / IMPACT_MAP_NAME, impact_map)
+    return impact_map
+
+
+def _select(tmp_path: Path, recorded: ImpactMap | None) -> list[str] | None:
+    return select_tests(tmp_path, recorded, StageCache(tmp_path).file_digests()).targets
+
+
+def test_parses_per_test_coverage() -> None:
+    report = _coverage_report(
+        {"a.py": {1: [""], 2: [TEST_ADD, TEST_SUBTRACT]}}, {"a.py": [3]}
+    )
+
+    impact_map = parse_coverage_json(report, {"a.py": "digest"})
+
+    assert impact_map == ImpactMap(
+        {"a.py": "digest"},
+        {
+            "a.py": FileCoverage(
+                frozenset({1, 2, 3}),
+                {1: frozenset({""}), 2: frozenset({TEST_ADD, TEST_SUBTRACT})},
+            )
+        },
+        branch_coverage=False,
+    )
+    assert impact_map.tests() == {TEST_ADD, TEST_SUBTRACT}
+
+
+def test_impact_map_round_trips(tmp_path: Path) -> None:
+    _write_project(tmp_path)
+    recorded = _record_full_run(tmp_path)
+
+    assert load_impact_map(tmp_path / CACHE_DIR_NAME / IMPACT_MAP_NAME) == recorded
+
+
+@pytest.mark.parametrize("contents", ["not json", '{"version": 0}', "{}"])
+def test_unreadable_impact_map_is_ignored(tmp_path: Path, contents: str) -> None:
+    (tmp_path / IMPACT_MAP_NAME).write_text(contents)
+
+    assert load_impact_map(tmp_path / IMPACT_MAP_NAME) is None
+
+
+def test_selects_nothing_when_nothing_changed(tmp_path: Path) -> None:
+    _write_project(tmp_path)
+    recorded = _record_full_run(tmp_path)
+
+    assert _select(tmp_path, recorded) == []
+
+
+def test_selects_the_tests_that_ran_a_changed_file(tmp_path: Path) -> None:
+    _write_project(tmp_path)
+    recorded = _record_full_run(tmp_path)
+    (tmp_path / "src" / "constants.py").write_text("ANSWER = 42\n")
+    math_utils = tmp_path / "src" / "math_utils.py"
+    math_utils.write_text(math_utils.read_text().replace("x + y", "y + x"))
+
+    # `tests/math_test.py` imports `math_utils`, so every test in it is selected.
+    assert _select(tmp_path, recorded) == ["tests/math_test.py"]
+
+
+def test_selects_test_files_importing_a_changed_file(tmp_path: Path) -> None:
+    _write_project(tmp_path)
+    recorded = parse_coverage_json(
+        _coverage_report(
+            {
+                **FULL_RUN,
+                "src/constants.py": {1: ["", TEST_SUBTRACT]},
+            }
+        ),
+        StageCache(tmp_path).file_digests(),
+    )
+    (tmp_path / "src" / "constants.py").write_text("ANSWER = 43\n")
+
+    assert _select(tmp_path, recorded) == [TEST_SUBTRACT, "tests/other_test.py"]
+
+
+def test_selects_test_files_importing_a_changed_file_through_other_modules(
+    tmp_path: Path,
+) -> None:
+    _write_project(tmp_path)
+    (tmp_path / "src" / "answers.py").write_text("from constants import ANSWER\n")
+    (tmp_path / "src" / "reexport.py").write_text("from answers import *\n")
+    (tmp_path / "tests" / "other_test.py").write_text("from reexport import ANSWER\n")
+    recorded = parse_coverage_json(
+        _coverage_report({**FULL_RUN, "src/constants.py": {1: ["", TEST_SUBTRACT]}}),
+        StageCache(tmp_path).file_digests(),
+    )
+    (tmp_path / "src" / "constants.py").write_text("ANSWER = 43\n")
+
+    assert _select(tmp_path, recorded) == [TEST_SUBTRACT, "tests/other_test.py"]
+
+
+def test_ignores_project_files_that_do_not_parse(tmp_path: Path) -> None:
+    _write_project(tmp_path)
+    (tmp_path / "src" / "broken.py").write_text("def (\n")
+    recorded = parse_coverage_json(
+        _coverage_report({**FULL_RUN, "src/constants.py": {1: ["", TEST_SUBTRACT]}}),
+        StageCache(tmp_path).file_digests(),
+    )
+    (tmp_path / "src" / "constants.py").write_text("ANSWER = 43\n")
+
+    assert _select(tmp_path, recorded) == [TEST_SUBTRACT, "tests/other_test.py"]
+
+
+def test_selects_a_changed_test_file(tmp_path: Path) -> None:
+    _write_project(tmp_path)
+    recorded = _record_full_run(tmp_path)
+    with (tmp_path / "tests" / "other_test.py").open("a") as test_file:
+        test_file.write("\n\ndef test_more():\n    pass\n")
+
+    assert _select(tmp_path, recorded) == ["tests/other_test.py"]
+
+
+def test_resolves_relative_imports_in_test_files(tmp_path: Path) -> None:
+    _write_project(tmp_path)
+    (tmp_path / "tests" / "helpers.py").write_text("")
+    (tmp_path / "tests" / "other_test.py").write_text(
+        "from . import helpers\nfrom .helpers import *\nimport os\n"
+    )
+    recorded = parse_coverage_json(
+        _coverage_report({**FULL_RUN, "tests/helpers.py": {1: ["", TEST_ADD]}}),
+        StageCache(tmp_path).file_digests(),
+    )
+    (tmp_path / "tests" / "helpers.py").write_text("x = 1\n")
+
+    assert _select(tmp_path, recorded) == [TEST_ADD, "tests/other_test.py"]
+
+
+def test_selects_test_files_importing_a_changed_package(tmp_path: Path) -> None:
+    _write_project(tmp_path)
+    (tmp_path / "src" / "package").mkdir()
+    (tmp_path / "src" / "package" / "__init__.py").write_text("")
+    (tmp_path / "tests" / "other_test.py").write_text("from package import thing\n")
+    recorded = parse_coverage_json(
+        _coverage_report({**FULL_RUN, "src/package/__init__.py": {1: ["", TEST_ADD]}}),
+        StageCache(tmp_path).file_digests(),
+    )
+    (tmp_path / "src" / "package" / "__init__.py").write_text("thing = 1\n")
+
+    assert _select(tmp_path, recorded) == [TEST_ADD, "tests/other_test.py"]
+
+
+@pytest.mark.parametrize(
+    ("file", "contents", "reason"),
+    [
+        ("src/new.py", "", "src/new.py was added or removed"),
+        ("src/constants.py", None, "src/constants.py was added or removed"),
+        (
+            "src/constants.py",
+            "ANSWER = 43\n",
+            "src/constants.py changed and no test is recorded as running it",
+        ),
+        (
+            "README.md",
+            "Changed",
+            "README.md changed and no test is recorded as running it",
+        ),
+        ("conftest.py", "# Changed", "conftest.py changed"),
+    ],
+)
+def test_runs_every_test_for_changes_not_traced_to_tests(
+    tmp_path: Path, file: str, contents: str | None, reason: str
+) -> None:
+    _write_project(tmp_path)
+    (tmp_path / "README.md").write_text("Readme")
+    (tmp_path / "conftest.py").write_text("")
+    recorded = _record_full_run(tmp_path)
+    if contents is None:
+        (tmp_path / file).unlink()
+    else:
+        (tmp_path / file).write_text(contents)
+
+    selection = select_tests(tmp_path, recorded, StageCache(tmp_path).file_digests())
+
+    assert selection.targets is None
+    assert selection.reason == reason
+
+
+def test_runs_every_test_without_recorded_coverage(tmp_path: Path) -> None:
+    assert _select(tmp_path, None) is None
+
+
+def test_runs_every_test_with_branch_coverage(tmp_path: Path) -> None:
+    recorded = parse_coverage_json(_coverage_report(FULL_RUN, branch_coverage=True), {})
+
+    assert _select(tmp_path, recorded) is None
+
+
+def test_merge_replaces_the_coverage_of_rerun_tests() -> None:
+    recorded = parse_coverage_json(_coverage_report(FULL_RUN), {"a": "1"})
+    # `test_add` no longer runs line 2, and `test_subtract` no longer runs line 5, which a new test now runs.
+    fresh = parse_coverage_json(
+        _coverage_report(
+            {
+                "src/math_utils.py": {
+                    1: [""],
+                    4: [""],
+                    5: ["tests/math_test.py::test_new"],
+                }
+            },
+            {"src/math_utils.py": [2]},
+        ),
+        {"a": "1"},
+    )
+
+    merged = merge_coverage(recorded, fresh, ["tests/math_test.py"])
+
+    assert merged is not None
+    assert merged["src/math_utils.py"] == FileCoverage(
+        frozenset({1, 2, 4, 5}),
+        {
+            1: frozenset({""}),
+            4: frozenset({""}),
+            5: frozenset({"tests/math_test.py::test_new"}),
+        },
+    )
+    assert merged["src/constants.py"] == recorded.files["src/constants.py"]
+
+
+def test_merge_takes_changed_files_from_the_fresh_coverage() -> None:
+    recorded = parse_coverage_json(_coverage_report(FULL_RUN), {"src/a.py": "1"})
+    recorded.files["src/a.py"] = FileCoverage(frozenset({1, 2}), {1: frozenset({""})})
+    fresh = parse_coverage_json(
+        _coverage_report({"src/a.py": {1: [TEST_ADD]}}, {"src/a.py": [3]}),
+        {"src/a.py": "2"},
+    )
+
+    merged = merge_coverage(recorded, fresh, [TEST_ADD])
+
+    assert merged is not None
+    assert merged["src/a.py"] == fresh.files["src/a.py"]
+    # `test_add` was re-run and no longer runs line 2.
+    assert 2 not in merged["src/math_utils.py"].lines
+    assert merged["src/math_utils.py"].lines[5] == {TEST_SUBTRACT}
+
+
+def test_merge_gives_up_on_changed_files_that_were_not_measured() -> None:
+    recorded = parse_coverage_json(
+        _coverage_report(FULL_RUN), {"src/constants.py": "1"}
+    )
+    fresh = parse_coverage_json(
+        _coverage_report(MATH_TESTS_RUN), {"src/constants.py": "2"}
+    )
+
+    assert merge_coverage(recorded, fresh, [TEST_ADD]) is None
+
+
+def _stub_test_runs(*reports: str) -> None:
+    mock_for(export_coverage).side_effect = list(reports)
+
+
+def test_first_run_runs_every_test_and_records_coverage(tmp_path: Path) -> None:
+    _write_project(tmp_path)
+    _stub_test_runs(_coverage_report(FULL_RUN))
+
+    run_impacted_unit_tests_and_coverage(tmp_path)
+
+    assert_displayed("No per-test coverage is recorded, running every test.")
+    mock_for(run_pytest_with_test_contexts).assert_called_once_with(
+        tmp_path, UV_RUN, None
+    )
+    recorded = load_impact_map(tmp_path / CACHE_DIR_NAME / IMPACT_MAP_NAME)
+    assert recorded is not None
+    assert recorded.tests() == {TEST_ADD, TEST_SUBTRACT, TEST_CONSTANTS}
+
+
+def test_later_runs_only_run_impacted_tests(tmp_path: Path) -> None:
+    _write_project(tmp_path)
+    _record_full_run(tmp_path)
+    math_utils = tmp_path / "src" / "math_utils.py"
+    math_utils.write_text(math_utils.read_text().replace("x + y", "y + x"))
+    _stub_test_runs(_coverage_report(MATH_TESTS_RUN))
+
+    run_impacted_unit_tests_and_coverage(tmp_path)
+
+    assert_displayed(
+        "1 file(s) changed since the last passing run, running 1 impacted test target(s)."
+    )
+    mock_for(run_pytest_with_test_contexts).assert_called_once_with(
+        tmp_path, UV_RUN, ["tests/math_test.py"]
+    )
+    recorded = load_impact_map(tmp_path / CACHE_DIR_NAME / IMPACT_MAP_NAME)
+    assert recorded == _record_full_run(tmp_path)
+
+
+def test_runs_nothing_when_nothing_changed(tmp_path: Path) -> None:
+    _write_project(tmp_path)
+    _record_full_run(tmp_path)
+
+    run_impacted_unit_tests_and_coverage(tmp_path)
+
+    assert_displayed("Nothing changed since the last passing run.")
+    mock_for(run_pytest_with_test_contexts).assert_not_called()
+
+
+def test_runs_every_test_when_a_changed_file_is_no_longer_measured(
+    tmp_path: Path,
+) -> None:
+    _write_project(tmp_path)
+    _record_full_run(tmp_path)
+    (tmp_path / "tests" / "math_test.py").write_text("def test_nothing(): pass\n")
+    math_utils = tmp_path / "src" / "math_utils.py"
+    math_utils.write_text(math_utils.read_text().replace("x + y", "y + x"))
+    _stub_test_runs(
+        _coverage_report({"tests/math_test.py": {1: [""]}}),
+        _coverage_report(FULL_RUN),
+    )
+
+    run_impacted_unit_tests_and_coverage(tmp_path)
+
+    assert_displayed("A changed file is no longer covered, running every test.")
+    assert mock_for(run_pytest_with_test_contexts).call_count == 2
+
+
+def test_raises_if_merged_coverage_is_incomplete(tmp_path: Path) -> None:
+    _write_project(tmp_path)
+    recorded = _record_full_run(tmp_path)
+    (tmp_path / "tests" / "math_test.py").write_text("def test_nothing(): pass\n")
+    _stub_test_runs(
+        _coverage_report(
+            {"src/math_utils.py": {1: [""], 4: [""]}, "tests/math_test.py": {1: [""]}},
+            {"src/math_utils.py": [2, 5]},
+        )
+    )
+
+    with pytest.raises(
+        CoverageOrTestsError, match=r"below 100%.*\nsrc/math_utils.py: 2, 5"
+    ):
+        run_impacted_unit_tests_and_coverage(tmp_path)
+
+    # Nothing is recorded until the tests pass.
+    assert load_impact_map(tmp_path / CACHE_DIR_NAME / IMPACT_MAP_NAME) == recorded
+
+
+def test_raises_if_tests_fail(tmp_path: Path) -> None:
+    stub(run_pytest_with_test_contexts)(ProgramResult("1 failed", "", 1))
+
+    with pytest.raises(CoverageOrTestsError, match="Tests or coverage failed"):
+        run_impacted_unit_tests_and_coverage(tmp_path)
+
+
+def test_records_failures_of_impacted_tests_and_keeps_those_not_rerun(
+    tmp_path: Path,
+) -> None:
+    _write_project(tmp_path)
+    _record_full_run(tmp_path)
+    record_failed_tests(tmp_path, [TEST_SUBTRACT, TEST_CONSTANTS])
+    math_utils = tmp_path / "src" / "math_utils.py"
+    math_utils.write_text(math_utils.read_text().replace("x + y", "y + x"))
+
+    def _fail_test_add(
+        directory: Path, _tools: object, _targets: object
+    ) -> ProgramResult:
+        report = junit_report_args(directory)[0].removeprefix("--junitxml=")
+        Path(report).write_text(
+            '<testsuites><testsuite name="pytest">'
+            '<testcase file="tests/math_test.py" classname="tests.math_test" name="test_add">'
+            '<failure message="x" /></testcase>'
+            '<testcase file="tests/math_test.py" classname="tests.math_test" name="test_subtract" />'
+            "</testsuite></testsuites>"
+        )
+        return ProgramResult("1 failed", "", 1)
+
+    mock_for(run_pytest_with_test_contexts).side_effect = _fail_test_add
+
+    with pytest.raises(CoverageOrTestsError, match="Tests or coverage failed"):
+        run_impacted_unit_tests_and_coverage(tmp_path)
+
+    assert load_failed_tests(tmp_path) == [TEST_ADD, TEST_CONSTANTS]
+
+
+def test_selected_tests_may_all_be_deselected(tmp_path: Path) -> None:
+    _write_project(tmp_path)
+    _record_full_run(tmp_path)
+    with (tmp_path / "tests" / "other_test.py").open("a") as test_file:
+        test_file.write("\n\n@pytest.mark.slow\ndef test_slow():\n    pass\n")
+    # pytest's exit code when no test was selected.
+    stub(run_pytest_with_test_contexts)(ProgramResult("", "", 5))
+    _stub_test_runs(
+        _coverage_report(
+            {"tests/other_test.py": {1: [""], 3: [""], 4: [TEST_CONSTANTS], 7: [""]}},
+            {"tests/other_test.py": [8]},
+        )
+    )
+
+    with pytest.raises(CoverageOrTestsError, match=r"tests/other_test.py: 8"):
+        run_impacted_unit_tests_and_coverage(tmp_path)
+
+    mock_for(run_pytest_with_test_contexts).assert_called_once_with(
+        tmp_path, UV_RUN, ["tests/other_test.py"]
+    )
@@ -0,0 +1,68 @@
+import os
+from pathlib import Path
+
+from pl_run_program import program_at_path
+from pl_tiny_clients.initialize_uv_project import initialize_uv_project
+
+from pl_ci_cd._constants import uv_program
+from pl_ci_cd._tool_environment import (
+    SYNC_STAMP_NAME,
+    UV_RUN,
+    ToolCommand,
+    ToolEnvironment,
+    synced_tool_environment,
+)
+from pl_ci_cd.testing._set_up import set_up_formatter
+
+
+def _set_up(tmp_path: Path) -> None:
+    set_up_formatter(initialize_uv_project(project_path=tmp_path))
+
+
+def test_uv_run_launches_tools_through_uv(tmp_path: Path) -> None:
+    assert UV_RUN.command("ruff", ["check"], tmp_path) == ToolCommand(
+        uv_program(), ["--directory", str(tmp_path), "run", "ruff", "check"], {}
+    )
+
+
+def test_venv_launches_tools_directly(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    venv = tmp_path / ".venv"
+
+    command = ToolEnvironment(venv).command("ruff", ["check"], tmp_path)
+
+    assert command == ToolCommand(
+        program_at_path(venv / "bin" / "ruff"),
+        ["check"],
+        {"VIRTUAL_ENV": str(venv), "PATH": f"{venv / 'bin'}{os.pathsep}{os.defpath}"},
+    )
+
+
+def test_sync_returns_project_venv(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+
+    assert synced_tool_environment(tmp_path) == ToolEnvironment(tmp_path / ".venv")
+
+
+def test_sync_is_skipped_when_lock_is_unchanged(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    synced_tool_environment(tmp_path)
+    stamp = tmp_path / ".venv" / SYNC_STAMP_NAME
+    stamp_mtime = stamp.stat().st_mtime_ns
+
+    synced_tool_environment(tmp_path)
+
+    assert stamp.stat().st_mtime_ns == stamp_mtime
+
+
+def test_resyncs_when_lock_changes(tmp_path: Path) -> None:
+    _set_up(tmp_path)
+    synced_tool_environment(tmp_path)
+    stamp = tmp_path / ".venv" / SYNC_STAMP_NAME
+    stamp_before = stamp.read_text()
+
+    with (tmp_path / "uv.lock").open("a") as lock:
+        lock.write("\n")
+    synced_tool_environment(tmp_path)
+
+    assert stamp.read_text() != stamp_before
@@ -0,0 +1,147 @@
+import json
+import threading
+from pathlib import Path
+
+import pytest
+from pl_run_program import program_at_path
+
+from pl_ci_cd._cancellation import run_cancellable_program
+from pl_ci_cd._stages import Stage, run_stages_in_parallel
+from pl_ci_cd._trace import (
+    TraceEvent,
+    Tracer,
+    trace_file,
+    traced,
+    tracing,
+)
+
+SH_PROGRAM = program_at_path(Path("/bin/sh"))
+
+
+def _exit_with(code: int) -> None:
+    run_cancellable_program(SH_PROGRAM, ["-c", f"exit {code}"])
+
+
+def test_records_nothing_outside_tracing() -> None:
+    tracer = Tracer()
+
+    with traced("Stage", "check"):
+        _exit_with(0)
+
+    assert tracer.spans == []
+
+
+def test_records_spans_with_exit_codes_and_child_usage() -> None:
+    tracer = Tracer()
+
+    with tracing(tracer), traced("Stage", "check"):
+        _exit_with(3)
+
+    [span] = tracer.spans
+    assert (span.name, span.category, span.exit_code, span.error) == (
+        "Stage",
+        "check",
+        3,
+        None,
+    )
+    assert span.duration >= 0
+    assert span.thread == threading.current_thread().name
+    assert span.child_usage.user_seconds >= 0
+    assert span.child_usage.max_rss_kb > 0
+
+
+def test_keeps_the_first_failing_exit_code() -> None:
+    tracer = Tracer()
+
+    with tracing(tracer), traced("Stage", "check"):
+        _exit_with(0)
+        _exit_with(2)
+        _exit_with(0)
+
+    assert tracer.spans[0].exit_code == 2
+
+
+def test_records_the_error_a_span_ended_with() -> None:
+    tracer = Tracer()
+
+    with (
+        pytest.raises(RuntimeError),
+        tracing(tracer),
+        traced("Stage", "check"),
+    ):
+        raise RuntimeError
+
+    assert tracer.spans[0].error == "RuntimeError"
+
+
+def test_calls_hooks_as_spans_start_and_end() -> None:
+    events: list[TraceEvent] = []
+
+    with tracing(Tracer([events.append])), traced("Stage", "check"):
+        pass
+
+    assert [(event.kind, event.name) for event in events] == [
+        ("start", "Stage"),
+        ("end", "Stage"),
+    ]
+    assert events[1].span is not None
+
+
+def test_nested_tracers_all_record() -> None:
+    outer = Tracer()
+    inner = Tracer()
+
+    with tracing(outer):
+        with tracing(inner), traced("Inner", "check"):
+            pass
+        with traced("Outer", "check"):
+            pass
+
+    assert [span.name for span in outer.spans] == ["Inner", "Outer"]
+    assert [span.name for span in inner.spans] == ["Inner"]
+
+
+def test_records_parallel_stages_on_their_own_threads() -> None:
+    tracer = Tracer()
+
+    with tracing(tracer):
+        run_stages_in_parallel(
+            [Stage("A", lambda: _exit_with(0)), Stage("B", lambda: _exit_with(1))]
+        )
+
+    spans = {span.name: span for span in tracer.spans}
+    assert spans["A"].exit_code == 0
+    assert spans["B"].exit_code == 1
+    assert spans["A"].thread != threading.current_thread().name
+
+
+def test_writes_chrome_trace_events(tmp_path: Path) -> None:
+    path = tmp_path / "trace.json"
+
+    with trace_file(path), traced("Outer", "check"), traced("Inner", "check"):
+        _exit_with(1)
+
+    trace = json.loads(path.read_text())
+    complete = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert [event["name"] for event in complete] == ["Outer", "Inner"]
+    assert complete[1]["args"]["exit_code"] == 1
+    assert complete[0]["ts"] <= complete[1]["ts"]
+    assert complete[0]["dur"] >= complete[1]["dur"]
+    [thread_name] = [event for event in trace["traceEvents"] if event["ph"] == "M"]
+    assert thread_name["args"]["name"] == threading.current_thread().name
+
+
+def test_writes_trace_file_even_if_traced_code_fails(tmp_path: Path) -> None:
+    path = tmp_path / "trace.json"
+
+    with pytest.raises(RuntimeError), trace_file(path), traced("Stage", "check"):
+        raise RuntimeError
+
+    assert json.loads(path.read_text())["traceEvents"][0]["args"]["error"] == (
+        "RuntimeError"
+    )
+
+
+def test_trace_file_does_nothing_without_a_path() -> None:
+    with trace_file(None), traced("Stage", "check"):
+        pass